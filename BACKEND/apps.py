@@ -7,3 +7,6 @@ class BackendConfig(AppConfig):
     name = 'BACKEND'
     def ready(self):
         import BACKEND.signals_inventario
+        from django.db.models.signals import post_migrate
+        from BACKEND.services.busqueda import asegurar_indice_sqlite
+        post_migrate.connect(asegurar_indice_sqlite, sender=self)
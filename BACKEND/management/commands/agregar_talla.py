@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from BACKEND.models import Talla
+from BACKEND.services import inventario_stock
+
+
+class Command(BaseCommand):
+    help = ('Crea el inventario de una talla en todos los productos de su grupo que todavía no lo '
+            'tienen, por tandas. Para grupos con demasiados productos para hacerlo al crear la talla '
+            '(TALLA_EN_LINEA_MAX_PRODUCTOS). Sin --talla revisa todas las tallas activas; con '
+            '--pendientes solo las que quedaron marcadas al crearse (proceso `tallas` del Procfile).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--talla', type=int, action='append', default=[],
+                            help='ID de la talla (se puede repetir).')
+        parser.add_argument('--pendientes', action='store_true',
+                            help='Solo las tallas con inventario pendiente.')
+        parser.add_argument('--lote', type=int, default=inventario_stock.LOTE_MAX,
+                            help=f'Productos por tanda (por defecto {inventario_stock.LOTE_MAX}).')
+        parser.add_argument('--intervalo', type=int, default=0,
+                            help='Con --pendientes, segundos entre revisiones; 0 = una sola vez.')
+
+    def handle(self, *args, **options):
+        lote = max(1, options['lote'])
+        if options['pendientes']:
+            while True:
+                self._reportar(inventario_stock.completar_tallas_pendientes(lote=lote))
+                if not options['intervalo']:
+                    break
+                time.sleep(options['intervalo'])
+            return
+        tallas = Talla.objects.filter(pk__in=options['talla']) if options['talla'] else Talla.objects.filter(estado=True)
+        self._reportar({talla: inventario_stock.agregar_talla(talla, lote=lote) for talla in tallas.order_by('pk')})
+
+    def _reportar(self, resultados):
+        for talla, resultado in resultados.items():
+            self.stdout.write(f"Talla {talla.pk} ({talla.nombre}): {resultado['creados']} creados, "
+                              f"{resultado['existentes']} ya existían")
+        creados = sum(resultado['creados'] for resultado in resultados.values())
+        self.stdout.write(self.style.SUCCESS(f'Inventarios creados: {creados}'))
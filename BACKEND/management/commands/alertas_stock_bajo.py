@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from BACKEND.services import alertas_stock
+
+
+class Command(BaseCommand):
+    help = ('Junta los cruces del umbral de stock bajo (EventoStockBajo) y, cumplida la ventana '
+            '(LOW_STOCK_VENTANA_SEGUNDOS), manda un solo correo agrupado a los administradores.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventana', type=int, default=None,
+                            help='Segundos a juntar eventos (por defecto LOW_STOCK_VENTANA_SEGUNDOS).')
+        parser.add_argument('--intervalo', type=int, default=0,
+                            help='Segundos entre revisiones; 0 = una sola vez.')
+
+    def handle(self, *args, **options):
+        espera = timedelta(seconds=options['ventana']) if options['ventana'] is not None else None
+        while True:
+            resultado = alertas_stock.despachar(espera=espera)
+            if resultado:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Stock bajo: {resultado['eventos']} eventos, {resultado['avisados']} ítems avisados"
+                ))
+            elif not options['intervalo']:
+                self.stdout.write('Stock bajo: nada que enviar todavía')
+            if not options['intervalo']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,81 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+
+from BACKEND.services import http_client
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """Responde 200 a todo con keep-alive (HTTP/1.1) y cuenta las conexiones abiertas."""
+    protocol_version = 'HTTP/1.1'
+    conexiones = 0
+
+    def setup(self):
+        super().setup()
+        # como cualquier servidor real: sin Nagle, la respuesta no espera el ACK retrasado
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        type(self).conexiones += 1
+
+    def _responder(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        if largo:
+            self.rfile.read(largo)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    do_GET = do_POST = _responder
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = ('Compara N llamadas con requests.post (conexión nueva cada vez) contra el cliente '
+            'compartido services/http_client.py (conexión reutilizada). Sin --url levanta un '
+            'servidor local de prueba y cuenta las conexiones que recibe.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=200, help='Llamadas por modo.')
+        parser.add_argument('--url', default='', help='URL a la que llamar (por defecto, servidor local).')
+
+    def _medir(self, llamar, n):
+        inicio = time.perf_counter()
+        for _ in range(n):
+            llamar().raise_for_status()
+        return time.perf_counter() - inicio
+
+    def handle(self, *args, **options):
+        n, url, servidor = max(1, options['n']), options['url'], None
+        if not url:
+            servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Stub)
+            servidor.daemon_threads = True
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+            url = f'http://127.0.0.1:{servidor.server_port}/api/v2/emails'
+        try:
+            resultados = []
+            for modo, llamar in (
+                ('requests.post', lambda: requests.post(url, json={}, timeout=http_client.TIMEOUT)),
+                ('http_client', lambda: http_client.post(url, 'benchmark', json={})),
+            ):
+                _Stub.conexiones = 0
+                segundos = self._medir(llamar, n)
+                http_client.cerrar()
+                resultados.append((modo, segundos, _Stub.conexiones))
+        finally:
+            if servidor:
+                servidor.shutdown()
+                servidor.server_close()
+
+        for modo, segundos, conexiones in resultados:
+            linea = f'{modo:>14}: {n} llamadas en {segundos * 1000:.0f} ms ({segundos * 1000 / n:.2f} ms c/u)'
+            if servidor:
+                linea += f', {conexiones} conexiones'
+            self.stdout.write(linea)
+        self.stdout.write(self.style.SUCCESS(f'Ahorro: {resultados[0][1] / max(resultados[1][1], 1e-9):.1f}x'))
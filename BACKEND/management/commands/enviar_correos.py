@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from BACKEND.services import bandeja_salida
+
+
+class Command(BaseCommand):
+    help = ('Envía a Maileroo los correos pendientes de la bandeja de salida (CorreoSaliente) '
+            'por lotes, con reintentos y espera exponencial.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=bandeja_salida.LOTE,
+                            help=f'Correos por vuelta (por defecto {bandeja_salida.LOTE}).')
+        parser.add_argument('--intervalo', type=int, default=0,
+                            help='Segundos de espera cuando no hay nada que enviar; 0 = una sola vez.')
+
+    def handle(self, *args, **options):
+        lote = max(1, options['lote'])
+        while True:
+            resultado = bandeja_salida.despachar(lote=lote)
+            if any(resultado.values()) or not options['intervalo']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Correos: {resultado['enviados']} enviados, {resultado['reintentos']} para reintentar, "
+                    f"{resultado['fallidos']} fallidos"
+                ))
+            if not options['intervalo']:
+                break
+            # lote lleno: probablemente hay más, seguir sin esperar
+            if sum(resultado.values()) < lote:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from BACKEND.services import snapshot_catalogo
+
+
+class Command(BaseCommand):
+    help = ('Exporta el catálogo público a STATIC_ROOT/catalogo/ (un JSON comprimido y con hash '
+            'por categoría + manifest.json). Solo reescribe las categorías que cambiaron. '
+            'El proceso web lo corre con --intervalo 60 junto a gunicorn (mismo disco que sirve '
+            'WhiteNoise), así precios y stock llegan a los shards sin esperar un deploy.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todo', action='store_true', help='Reescribe todas las categorías.')
+        parser.add_argument('--intervalo', type=int, default=0,
+                            help='Segundos entre corridas; 0 = una sola vez.')
+
+    def handle(self, *args, **options):
+        todo = options['todo']
+        while True:
+            resultado = snapshot_catalogo.exportar(todo=todo)
+            self.stdout.write(self.style.SUCCESS(
+                f"Catálogo exportado: {resultado['escritos']} categorías escritas, "
+                f"{resultado['sin_cambios']} sin cambios, {resultado['borrados']} archivos borrados"
+            ))
+            if not options['intervalo']:
+                break
+            todo = False
+            time.sleep(options['intervalo'])
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from BACKEND.services import reservas
+
+
+class Command(BaseCommand):
+    help = ('Borra las reservas de stock vencidas de los carritos (ReservaStock) por lotes. '
+            'Las vencidas ya no descuentan disponible; esto solo mantiene la tabla chica. '
+            'Pensado para correr cada pocos minutos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=reservas.LOTE,
+                            help=f'Filas por DELETE (por defecto {reservas.LOTE}).')
+        parser.add_argument('--intervalo', type=int, default=0,
+                            help='Segundos entre barridos; 0 = una sola vez.')
+
+    def handle(self, *args, **options):
+        while True:
+            total = reservas.expirar(lote=max(1, options['lote']))
+            self.stdout.write(self.style.SUCCESS(f'Reservas vencidas liberadas: {total}'))
+            if not options['intervalo']:
+                break
+            time.sleep(options['intervalo'])
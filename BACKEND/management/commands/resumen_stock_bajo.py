@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from BACKEND.services import alertas_stock
+from BACKEND.services.stock_alerts_core import DIGEST_MAX_ITEMS
+
+
+class Command(BaseCommand):
+    help = ('Resumen de stock bajo para los administradores: solo los inventarios que entraron '
+            'en alerta o se recuperaron desde el último resumen. Corre como proceso `resumen` del '
+            'Procfile (--intervalo 86400, una vez al día); reemplaza llamar a stock/send-digest/ '
+            'desde cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=DIGEST_MAX_ITEMS,
+                            help='Ítems por correo.')
+        parser.add_argument('--intervalo', type=int, default=0,
+                            help='Segundos entre resúmenes; 0 = una sola vez.')
+
+    def handle(self, *args, **options):
+        while True:
+            resultado = alertas_stock.resumir(lote=options['lote'])
+            if resultado['correos']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Resumen: {resultado['correos']} correos, {resultado['bajos']} en alerta, "
+                    f"{resultado['recuperados']} recuperados"
+                ))
+            else:
+                self.stdout.write('Resumen: sin cambios desde el último')
+            if not options['intervalo']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from BACKEND.models import InventarioSnapshot
+from BACKEND.services import movimientos
+
+
+class Command(BaseCommand):
+    help = ('Guarda una foto del stock de cada inventario (InventarioSnapshot) para consultar '
+            'el stock a una fecha sin recorrer todo el libro de movimientos. Pensado para correr a diario.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conservar-dias', type=int, default=0,
+                            help='Borra snapshots más viejos que N días (0 = no borra).')
+
+    def handle(self, *args, **options):
+        total = movimientos.tomar_snapshot()
+        borrados = 0
+        if options['conservar_dias']:
+            limite = timezone.now() - timedelta(days=options['conservar_dias'])
+            borrados, _ = InventarioSnapshot.objects.filter(tomado__lt=limite).delete()
+        self.stdout.write(self.style.SUCCESS(f'Snapshots guardados: {total}; borrados: {borrados}'))
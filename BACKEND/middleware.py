@@ -0,0 +1,46 @@
+# BACKEND/middleware.py
+import os
+
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+
+from BACKEND.services import snapshot_catalogo
+
+
+class CatalogoWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise + el snapshot del catálogo (services/snapshot_catalogo.py).
+
+    WhiteNoise indexa STATIC_ROOT una sola vez al arrancar, así que no vería los
+    shards que exportar_catalogo escribe después. Los archivos de /static/catalogo/
+    se resuelven en cada petición (solo manifest.json y nombres de shard válidos):
+    el manifest se sirve con max-age corto y los shards con hash como inmutables.
+    """
+
+    @property
+    def catalogo_prefijo(self):
+        return self.static_prefix + snapshot_catalogo.DIRECTORIO + '/'
+
+    def __call__(self, request):
+        url = request.path_info
+        if self.static_root and url.startswith(self.catalogo_prefijo):
+            static_file = self._archivo_catalogo(url)
+            if static_file is not None:
+                return self.serve(static_file, request)
+            return self.get_response(request)
+        return super().__call__(request)
+
+    def _archivo_catalogo(self, url):
+        nombre = url[len(self.catalogo_prefijo):]
+        if nombre != snapshot_catalogo.MANIFEST and not snapshot_catalogo.SHARD.match(nombre):
+            return None
+        ruta = os.path.join(self.static_root, snapshot_catalogo.DIRECTORIO, nombre)
+        try:
+            return self.get_static_file(ruta, url)
+        except MissingFileError:
+            return None
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.catalogo_prefijo):
+            return bool(snapshot_catalogo.SHARD.match(url[len(self.catalogo_prefijo):]))
+        return super().immutable_file_test(path, url)
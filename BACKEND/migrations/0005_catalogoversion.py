@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:22
+
+from django.db import migrations, models
+
+
+def crear_contadores(apps, schema_editor):
+    CatalogoVersion = apps.get_model('BACKEND', 'CatalogoVersion')
+    for nombre in ('producto', 'inventario', 'categoria', 'subcategoria', 'talla', 'grupotalla'):
+        CatalogoVersion.objects.get_or_create(nombre=nombre)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0004_producto_precio_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogoVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=64, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(crear_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Índices de texto completo para la búsqueda de productos (services/busqueda.py).
+# MySQL: FULLTEXT sobre nombre y sobre (nombre, descripcion).
+# SQLite (tests): tabla FTS5 de contenido externo sincronizada con triggers.
+
+from django.db import migrations
+
+from BACKEND.services.busqueda import SQLITE_FTS
+
+MYSQL_CREAR = [
+    "ALTER TABLE BACKEND_producto ADD FULLTEXT INDEX producto_ft_nombre (nombre)",
+    "ALTER TABLE BACKEND_producto ADD FULLTEXT INDEX producto_ft_nombre_desc (nombre, descripcion)",
+]
+MYSQL_BORRAR = [
+    "ALTER TABLE BACKEND_producto DROP INDEX producto_ft_nombre_desc",
+    "ALTER TABLE BACKEND_producto DROP INDEX producto_ft_nombre",
+]
+
+# las mismas sentencias que reinstala busqueda.asegurar_indice_sqlite tras cada migrate
+SQLITE_CREAR = SQLITE_FTS
+SQLITE_BORRAR = [
+    "DROP TRIGGER IF EXISTS BACKEND_producto_fts_au",
+    "DROP TRIGGER IF EXISTS BACKEND_producto_fts_ad",
+    "DROP TRIGGER IF EXISTS BACKEND_producto_fts_ai",
+    "DROP TABLE IF EXISTS BACKEND_producto_fts",
+]
+
+
+def _ejecutar(schema_editor, por_motor):
+    sentencias = por_motor.get(schema_editor.connection.vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+def crear_indices(apps, schema_editor):
+    _ejecutar(schema_editor, {'mysql': MYSQL_CREAR, 'sqlite': SQLITE_CREAR})
+
+
+def borrar_indices(apps, schema_editor):
+    _ejecutar(schema_editor, {'mysql': MYSQL_BORRAR, 'sqlite': SQLITE_BORRAR})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0005_catalogoversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
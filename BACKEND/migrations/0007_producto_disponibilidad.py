@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:27
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def calcular_resumen(apps, schema_editor):
+    """Llena stock / stock_bajo / tallas_con_stock con el inventario actual (grupo de talla vigente)."""
+    Producto = apps.get_model('BACKEND', 'Producto')
+    Inventario = apps.get_model('BACKEND', 'Inventario')
+
+    filas = {}
+    for producto_id, talla_id, stock_talla, stock_minimo in (
+        Inventario.objects.filter(talla__grupo=F('producto__subcategoria__grupoTalla'))
+        .values_list('producto_id', 'talla_id', 'stock_talla', 'stockMinimo').iterator()
+    ):
+        filas.setdefault(producto_id, []).append((talla_id, stock_talla or 0, stock_minimo or 0))
+
+    productos = []
+    for producto in Producto.objects.only('id').iterator():
+        propias = filas.get(producto.id, [])
+        total = sum(f[1] for f in propias)
+        minimo = sum(f[2] for f in propias)
+        tallas = sorted(f[0] for f in propias if f[1] > 0)
+        producto.stock = total
+        producto.stock_bajo = total <= minimo
+        producto.tallas_con_stock = ',%s,' % ','.join(map(str, tallas)) if tallas else ''
+        productos.append(producto)
+    Producto.objects.bulk_update(productos, ['stock', 'stock_bajo', 'tallas_con_stock'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0006_producto_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='stock_bajo',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='tallas_con_stock',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['stock'], name='producto_stock_idx'),
+        ),
+        migrations.RunPython(calcular_resumen, migrations.RunPython.noop),
+    ]
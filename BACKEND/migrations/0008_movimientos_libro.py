@@ -0,0 +1,83 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def snapshot_inicial(apps, schema_editor):
+    """El libro empieza aquí: foto del stock actual de cada inventario (ver services/movimientos.stock_en)."""
+    Inventario = apps.get_model('BACKEND', 'Inventario')
+    InventarioSnapshot = apps.get_model('BACKEND', 'InventarioSnapshot')
+    ahora = timezone.now()
+    InventarioSnapshot.objects.bulk_create([
+        InventarioSnapshot(inventario_id=pk, tomado=ahora, stock_talla=stock or 0)
+        for pk, stock in Inventario.objects.order_by().values_list('pk', 'stock_talla').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0007_producto_disponibilidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventarioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tomado', models.DateTimeField()),
+                ('stock_talla', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='movimiento',
+            name='referencia',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='movimiento',
+            name='stock_resultante',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='movimiento',
+            name='cantidad',
+            field=models.IntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='movimiento',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='movimiento',
+            name='inventario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='BACKEND.inventario'),
+        ),
+        migrations.AlterField(
+            model_name='movimiento',
+            name='tipo',
+            field=models.CharField(choices=[('inicial', 'Stock inicial'), ('ajuste', 'Ajuste de inventario'), ('venta', 'Venta'), ('devolucion', 'Devolución')], max_length=45),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['inventario', 'fecha'], name='movimiento_inv_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['fecha'], name='movimiento_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='inventariosnapshot',
+            name='inventario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='BACKEND.inventario'),
+        ),
+        migrations.AddIndex(
+            model_name='inventariosnapshot',
+            index=models.Index(fields=['inventario', 'tomado'], name='snapshot_inv_tomado_idx'),
+        ),
+        migrations.RunPython(snapshot_inicial, migrations.RunPython.noop),
+    ]
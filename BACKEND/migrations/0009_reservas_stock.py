@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0008_movimientos_libro'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('expira', models.DateTimeField()),
+                ('carrito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='BACKEND.carrito')),
+                ('inventario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='BACKEND.inventario')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['inventario', 'expira'], name='reserva_inv_expira_idx'), models.Index(fields=['expira'], name='reserva_expira_idx')],
+                'unique_together': {('carrito', 'inventario')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0010_correo_saliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoStockBajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_anterior', models.PositiveIntegerField()),
+                ('stock_nuevo', models.PositiveIntegerField()),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('enviado', models.DateTimeField(blank=True, null=True)),
+                ('inventario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_stock_bajo', to='BACKEND.inventario')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['enviado', 'creado'], name='evento_stock_enviado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0011_evento_stock_bajo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lowstockalert',
+            index=models.Index(fields=['en_alerta', 'last_sent_at'], name='lowstock_alerta_enviado_idx'),
+        ),
+    ]
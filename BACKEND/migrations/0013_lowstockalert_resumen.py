@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0012_lowstockalert_indice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='estado_cambiado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='resumido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lowstockalert',
+            index=models.Index(fields=['resumido', 'estado_cambiado'], name='lowstock_resumen_idx'),
+        ),
+    ]
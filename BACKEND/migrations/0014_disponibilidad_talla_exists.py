@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0013_lowstockalert_resumen'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='producto',
+            name='tallas_con_stock',
+        ),
+        migrations.AddIndex(
+            model_name='inventario',
+            index=models.Index(fields=['talla', 'stock_talla', 'producto'], name='inventario_talla_stock_idx'),
+        ),
+    ]
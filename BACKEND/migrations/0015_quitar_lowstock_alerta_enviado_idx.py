@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:16
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0014_disponibilidad_talla_exists'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lowstockalert',
+            name='lowstock_alerta_enviado_idx',
+        ),
+    ]
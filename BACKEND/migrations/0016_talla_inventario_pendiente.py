@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BACKEND', '0015_quitar_lowstock_alerta_enviado_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='talla',
+            name='inventario_pendiente',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -1,6 +1,6 @@
 
 from django.core.management import call_command
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, post_init
 from django.dispatch import receiver
 
 from django.db import models
@@ -8,6 +8,7 @@ from rest_framework.exceptions import ValidationError
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager, Group, Permission
 from django.utils import timezone
 from datetime import timedelta
+import logging
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -195,6 +196,8 @@ class Talla(models.Model):
     nombre = models.CharField(max_length=10)
     grupo = models.ForeignKey(GrupoTalla, on_delete=models.CASCADE, related_name='tallas')
     estado = models.BooleanField(default=True)
+    # su inventario quedó para el comando agregar_talla --pendientes (grupo muy grande)
+    inventario_pendiente = models.BooleanField(default=False, db_index=True)
 
     class Meta:
         unique_together = ('nombre', 'grupo')
@@ -207,10 +210,21 @@ class Producto(models.Model):
     nombre = models.CharField(max_length=45)
     descripcion = models.TextField(max_length=200)
     precio = models.PositiveIntegerField()
+    # Resumen de disponibilidad (solo las tallas del grupo actual de la subcategoría).
+    # Lo mantiene services/disponibilidad.py cada vez que cambia el inventario; no editar a mano.
     stock = models.PositiveIntegerField(default=0)
+    stock_bajo = models.BooleanField(default=False, db_index=True)
     subcategoria = models.ForeignKey(Subcategoria, on_delete=models.CASCADE, related_name='productos')
     imagen = models.URLField(max_length=500, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # keyset del catálogo ordenado por precio (ProductoCursorPagination)
+            models.Index(fields=['precio', 'id'], name='producto_precio_id_idx'),
+            # filtro ?en_stock=1 del catálogo
+            models.Index(fields=['stock'], name='producto_stock_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -229,6 +243,10 @@ class Inventario(models.Model):
     class Meta:
         unique_together = ('producto', 'talla')
         ordering = ['producto__subcategoria__categoria__nombre', 'producto__subcategoria__nombre', 'producto__nombre', 'talla__nombre']
+        indexes = [
+            # filtro ?talla_stock= del catálogo (disponibilidad.con_stock_en_talla)
+            models.Index(fields=['talla', 'stock_talla', 'producto'], name='inventario_talla_stock_idx'),
+        ]
 
     def __str__(self):
         return f"Inventario {self.idInventario} de {self.producto.nombre} - Talla {self.talla.nombre}"
@@ -266,14 +284,9 @@ class Inventario(models.Model):
 
     @classmethod
     def crear_inventario_para_subcategoria(cls, subcategoria):
-        productos = subcategoria.productos.all()
-        tallas = subcategoria.grupoTalla.tallas.filter(estado=True) if subcategoria.grupoTalla else []
-
-        inventarios_creados = []
-        for producto in productos:
-            inventarios = cls.crear_inventario_para_producto(producto, tallas)
-            inventarios_creados.extend(inventarios)
-        return inventarios_creados
+        # un bulk_create para todos los productos (services/inventario_stock.py)
+        from BACKEND.services import inventario_stock
+        return inventario_stock.sincronizar_tallas(subcategoria)
 
     @classmethod
     def crear_inventario_para_categoria(cls, categoria):
@@ -286,16 +299,56 @@ class Inventario(models.Model):
 
 
 class Movimiento(models.Model):
+    """
+    Registro (solo se agrega) de cada cambio de Inventario.stock_talla.
+    cantidad es con signo: +entra / -sale. Lo escriben la señal de Inventario
+    (save) y services/inventario_stock.py (escrituras por lote).
+    """
+    INICIAL = 'inicial'
+    AJUSTE = 'ajuste'
+    VENTA = 'venta'
+    DEVOLUCION = 'devolucion'
+    TIPOS = [
+        (INICIAL, 'Stock inicial'),
+        (AJUSTE, 'Ajuste de inventario'),
+        (VENTA, 'Venta'),
+        (DEVOLUCION, 'Devolución'),
+    ]
+
     idmovimiento = models.AutoField(primary_key=True)
-    tipo = models.CharField(max_length=45)
-    cantidad = models.CharField(max_length=45)
-    fecha = models.DateField()
-    inventario = models.ForeignKey(Inventario, on_delete=models.DO_NOTHING)
+    tipo = models.CharField(max_length=45, choices=TIPOS)
+    cantidad = models.IntegerField()
+    stock_resultante = models.PositiveIntegerField(null=True, blank=True)
+    fecha = models.DateTimeField(default=timezone.now)
+    referencia = models.CharField(max_length=64, blank=True, default='')  # 'factura:F-1', 'pedido:3', ...
+    inventario = models.ForeignKey(Inventario, on_delete=models.CASCADE, related_name='movimientos')
+
+    class Meta:
+        indexes = [
+            # "movimientos del SKU Y en los últimos 30 días" / "stock a la fecha X"
+            models.Index(fields=['inventario', 'fecha'], name='movimiento_inv_fecha_idx'),
+            models.Index(fields=['fecha'], name='movimiento_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Movimiento {self.idmovimiento} ({self.tipo})"
 
 
+class InventarioSnapshot(models.Model):
+    """Foto periódica de stock_talla (comando snapshot_inventario) para reconstruir el stock a una fecha."""
+    inventario = models.ForeignKey(Inventario, on_delete=models.CASCADE, related_name='snapshots')
+    tomado = models.DateTimeField()
+    stock_talla = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inventario', 'tomado'], name='snapshot_inv_tomado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Snapshot {self.inventario_id} @ {self.tomado:%Y-%m-%d %H:%M}"
+
+
 # ----------------------------
 # Pedidos y pagos
 # ----------------------------
@@ -466,34 +519,60 @@ class CarritoItem(models.Model):
         unique_together = ('carrito', 'producto', 'talla')
 
 
+class ReservaStock(models.Model):
+    """
+    Unidades de un inventario apartadas por un carrito hasta `expira`.
+    Disponible para vender = stock_talla - reservas vigentes (services/reservas.py).
+    Las vencidas no cuentan aunque sigan en la tabla; las borra el comando liberar_reservas.
+    """
+    carrito = models.ForeignKey(Carrito, on_delete=models.CASCADE, related_name='reservas')
+    inventario = models.ForeignKey(Inventario, on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField()
+    expira = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('carrito', 'inventario')
+        indexes = [
+            # SUM(cantidad) de las vigentes de un inventario sin leer la tabla entera
+            models.Index(fields=['inventario', 'expira'], name='reserva_inv_expira_idx'),
+            models.Index(fields=['expira'], name='reserva_expira_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reserva {self.cantidad} x inv {self.inventario_id} (carrito {self.carrito_id})"
+
+
 # ----------------------------
 # Señales (Signals)
 # ----------------------------
+def _bump_catalogo(*nombres):
+    from BACKEND.services import catalogo_cache
+    catalogo_cache.bump(*nombres)
+
+
 @receiver(post_save, sender=Producto)
 def crear_inventario_producto(sender, instance, created, **kwargs):
+    _bump_catalogo('producto')
     if created:
-        inventarios = Inventario.crear_inventario_para_producto(instance)
-        # Deshabilitar alerta de bajo stock por 30 minutos para cada inventario creado
-        from django.core.cache import cache
-        from BACKEND.services.stock_alerts_core import LOW_STOCK_UMBRAL
-        for inv in inventarios if isinstance(inventarios, (list, tuple)) else [inventarios]:
-            for umbral in [LOW_STOCK_UMBRAL, 5]:
-                key = f"lowstock:inv:{inv.pk}:u{umbral}"
-                cache.set(key, True, timeout=30*60)  # 30 minutos
+        # Nacen con stock 0: crear no es cruzar el umbral, así que no generan alerta
+        # de stock bajo (services/alertas_stock.py); no hace falta silenciarlas.
+        Inventario.crear_inventario_para_producto(instance)
 
 
 @receiver(post_save, sender=Subcategoria)
 def actualizar_inventario_subcategoria(sender, instance, created, **kwargs):
+    _bump_catalogo('subcategoria')
+    if not created:
+        # si cambió el grupo de tallas cambia qué inventarios cuentan en Producto.stock
+        from BACKEND.services import disponibilidad
+        disponibilidad.programar(instance.productos.values_list('id', flat=True))
     if created:
         Inventario.crear_inventario_para_subcategoria(instance)
     elif kwargs.get('update_fields') and 'grupoTalla' in kwargs.get('update_fields'):
         try:
-            productos = instance.productos.all()
-            for producto in productos:
-                Inventario.objects.filter(producto=producto).delete()
-                if instance.grupoTalla:
-                    tallas = instance.grupoTalla.tallas.filter(estado=True)
-                    Inventario.crear_inventario_para_producto(producto, tallas)
+            # solo se crean los pares (producto, talla) que faltan (si la vista ya
+            # sincronizó, no encuentra nada que crear)
+            Inventario.crear_inventario_para_subcategoria(instance)
         except Exception as e:
             print(f"Error al actualizar inventario para subcategoría {instance.idSubcategoria}: {str(e)}")
             pass
@@ -501,23 +580,90 @@ def actualizar_inventario_subcategoria(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=Talla)
 def crear_inventario_para_nueva_talla(sender, instance, created, **kwargs):
+    _bump_catalogo('talla')
     if created:
-        nueva_talla = instance
-        grupo_talla = nueva_talla.grupo
+        # inventario de la talla nueva en todos los productos del grupo, en bloque
+        # (services/inventario_stock.py). Si son demasiados para hacerlo dentro de la
+        # petición se marca pendiente (en la misma transacción) y lo completa el
+        # proceso `tallas` del Procfile (agregar_talla --pendientes).
+        from django.conf import settings
+        from BACKEND.services import inventario_stock
+        maximo = getattr(settings, 'TALLA_EN_LINEA_MAX_PRODUCTOS', 5000)
+        if Producto.objects.filter(subcategoria__grupoTalla_id=instance.grupo_id).count() > maximo:
+            Talla.objects.filter(pk=instance.pk).update(inventario_pendiente=True)
+            logging.getLogger(__name__).info("Talla %s: inventarios pendientes para agregar_talla", instance.pk)
+            return
+        inventario_stock.agregar_talla(instance)
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def catalogo_categoria_cambio(sender, **kwargs):
+    _bump_catalogo('categoria')
+
+
+@receiver(post_save, sender=GrupoTalla)
+@receiver(post_delete, sender=GrupoTalla)
+def catalogo_grupo_talla_cambio(sender, **kwargs):
+    _bump_catalogo('grupotalla')
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Subcategoria)
+@receiver(post_delete, sender=Talla)
+def catalogo_borrado(sender, **kwargs):
+    _bump_catalogo(sender.__name__.lower())
+
+
+# Versión por categoría para el snapshot estático (exportar_catalogo).
+# post_init guarda el padre original para marcar también la categoría de la que salió.
+@receiver(post_init, sender=Producto)
+def producto_guardar_subcategoria_original(sender, instance, **kwargs):
+    instance._subcategoria_original = instance.__dict__.get('subcategoria_id')
 
-        subcategorias = Subcategoria.objects.filter(grupoTalla=grupo_talla)
-        for subcategoria in subcategorias:
-            productos = Producto.objects.filter(subcategoria=subcategoria)
-            for producto in productos:
-                Inventario.objects.get_or_create(
-                    producto=producto,
-                    talla=nueva_talla,
-                    defaults={
-                        'cantidad': 0,
-                        'stockMinimo': producto.subcategoria.stockMinimo,
-                        'stock_talla': 0
-                    }
-                )
+
+@receiver(post_init, sender=Subcategoria)
+def subcategoria_guardar_categoria_original(sender, instance, **kwargs):
+    instance._categoria_original = instance.__dict__.get('categoria_id')
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def snapshot_producto_cambio(sender, instance, **kwargs):
+    from BACKEND.services import catalogo_cache
+    catalogo_cache.marcar_subcategorias([instance.subcategoria_id, getattr(instance, '_subcategoria_original', None)])
+    instance._subcategoria_original = instance.subcategoria_id
+
+
+@receiver(post_save, sender=Subcategoria)
+@receiver(post_delete, sender=Subcategoria)
+def snapshot_subcategoria_cambio(sender, instance, **kwargs):
+    from BACKEND.services import catalogo_cache
+    catalogo_cache.marcar_categorias([instance.categoria_id, getattr(instance, '_categoria_original', None)])
+    instance._categoria_original = instance.categoria_id
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def snapshot_categoria_cambio(sender, instance, **kwargs):
+    from BACKEND.services import catalogo_cache
+    catalogo_cache.marcar_categorias([instance.pk])
+
+# Índice de autocompletado: se registran después del bump de versión a propósito
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Subcategoria)
+@receiver(post_save, sender=Categoria)
+def autocompletado_guardado(sender, instance, **kwargs):
+    from BACKEND.services import autocompletado
+    autocompletado.al_guardar(instance)
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Subcategoria)
+@receiver(post_delete, sender=Categoria)
+def autocompletado_borrado(sender, instance, **kwargs):
+    from BACKEND.services import autocompletado
+    autocompletado.al_borrar(instance)
 
 class WebhookEvent(models.Model):
     mp_topic   = models.CharField(max_length=32)   # e.g. "payment"
@@ -623,6 +769,7 @@ class SalesRangeReportItem(models.Model):
 class LowStockAlert(models.Model):
     """
     Guarda el estado de alerta por inventario (producto + talla) para no spamear correos.
+    Es compartido por todos los procesos: lo lee y actualiza low_stock_batch_check.
     """
     inventario = models.OneToOneField('Inventario', on_delete=models.CASCADE, related_name='low_stock_alert')
     umbral = models.PositiveIntegerField(default=5)
@@ -630,11 +777,42 @@ class LowStockAlert(models.Model):
     first_detected = models.DateTimeField(null=True, blank=True)
     last_sent_at = models.DateTimeField(null=True, blank=True)
     times_sent = models.PositiveIntegerField(default=0)
+    # marca de agua del resumen: cuándo cambió en_alerta y cuándo entró a un resumen
+    # (null = ese cambio todavía no se resumió); ver alertas_stock.resumir()
+    estado_cambiado = models.DateTimeField(null=True, blank=True)
+    resumido = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['resumido', 'estado_cambiado'], name='lowstock_resumen_idx'),
+        ]
 
     def __str__(self):
         return f"Alert({self.inventario_id}) < {self.umbral}: {self.en_alerta}"
 
 
+class EventoStockBajo(models.Model):
+    """
+    Un inventario cruzó el umbral de stock bajo (en cualquier sentido). Se anota en la
+    misma transacción que el cambio de stock; el comando alertas_stock_bajo los junta
+    y manda un solo correo por ventana (services/alertas_stock.py).
+    """
+    inventario = models.ForeignKey('Inventario', on_delete=models.CASCADE, related_name='eventos_stock_bajo')
+    stock_anterior = models.PositiveIntegerField()
+    stock_nuevo = models.PositiveIntegerField()
+    creado = models.DateTimeField(default=timezone.now)
+    enviado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # "pendientes, el más viejo primero"
+            models.Index(fields=['enviado', 'creado'], name='evento_stock_enviado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Evento {self.inventario_id}: {self.stock_anterior} -> {self.stock_nuevo}"
+
+
 class Comentario(models.Model):
 
     usuario = models.ForeignKey('Usuario', on_delete=models.CASCADE, related_name='comentarios')
@@ -649,3 +827,50 @@ class Comentario(models.Model):
 
     def __str__(self):
         return f"Comentario de {self.usuario.nombre} {self.usuario.apellido} - {self.valoracion} estrellas"
+
+
+class CatalogoVersion(models.Model):
+    """
+    Contador de cambios por modelo del catálogo ('producto', 'talla', ...).
+    Las señales lo incrementan y la cache de lectura lo usa como parte de la clave.
+    """
+    nombre = models.CharField(max_length=64, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} v{self.version}"
+
+
+class CorreoSaliente(models.Model):
+    """
+    Bandeja de salida: las vistas y señales solo insertan aquí (services/bandeja_salida.py)
+    y el comando enviar_correos los manda a Maileroo por lotes, con reintentos.
+    payload es el JSON tal cual lo recibe la API de Maileroo.
+    """
+    PENDIENTE = 'pendiente'
+    ENVIADO = 'enviado'
+    FALLIDO = 'fallido'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (ENVIADO, 'Enviado'),
+        (FALLIDO, 'Fallido'),
+    ]
+
+    asunto = models.CharField(max_length=255, blank=True, default='')
+    payload = models.JSONField()
+    estado = models.CharField(max_length=16, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True, default='')
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # "pendientes cuyo turno ya llegó", en orden
+            models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_proximo_idx'),
+        ]
+
+    def __str__(self):
+        return f"Correo {self.pk} ({self.estado}): {self.asunto}"
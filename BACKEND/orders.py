@@ -1,25 +1,32 @@
 # BACKEND/services/orders.py
 from django.db import transaction
 from django.core.exceptions import ValidationError
-from BACKEND.models import Pedido, Inventario
+from BACKEND.models import Pedido
+from BACKEND.services import inventario_stock, reservas
 #from BACKEND.stock_alerts import upsert_stock_alert_for_inventory <-- i´m using signal
 
 @transaction.atomic
-def confirmar_pedido_y_descontar_stock(pedido_id):
+def confirmar_pedido_y_descontar_stock(pedido_id, carrito=None):
+    """
+    Descuenta el stock del pedido. `carrito` es el carrito que se está pagando (Pedido no
+    lo referencia): sus propias reservas no le restan y se sueltan al vender.
+    """
     pedido = Pedido.objects.select_related('usuario').prefetch_related('items').get(idPedido=pedido_id)
 
-    for it in pedido.items.all():
-        inv = Inventario.objects.select_for_update().get(
-            producto=it.producto,
-            talla=it.talla
-        )
-        if inv.stock_talla < it.cantidad:
-            raise ValidationError({'detail': f'Sin stock suficiente para {it.producto.nombre} / {it.talla.nombre}'})
-
-        inv.stock_talla -= it.cantidad
-        inv.save()  # <- si tienes el signal, con esto basta
-        # Si NO usas el signal, descomenta la siguiente línea:
-        # upsert_stock_alert_for_inventory(inv)
+    # UPDATE condicional por (producto, talla): todo o nada, sin bloquear antes de descontar
+    items = list(pedido.items.all())
+    cantidades = {}
+    for it in items:
+        clave = (it.producto_id, it.talla_id)
+        cantidades[clave] = cantidades.get(clave, 0) + it.cantidad
+    try:
+        inventario_stock.descontar(cantidades, referencia=f'pedido:{pedido.idPedido}', carrito=carrito)
+    except inventario_stock.StockInsuficiente as e:
+        it = next(i for i in items if (i.producto_id, i.talla_id) == (e.producto_id, e.talla_id))
+        talla = it.talla.nombre if it.talla_id else '-'
+        raise ValidationError({'detail': f'Sin stock suficiente para {it.producto.nombre} / {talla}'})
+    if carrito is not None:
+        reservas.liberar(carrito)
 
     return pedido
 
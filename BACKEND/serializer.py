@@ -1,5 +1,6 @@
 from .models import Comentario
 from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from itertools import chain, groupby
 from rest_framework import serializers
 from django.db import transaction
 from django.db.models import Q
@@ -28,6 +29,7 @@ from .models import (
     SalesRangeReport,
     SalesRangeReportItem,
 )
+from .services import disponibilidad, inventario_stock
 
 
 from django.db.models import Q   # <-- IMPORTANTE
@@ -35,6 +37,52 @@ from django.db.models import Q   # <-- IMPORTANTE
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 
+# ----------------------------
+# Campos a demanda (?fields= / ?omit=)
+# ----------------------------
+def campos_solicitados(request):
+    """Devuelve (fields, omit) de la query string como sets; fields=None si no se restringió."""
+    def _lista(nombre):
+        valor = request.query_params.get(nombre) if request is not None else None
+        if not valor:
+            return None
+        return {c.strip() for c in valor.split(',') if c.strip()}
+    return _lista('fields'), (_lista('omit') or set())
+
+
+def campo_incluido(request, nombre):
+    """True si la respuesta va a llevar `nombre` (útil en la vista para no precargar de más)."""
+    fields, omit = campos_solicitados(request)
+    return nombre not in omit and (fields is None or nombre in fields)
+
+
+class CamposDinamicosMixin:
+    """
+    ?fields=id,nombre  -> solo esos campos
+    ?omit=inventario_tallas  -> todos menos esos
+    Solo aplica al serializer raíz y en lecturas (GET/HEAD). Los campos que no se piden
+    se quitan antes de serializar, así que su SerializerMethodField no se ejecuta y su
+    consulta no se hace.
+    """
+
+    def _es_raiz(self):
+        padre = self.parent
+        if isinstance(padre, serializers.ListSerializer):
+            padre = padre.parent
+        return padre is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD') or not self._es_raiz():
+            return fields
+        pedidos, omitidos = campos_solicitados(request)
+        for nombre in list(fields):
+            if nombre in omitidos or (pedidos is not None and nombre not in pedidos):
+                fields.pop(nombre)
+        return fields
+
+
 # Serializer para Comentario
 class ComentarioSerializer(serializers.ModelSerializer):
     usuario_nombre = serializers.CharField(read_only=True)
@@ -189,6 +237,13 @@ class CategoriaSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Ya existe una categoría con este nombre.")
         return value
     
+def _tallas_activas(grupo):
+    # Usa el prefetch de la vista ('tallas') si existe; si no, una consulta como antes
+    if 'tallas' in getattr(grupo, '_prefetched_objects_cache', {}):
+        return [t for t in grupo.tallas.all() if t.estado]
+    return grupo.tallas.filter(estado=True)
+
+
 class SubcategoriaSerializer(serializers.ModelSerializer):
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
     grupo_talla_nombre = serializers.CharField(source='grupoTalla.nombre', read_only=True)
@@ -213,7 +268,7 @@ class SubcategoriaSerializer(serializers.ModelSerializer):
 
     def get_tallas_disponibles(self, obj):
         if obj.grupoTalla:
-            return [talla.nombre for talla in obj.grupoTalla.tallas.filter(estado=True)]
+            return [talla.nombre for talla in _tallas_activas(obj.grupoTalla)]
         return []
 
     def validate_stockMinimo(self, value):
@@ -236,7 +291,7 @@ class GrupoTallaSerializer(serializers.ModelSerializer):
         fields = ['idGrupoTalla', 'nombre', 'descripcion', 'estado', 'tallas']
 
     def get_tallas(self, obj):
-        tallas = obj.tallas.filter(estado=True)
+        tallas = _tallas_activas(obj)
         return [{
             'id': talla.id,
             'nombre': talla.nombre,
@@ -283,18 +338,22 @@ class TallaSerializer(serializers.ModelSerializer):
         
         return data
 
-class ProductoSerializer(serializers.ModelSerializer):
+class ProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
 
     subcategoria = serializers.PrimaryKeyRelatedField(queryset=Subcategoria.objects.all())
     subcategoria_nombre = serializers.CharField(source='subcategoria.nombre', read_only=True)
     categoria_nombre = serializers.CharField(source='subcategoria.categoria.nombre', read_only=True)
     inventario_tallas = serializers.SerializerMethodField()
     imagen = serializers.URLField(required=False, allow_null=True)
+    # Resumen calculado desde Inventario (services/disponibilidad.py): solo lectura
+    stock = serializers.IntegerField(read_only=True)
+    stock_bajo = serializers.BooleanField(read_only=True)
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
         # Mostrar la URL pública de la imagen
-        rep['imagen'] = instance.imagen if instance.imagen else None
+        if 'imagen' in rep:
+            rep['imagen'] = instance.imagen if instance.imagen else None
         return rep
 
     def get_imagen(self, obj):
@@ -309,6 +368,7 @@ class ProductoSerializer(serializers.ModelSerializer):
             'descripcion', 
             'precio', 
             'stock', 
+            'stock_bajo',
             'subcategoria', 
             'subcategoria_nombre',
             'categoria_nombre',
@@ -319,7 +379,14 @@ class ProductoSerializer(serializers.ModelSerializer):
 
 
     def get_inventario_tallas(self, obj):
-        inventarios = Inventario.objects.filter(producto=obj).select_related('talla')
+        # Si la vista ya precargó los inventarios (ProductoView) no se consulta de nuevo;
+        # el prefetch y esta consulta traen solo las tallas del grupo vigente
+        if 'inventarios' in getattr(obj, '_prefetched_objects_cache', {}):
+            inventarios = obj.inventarios.all()
+        else:
+            inventarios = disponibilidad.del_grupo_vigente(
+                Inventario.objects.filter(producto=obj)
+            ).select_related('talla')
         return [{
             'idTalla': inventario.talla.id,
             'talla': inventario.talla.nombre,
@@ -331,13 +398,8 @@ class ProductoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("El precio debe ser mayor a 0")
         return value
 
-    def validate_stock(self, value):
-        if value < 0:
-            raise serializers.ValidationError("El stock no puede ser negativo")
-        return value
-
 
-class InventarioSerializer(serializers.ModelSerializer):
+class InventarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     producto = ProductoSerializer(read_only=True)
     producto_id = serializers.PrimaryKeyRelatedField(
         queryset=Producto.objects.all(),
@@ -401,54 +463,61 @@ class InventarioSerializer(serializers.ModelSerializer):
         
         return data
 
-class InventarioAgrupadoSerializer(serializers.Serializer):
-    categoria = serializers.SerializerMethodField()
-    subcategorias = serializers.SerializerMethodField()
-
-    def get_categoria(self, obj):
-        return {
-            'id': obj['categoria__idCategoria'],
-            'nombre': obj['categoria__nombre'],
-            'estado': obj['categoria__estado']
-        }
-
-    def get_subcategorias(self, obj):
-        subcategorias = Inventario.objects.filter(
-            producto__subcategoria__categoria__idCategoria=obj['categoria__idCategoria']
-        ).values(
-            'producto__subcategoria__idSubcategoria',
-            'producto__subcategoria__nombre',
-            'producto__subcategoria__estado',
-            'producto__subcategoria__stockMinimo'
-        ).distinct()
-
-        subcategorias_data = []
-        for subcat in subcategorias:
-            productos = Inventario.objects.filter(
-                producto__subcategoria__idSubcategoria=subcat['producto__subcategoria__idSubcategoria']
-            ).select_related(
-                'producto',
-                'talla',
-                'producto__subcategoria',
-                'producto__subcategoria__categoria'
-            )
-
-            subcategorias_data.append({
-                'id': subcat['producto__subcategoria__idSubcategoria'],
-                'nombre': subcat['producto__subcategoria__nombre'],
-                'estado': subcat['producto__subcategoria__estado'],
-                'stockMinimo': subcat['producto__subcategoria__stockMinimo'],
-                'productos': InventarioSerializer(productos, many=True).data
-            })
+class InventarioAgrupadoSerializer(serializers.BaseSerializer):
+    """
+    Árbol categoría -> subcategorías -> inventarios armado en UNA pasada.
+
+    Recibe un queryset de Inventario ordenado por categoría y subcategoría (ver
+    InventarioView.inventario_agrupado) y lo recorre una sola vez con groupby:
+    sin consultas por categoría ni por subcategoría. `iterar()` entrega una
+    categoría a la vez para poder transmitir el JSON sin armar todo el árbol.
+    """
+
+    def iterar(self):
+        filas = InventarioSerializer(context=self.context)
+        inventarios = self.instance
+        if hasattr(inventarios, 'iterator'):
+            inventarios = inventarios.iterator(chunk_size=500)
+        por_categoria = groupby(inventarios, key=lambda inv: inv.producto.subcategoria.categoria_id)
+        for _, grupo_categoria in por_categoria:
+            primero = next(grupo_categoria)
+            categoria = primero.producto.subcategoria.categoria
+            subcategorias = []
+            por_subcategoria = groupby(chain([primero], grupo_categoria), key=lambda inv: inv.producto.subcategoria_id)
+            for _, grupo_subcategoria in por_subcategoria:
+                grupo_subcategoria = list(grupo_subcategoria)
+                subcategoria = grupo_subcategoria[0].producto.subcategoria
+                subcategorias.append({
+                    'id': subcategoria.idSubcategoria,
+                    'nombre': subcategoria.nombre,
+                    'estado': subcategoria.estado,
+                    'stockMinimo': subcategoria.stockMinimo,
+                    'productos': [filas.to_representation(inv) for inv in grupo_subcategoria],
+                })
+            yield {
+                'categoria': {
+                    'id': categoria.idCategoria,
+                    'nombre': categoria.nombre,
+                    'estado': categoria.estado,
+                },
+                'subcategorias': subcategorias,
+            }
 
-        return subcategorias_data
+    def to_representation(self, instance):
+        return list(self.iterar())
 
 class MovimientoSerializer(serializers.ModelSerializer):
-    inventario = InventarioSerializer()  
+    # plano: el libro puede tener miles de filas (la vista hace select_related)
+    producto_id = serializers.IntegerField(source='inventario.producto_id', read_only=True)
+    producto_nombre = serializers.CharField(source='inventario.producto.nombre', read_only=True)
+    talla_id = serializers.IntegerField(source='inventario.talla_id', read_only=True)
+    talla_nombre = serializers.CharField(source='inventario.talla.nombre', read_only=True)
 
     class Meta:
         model = Movimiento
-        fields = ['idmovimiento', 'tipo', 'cantidad', 'fecha', 'inventario']
+        fields = ['idmovimiento', 'tipo', 'cantidad', 'stock_resultante', 'fecha', 'referencia',
+                  'inventario', 'producto_id', 'producto_nombre', 'talla_id', 'talla_nombre']
+        read_only_fields = fields
 
 class ProductoMiniSerializer(serializers.ModelSerializer):
     class Meta:
@@ -691,7 +760,7 @@ class CarritoItemCreateSerializer(serializers.ModelSerializer):
         return item
 
 
-class CarritoSerializer(serializers.ModelSerializer):
+class CarritoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     items          = serializers.SerializerMethodField()
     estado_actual  = serializers.SerializerMethodField()
     total          = serializers.SerializerMethodField()
@@ -820,24 +889,6 @@ class FacturaCreateSerializer(serializers.Serializer):
     # Detalle
     items = FacturaItemCreateSerializer(many=True)
 
-    # ---- helpers seguros para stock (soporta stock_talla o cantidad) ----
-    def _get_stock_value(self, inv):
-        if hasattr(inv, "stock_talla"):
-            return inv.stock_talla
-        if hasattr(inv, "cantidad"):
-            return inv.cantidad
-        # Si el modelo tiene otro nombre de campo, ajusta aquí:
-        raise serializers.ValidationError({"inventario": "Modelo Inventario no tiene campo de stock esperado."})
-
-    def _set_stock_value(self, inv, value):
-        if hasattr(inv, "stock_talla"):
-            inv.stock_talla = value
-            return
-        if hasattr(inv, "cantidad"):
-            inv.cantidad = value
-            return
-        raise serializers.ValidationError({"inventario": "Modelo Inventario no tiene campo de stock esperado."})
-
     def validate(self, data):
         if not data.get("items"):
             raise serializers.ValidationError({"items": "Debe enviar al menos un ítem."})
@@ -869,54 +920,35 @@ class FacturaCreateSerializer(serializers.Serializer):
         mp_id = validated.get("mp_payment_id", "")
         skip_stock = bool(validated.get("skip_stock", False))  # ✅
 
-        # 1) Bloquear inventario de todos los (producto, talla)
-        claves = {(it["producto"].pk, (it["talla"].pk if it["talla"] else None)) for it in validated["items"]}
-        q = Q()
-        for prod_id, talla_id in claves:
-            if talla_id is None:
-                q |= Q(producto_id=prod_id, talla_id__isnull=True)
-            else:
-                q |= Q(producto_id=prod_id, talla_id=talla_id)
-        inv_bloq = Inventario.objects.select_for_update().filter(q) if q else Inventario.objects.none()
-        inv_map = {(i.producto_id, i.talla_id): i for i in inv_bloq}
-
-        # 2) Validar stock y acumular subtotal
+        # 1) Subtotal y cantidades por (producto, talla) (un mismo par puede venir repetido)
         subtotal = Decimal("0.00")
+        cantidades, nombres = {}, {}
         for it in validated["items"]:
-            prod_id = it["producto"].pk
-            talla_id = it["talla"].pk if it["talla"] else None
+            clave = (it["producto"].pk, it["talla"].pk if it["talla"] else None)
             cantidad = int(it["cantidad"])
-            precio = Decimal(str(it["precio"]))
-
-            inv = inv_map.get((prod_id, talla_id))
-            if not inv:
+            cantidades[clave] = cantidades.get(clave, 0) + cantidad
+            nombres[clave] = (getattr(it["producto"], "nombre", f"Producto {clave[0]}"),
+                              getattr(it["talla"], "nombre", "") if it["talla"] else "")
+            subtotal += (Decimal(str(it["precio"])) * Decimal(cantidad))
+
+        # 2) Descontar stock: UPDATE condicional por par, todo o nada (sin bloquear antes)
+        if skip_stock:
+            if inventario_stock.faltantes(cantidades):
                 raise serializers.ValidationError({"inventario": "No existe inventario para ese producto/talla."})
-
-            stock_actual = self._get_stock_value(inv)
-            if not skip_stock:
-                if stock_actual < cantidad:
-                    nombre_prod = getattr(it["producto"], "nombre", f"Producto {prod_id}")
-                    nombre_talla = getattr(it["talla"], "nombre", "") if it["talla"] else ""
-                    msg = f"Stock insuficiente para {nombre_prod}"
-                    if nombre_talla:
-                        msg += f" - Talla {nombre_talla}"
-                    msg += f". Disponible: {stock_actual}"
-                    raise serializers.ValidationError({"inventario": msg})
-                # Descontar en memoria solo si no se salta stock
-                self._set_stock_value(inv, stock_actual - cantidad)
-
-            subtotal += (precio * Decimal(cantidad))
-
-        # 3) Guardar inventarios (solo si se descontó)
-        if not skip_stock:
-            for inv in inv_bloq:
-                # guarda el campo correcto
-                if hasattr(inv, "stock_talla"):
-                    inv.save(update_fields=["stock_talla"])
-                elif hasattr(inv, "cantidad"):
-                    inv.save(update_fields=["cantidad"])
-                else:
-                    inv.save()
+        else:
+            try:
+                # el carrito que paga (si la vista lo pasa) puede usar lo que él mismo reservó
+                inventario_stock.descontar(cantidades, referencia=f"factura:{numero}",
+                                           carrito=self.context.get("carrito"))
+            except inventario_stock.StockInsuficiente as e:
+                if e.disponible is None:
+                    raise serializers.ValidationError({"inventario": "No existe inventario para ese producto/talla."})
+                nombre_prod, nombre_talla = nombres[(e.producto_id, e.talla_id)]
+                msg = f"Stock insuficiente para {nombre_prod}"
+                if nombre_talla:
+                    msg += f" - Talla {nombre_talla}"
+                msg += f". Disponible: {e.disponible}"
+                raise serializers.ValidationError({"inventario": msg})
 
         # 4) Totales
         impuestos = Decimal("0.00")   # ajusta si manejas IVA
@@ -991,7 +1023,7 @@ class FacturaItemSerializer(serializers.ModelSerializer):
         p = getattr(obj, "producto", None)
         return getattr(p, "nombre", None) if p else None
 
-class FacturaSerializer(serializers.ModelSerializer):
+class FacturaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     items = serializers.SerializerMethodField()
     cliente_email = serializers.SerializerMethodField()
     fecha = serializers.SerializerMethodField()
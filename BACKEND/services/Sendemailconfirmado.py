@@ -314,8 +314,8 @@ def enviar_email_pedido_confirmado(obj) -> bool:
             from_email=from_email,
             from_name=from_name
         )
-        # Maileroo responde con status_code 200 y un JSON con 'id' si fue exitoso
-        if hasattr(resp, 'status_code') and resp.status_code == 200:
+        # (status, texto): 202 = quedó en la bandeja de salida (lo envía enviar_correos)
+        if isinstance(resp, tuple) and resp[0] < 400:
             return True
         # Si es dict (mock o test), buscar 'id'
         if isinstance(resp, dict) and resp.get('id'):
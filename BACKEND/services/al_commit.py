@@ -0,0 +1,57 @@
+# BACKEND/services/al_commit.py
+"""
+Agenda trabajo para después del commit UNA sola vez por transacción, juntando los
+ids de todas las llamadas (p. ej. un checkout que guarda 10 inventarios dispara
+un solo recálculo).
+
+Los valores pendientes viven en un registro propio por hilo (conexión, etiqueta).
+Cada llamada agenda un callback liviano con transaction.on_commit; el primero que
+corre tras el commit toma todo lo acumulado y borra la entrada, los demás no hacen
+nada. Si hay rollback, Django descarta esos callbacks y con ellos el lote: el
+registro solo guarda una referencia débil, así que un lote sin callbacks vivos no
+se reutiliza en la transacción siguiente.
+"""
+import threading
+import weakref
+
+from django.db import transaction
+
+_local = threading.local()
+
+
+class _Lote:
+    def __init__(self):
+        self.valores = set()
+
+
+def _registro():
+    if not hasattr(_local, 'pendientes'):
+        _local.pendientes = {}
+    return _local.pendientes
+
+
+def acumular(etiqueta, valores, funcion):
+    """
+    Llama `funcion(set_de_valores)` al hacer commit, una vez por transacción y etiqueta.
+    Fuera de una transacción la llama de inmediato.
+    """
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        funcion(set(valores))
+        return
+    registro = _registro()
+    clave = (conn.alias, etiqueta)
+    ref = registro.get(clave)
+    lote = ref() if ref is not None else None
+    if lote is None:
+        lote = _Lote()
+        registro[clave] = weakref.ref(lote)
+    lote.valores.update(valores)
+
+    def _ejecutar():
+        ref = registro.get(clave)
+        if ref is not None and ref() is lote:
+            del registro[clave]
+            funcion(lote.valores)
+    _ejecutar.al_commit_etiqueta = etiqueta
+    transaction.on_commit(_ejecutar)
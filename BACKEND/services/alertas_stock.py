@@ -0,0 +1,128 @@
+# BACKEND/services/alertas_stock.py
+"""
+Alertas de stock bajo por eventos, agrupadas por ventana de tiempo.
+
+- `registrar()`: quien cambia stock_talla pasa (inventario, stock anterior, stock nuevo).
+  Solo los cruces del umbral (en cualquier sentido) quedan como EventoStockBajo, en
+  la misma transacción que el cambio: si hay rollback no queda evento.
+- `despachar()` (comando alertas_stock_bajo): cuando el evento pendiente más viejo
+  ya esperó VENTANA, toma todos los pendientes, relee el stock actual de esos
+  inventarios y manda UN correo agrupado (low_stock_batch_check). Un restock masivo
+  o un pedido grande son un correo, no uno por talla. Los eventos ya enviados se
+  conservan RETENCION (para revisar qué se avisó) y después se borran ahí mismo.
+- `resumir()` (comando resumen_stock_bajo): resumen periódico solo con los
+  inventarios cuyo estado de alerta (LowStockAlert.en_alerta) cambió desde el último
+  resumen. La marca de agua es LowStockAlert.resumido; no recorre todo Inventario.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from BACKEND.models import EventoStockBajo, Inventario, LowStockAlert
+from BACKEND.services.stock_alerts_core import (
+    DIGEST_MAX_ITEMS, LOW_STOCK_UMBRAL, _admin_emails, _item_ctx, _table_html, build_digest_html,
+    low_stock_batch_check,
+)
+from BACKEND.utils_email import send_email_raw
+
+
+RETENCION = timedelta(days=7)
+
+
+def ventana():
+    return timedelta(seconds=getattr(settings, 'LOW_STOCK_VENTANA_SEGUNDOS', 300))
+
+
+def registrar(filas, umbral=LOW_STOCK_UMBRAL):
+    """filas: [(inventario_id, stock_anterior, stock_nuevo)]. Devuelve cuántos eventos anotó."""
+    eventos = [
+        EventoStockBajo(inventario_id=inventario_id, stock_anterior=anterior, stock_nuevo=nuevo)
+        for inventario_id, anterior, nuevo in filas
+        if anterior is not None and (anterior < umbral) != (nuevo < umbral)
+    ]
+    if eventos:
+        EventoStockBajo.objects.bulk_create(eventos)
+    return len(eventos)
+
+
+def despachar(espera=None, ahora=None):
+    """
+    Manda el correo agrupado si la ventana ya se cumplió.
+    Devuelve {'eventos', 'avisados'} o None si no hay nada o todavía hay que esperar.
+    """
+    ahora = ahora or timezone.now()
+    espera = ventana() if espera is None else espera
+    pendientes = EventoStockBajo.objects.filter(enviado__isnull=True)
+    primero = pendientes.order_by('creado').values_list('creado', flat=True).first()
+    if primero is None or primero > ahora - espera:
+        return None
+    with transaction.atomic():
+        qs = pendientes.filter(creado__lte=ahora).order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        eventos = list(qs.values_list('pk', 'inventario_id'))
+        if not eventos:
+            return None
+        EventoStockBajo.objects.filter(pk__in=[pk for pk, _ in eventos]).update(enviado=ahora)
+        # el stock de ahora decide: lo que bajó y volvió a subir dentro de la ventana no se avisa
+        inventarios = list(
+            Inventario.objects.filter(pk__in={inventario_id for _, inventario_id in eventos})
+            .select_related('producto__subcategoria__categoria', 'talla__grupo')
+            .order_by('pk')
+        )
+        avisados = low_stock_batch_check(inventarios)
+    # la tabla no crece sin límite: un DELETE por el índice de enviado
+    EventoStockBajo.objects.filter(enviado__lt=ahora - RETENCION).delete()
+    return {'eventos': len(eventos), 'avisados': avisados}
+
+
+def _reclamar_cambios(lote, ahora):
+    # se llama dentro de la transacción de resumir(): el bloqueo dura hasta encolar el correo
+    qs = (LowStockAlert.objects
+          .filter(resumido__isnull=True, estado_cambiado__isnull=False, estado_cambiado__lte=ahora)
+          .order_by('estado_cambiado', 'pk'))
+    if connection.features.has_select_for_update_skip_locked:
+        qs = qs.select_for_update(skip_locked=True)
+    ids = list(qs.values_list('pk', flat=True)[:lote])
+    LowStockAlert.objects.filter(pk__in=ids).update(resumido=ahora)
+    return ids
+
+
+def resumir(lote=DIGEST_MAX_ITEMS, umbral=LOW_STOCK_UMBRAL, ahora=None):
+    """
+    Manda un correo por cada `lote` de inventarios que cambiaron de estado desde el
+    último resumen (los que entraron en alerta y los que se recuperaron), y los marca
+    como resumidos. Devuelve {'correos', 'bajos', 'recuperados'}.
+
+    Reclamar, armar y encolar cada lote va en la misma transacción (send_email_raw solo
+    inserta en la bandeja de salida): si algo falla, las filas siguen sin resumir.
+    """
+    ahora = ahora or timezone.now()
+    resultado = {'correos': 0, 'bajos': 0, 'recuperados': 0}
+    destinatarios = None
+    while True:
+        with transaction.atomic():
+            ids = _reclamar_cambios(lote, ahora)
+            if not ids:
+                return resultado
+            bajos, recuperados = [], []
+            alertas = (LowStockAlert.objects.filter(pk__in=ids)
+                       .select_related('inventario__producto__subcategoria__categoria', 'inventario__talla__grupo')
+                       .order_by('inventario__stock_talla', 'pk'))
+            for alerta in alertas.iterator(chunk_size=200):
+                (bajos if alerta.en_alerta else recuperados).append(alerta.inventario)
+            html, _ = build_digest_html(umbral, bajos)
+            if recuperados:
+                html += _table_html([_item_ctx(i) for i in recuperados], title="Recuperados desde el último resumen")
+            if destinatarios is None:
+                destinatarios = _admin_emails()
+            send_email_raw(
+                subject=f"[Resumen] Stock bajo: {len(bajos)} nuevos, {len(recuperados)} recuperados",
+                to_emails=destinatarios,
+                html_body=html,
+            )
+        resultado['correos'] += 1
+        resultado['bajos'] += len(bajos)
+        resultado['recuperados'] += len(recuperados)
@@ -0,0 +1,180 @@
+# BACKEND/services/autocompletado.py
+"""
+Índice de prefijos en memoria para el autocompletado del buscador.
+
+Lista ordenada de (clave_normalizada, tipo, id) consultada con bisect: cada
+nombre entra una vez por palabra ("blusa roja" y "roja"), así que "roj" también
+encuentra "Blusa roja". Sin LIKE '%x%' contra la base.
+
+- Las señales de Producto/Subcategoria/Categoria lo actualizan de forma
+  incremental (después del commit) en el proceso que hizo el cambio.
+- Los demás workers de gunicorn no reciben esas señales: a lo sumo cada
+  AUTOCOMPLETADO_REVISION_SEGUNDOS una consulta compara las versiones de
+  CatalogoVersion con las del índice y, si otro proceso cambió algo, lo reconstruye
+  (3 consultas). Entre revisiones la respuesta no toca la base.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import transaction
+
+from BACKEND.models import Categoria, Subcategoria, Producto
+from BACKEND.services import catalogo_cache
+
+PRODUCTO = 'producto'
+SUBCATEGORIA = 'subcategoria'
+CATEGORIA = 'categoria'
+TIPOS = (PRODUCTO, SUBCATEGORIA, CATEGORIA)
+
+LIMITE_DEFAULT = 8
+LIMITE_MAX = 20
+MAX_CLAVES_REVISADAS = 500
+
+
+def normalizar(texto):
+    """minúsculas, sin tildes y solo letras/números separados por un espacio."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = ''.join(c if c.isalnum() else ' ' for c in texto)
+    return ' '.join(texto.split())
+
+
+def _claves(nombre):
+    palabras = normalizar(nombre).split()
+    return [' '.join(palabras[i:]) for i in range(len(palabras))]
+
+
+class IndicePrefijos:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._claves = []        # [(clave, tipo, id)] ordenada
+        self._entradas = {}      # (tipo, id) -> (nombre, [claves])
+        self.versiones = None    # versiones de CatalogoVersion con las que se armó
+        self.revisado = None     # time.monotonic() de la última comparación de versiones
+
+    def reconstruir(self, versiones):
+        entradas, claves = {}, []
+        fuentes = (
+            (PRODUCTO, Producto.objects.values_list('id', 'nombre')),
+            (SUBCATEGORIA, Subcategoria.objects.filter(estado=True).values_list('idSubcategoria', 'nombre')),
+            (CATEGORIA, Categoria.objects.filter(estado=True).values_list('idCategoria', 'nombre')),
+        )
+        for tipo, filas in fuentes:
+            for pk, nombre in filas:
+                propias = _claves(nombre)
+                entradas[(tipo, pk)] = (nombre, propias)
+                claves.extend((c, tipo, pk) for c in propias)
+        claves.sort()
+        with self._lock:
+            self._claves, self._entradas, self.versiones = claves, entradas, versiones
+
+    def quitar(self, tipo, pk):
+        with self._lock:
+            _, propias = self._entradas.pop((tipo, pk), (None, []))
+            for clave in propias:
+                i = bisect_left(self._claves, (clave, tipo, pk))
+                if i < len(self._claves) and self._claves[i] == (clave, tipo, pk):
+                    del self._claves[i]
+
+    def poner(self, tipo, pk, nombre):
+        with self._lock:
+            self.quitar(tipo, pk)
+            propias = _claves(nombre)
+            self._entradas[(tipo, pk)] = (nombre, propias)
+            for clave in propias:
+                insort(self._claves, (clave, tipo, pk))
+
+    def buscar(self, texto, limite=LIMITE_DEFAULT):
+        prefijo = normalizar(texto)
+        resultado = {tipo: [] for tipo in TIPOS}
+        if not prefijo:
+            return resultado
+        vistos = set()
+        with self._lock:
+            i = bisect_left(self._claves, (prefijo,))
+            fin = min(len(self._claves), i + MAX_CLAVES_REVISADAS)
+            while i < fin:
+                clave, tipo, pk = self._claves[i]
+                if not clave.startswith(prefijo):
+                    break
+                i += 1
+                if (tipo, pk) in vistos or len(resultado[tipo]) >= limite:
+                    continue
+                vistos.add((tipo, pk))
+                resultado[tipo].append({'id': pk, 'nombre': self._entradas[(tipo, pk)][0]})
+        return resultado
+
+
+_indice = IndicePrefijos()
+
+
+def _versiones_actuales():
+    return catalogo_cache.versiones(TIPOS)
+
+
+def _toca_revisar(ahora):
+    if _indice.versiones is None or _indice.revisado is None:
+        return True
+    return ahora - _indice.revisado >= getattr(settings, 'AUTOCOMPLETADO_REVISION_SEGUNDOS', 5)
+
+
+def autocompletar(texto, limite=LIMITE_DEFAULT):
+    ahora = time.monotonic()
+    if _toca_revisar(ahora):
+        versiones = _versiones_actuales()
+        if versiones != _indice.versiones:
+            _indice.reconstruir(versiones)
+        _indice.revisado = ahora
+    return _indice.buscar(texto, min(max(int(limite), 1), LIMITE_MAX))
+
+
+def _tipo_de(instance):
+    if isinstance(instance, Producto):
+        return PRODUCTO
+    if isinstance(instance, Subcategoria):
+        return SUBCATEGORIA
+    if isinstance(instance, Categoria):
+        return CATEGORIA
+    return None
+
+
+def _aplicar(cambio, tipo):
+    """
+    Aplica el cambio local. Se registra después del bump de la versión (mismo commit),
+    así que si la versión subió exactamente 1 el único cambio es el nuestro y el índice
+    sigue al día; si subió más, otro proceso cambió algo y la próxima consulta reconstruye.
+    """
+    if _indice.versiones is None:
+        return  # aún no se armó: la primera consulta lo construye completo
+    cambio()
+    previas = _indice.versiones
+    actuales = _versiones_actuales()
+    if actuales[tipo] == previas.get(tipo, 0) + 1 and all(
+        actuales[t] == previas.get(t, 0) for t in TIPOS if t != tipo
+    ):
+        _indice.versiones = actuales
+
+
+def al_guardar(instance):
+    tipo = _tipo_de(instance)
+    if tipo is None:
+        return
+    pk, nombre = instance.pk, instance.nombre
+    activo = getattr(instance, 'estado', True)
+    if activo:
+        cambio = lambda: _indice.poner(tipo, pk, nombre)
+    else:
+        cambio = lambda: _indice.quitar(tipo, pk)
+    transaction.on_commit(lambda: _aplicar(cambio, tipo))
+
+
+def al_borrar(instance):
+    tipo = _tipo_de(instance)
+    if tipo is None:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: _aplicar(lambda: _indice.quitar(tipo, pk), tipo))
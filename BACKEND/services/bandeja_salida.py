@@ -0,0 +1,80 @@
+# BACKEND/services/bandeja_salida.py
+"""
+Bandeja de salida de correos (CorreoSaliente).
+
+- `encolar()` es lo único que corre dentro de la petición: un INSERT. Si la petición
+  está en una transacción, el correo se confirma o se descarta junto con ella.
+- `despachar()` (comando enviar_correos) toma los pendientes cuyo turno llegó, los
+  reserva un rato (RECLAMO) para que otro worker no los repita y los manda a Maileroo.
+  Error de red, 5xx o 429: reintento con espera exponencial hasta MAX_INTENTOS.
+  Otro 4xx no se arregla reintentando: queda como fallido de una vez.
+"""
+import logging
+from datetime import timedelta
+
+import requests
+from django.db import connection, transaction
+from django.utils import timezone
+
+from BACKEND.models import CorreoSaliente
+from BACKEND.utils_email import enviar_a_maileroo
+
+logger = logging.getLogger(__name__)
+
+LOTE = 50
+MAX_INTENTOS = 6
+ESPERA_BASE = timedelta(seconds=30)
+ESPERA_MAX = timedelta(hours=1)
+RECLAMO = timedelta(minutes=5)
+
+
+def encolar(payload):
+    return CorreoSaliente.objects.create(asunto=(payload.get('subject') or '')[:255], payload=payload)
+
+
+def espera(intentos):
+    """30 s, 1 min, 2 min, ... hasta ESPERA_MAX."""
+    return min(ESPERA_BASE * (2 ** max(0, intentos - 1)), ESPERA_MAX)
+
+
+def _reclamar(lote, ahora):
+    with transaction.atomic():
+        qs = (CorreoSaliente.objects
+              .filter(estado=CorreoSaliente.PENDIENTE, proximo_intento__lte=ahora)
+              .order_by('proximo_intento', 'pk'))
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        correos = list(qs[:lote])
+        # si el worker muere a mitad de lote, vuelven a estar disponibles al vencer el reclamo
+        CorreoSaliente.objects.filter(pk__in=[c.pk for c in correos]).update(proximo_intento=ahora + RECLAMO)
+    return correos
+
+
+def _enviar(correo):
+    try:
+        codigo, texto = enviar_a_maileroo(correo.payload)
+    except requests.RequestException as e:
+        return None, f'{type(e).__name__}: {e}'
+    return codigo, '' if codigo < 400 else f'HTTP {codigo}: {texto[:500]}'
+
+
+def despachar(lote=LOTE):
+    """Manda un lote. Devuelve {'enviados', 'reintentos', 'fallidos'}."""
+    resultado = {'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+    for correo in _reclamar(lote, timezone.now()):
+        codigo, error = _enviar(correo)
+        ahora = timezone.now()
+        correo.intentos += 1
+        correo.ultimo_error = error
+        if not error:
+            correo.estado, correo.enviado = CorreoSaliente.ENVIADO, ahora
+            resultado['enviados'] += 1
+        elif (codigo is not None and codigo < 500 and codigo != 429) or correo.intentos >= MAX_INTENTOS:
+            correo.estado = CorreoSaliente.FALLIDO
+            resultado['fallidos'] += 1
+            logger.error('Correo %s descartado tras %s intentos: %s', correo.pk, correo.intentos, error)
+        else:
+            correo.proximo_intento = ahora + espera(correo.intentos)
+            resultado['reintentos'] += 1
+        correo.save(update_fields=['estado', 'intentos', 'ultimo_error', 'enviado', 'proximo_intento'])
+    return resultado
@@ -0,0 +1,178 @@
+# BACKEND/services/busqueda.py
+"""
+Búsqueda de texto completo sobre Producto.nombre / Producto.descripcion.
+
+- MySQL: MATCH ... AGAINST en modo BOOLEAN sobre los índices FULLTEXT de la
+  migración 0006 (el nombre pesa más que la descripción).
+- SQLite (tests): tabla FTS5 BACKEND_producto_fts con ranking bm25.
+
+Resultados rankeados, total y facetas (categoría, subcategoría y tallas con
+stock) salen de UNA sola sentencia: un CTE con los aciertos y un UNION ALL.
+"""
+import re
+
+from django.db import connection
+
+from BACKEND.models import Categoria, Subcategoria, Talla, Producto, Inventario
+
+MAX_TERMINOS = 8
+LIMITE_DEFAULT = 24
+LIMITE_MAX = 100
+
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+
+
+# Tabla FTS5 y triggers de SQLite. La migración 0006 las crea con estas mismas
+# sentencias; como SQLite reconstruye la tabla en cada AddField/AlterField y con eso
+# borra los triggers, también se reinstalan (idempotente) después de cada migrate.
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS BACKEND_producto_fts USING fts5(
+        nombre, descripcion,
+        content='BACKEND_producto', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS BACKEND_producto_fts_ai AFTER INSERT ON BACKEND_producto BEGIN
+        INSERT INTO BACKEND_producto_fts(rowid, nombre, descripcion)
+        VALUES (new.id, new.nombre, new.descripcion);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS BACKEND_producto_fts_ad AFTER DELETE ON BACKEND_producto BEGIN
+        INSERT INTO BACKEND_producto_fts(BACKEND_producto_fts, rowid, nombre, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.descripcion);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS BACKEND_producto_fts_au AFTER UPDATE ON BACKEND_producto BEGIN
+        INSERT INTO BACKEND_producto_fts(BACKEND_producto_fts, rowid, nombre, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.descripcion);
+        INSERT INTO BACKEND_producto_fts(rowid, nombre, descripcion)
+        VALUES (new.id, new.nombre, new.descripcion);
+    END""",
+    "INSERT INTO BACKEND_producto_fts(BACKEND_producto_fts) VALUES ('rebuild')",
+]
+
+
+def asegurar_indice_sqlite(using='default', **kwargs):
+    """Receptor de post_migrate: deja la tabla FTS5 y sus triggers en su lugar (solo SQLite)."""
+    from django.db import connections
+    conn = connections[using]
+    if conn.vendor != 'sqlite' or Producto._meta.db_table not in conn.introspection.table_names():
+        return
+    with conn.cursor() as cursor:
+        for sql in SQLITE_FTS:
+            cursor.execute(sql)
+
+
+def terminos(texto):
+    """Palabras de la consulta (sin operadores del motor), como máximo MAX_TERMINOS."""
+    return _PALABRA.findall(texto or '')[:MAX_TERMINOS]
+
+
+def _aciertos_sql(palabras):
+    """SELECT id, score de los productos que contienen TODAS las palabras (como prefijo)."""
+    producto = Producto._meta.db_table
+    vendor = connection.vendor
+    if vendor == 'mysql':
+        expr = ' '.join(f'+{p}*' for p in palabras)
+        sql = (
+            f"SELECT p.id AS id, "
+            f"MATCH(p.nombre) AGAINST (%s IN BOOLEAN MODE) * 3 "
+            f"+ MATCH(p.nombre, p.descripcion) AGAINST (%s IN BOOLEAN MODE) AS score "
+            f"FROM {producto} p "
+            f"WHERE MATCH(p.nombre, p.descripcion) AGAINST (%s IN BOOLEAN MODE)"
+        )
+        return sql, [expr, expr, expr]
+    if vendor == 'sqlite':
+        expr = ' '.join('"%s"*' % p.replace('"', '') for p in palabras)
+        fts = f'{producto}_fts'
+        sql = (
+            f"SELECT p.id AS id, -bm25({fts}, 10.0, 1.0) AS score "
+            f"FROM {fts} JOIN {producto} p ON p.id = {fts}.rowid "
+            f"WHERE {fts} MATCH %s"
+        )
+        return sql, [expr]
+    # Otros motores: sin índice, LIKE por palabra (solo para no romper en desarrollo)
+    condiciones, params = [], []
+    for p in palabras:
+        condiciones.append("(p.nombre LIKE %s OR p.descripcion LIKE %s)")
+        params += [f'%{p}%', f'%{p}%']
+    sql = f"SELECT p.id AS id, 1.0 AS score FROM {producto} p WHERE " + ' AND '.join(condiciones)
+    return sql, params
+
+
+def buscar(texto, limite=LIMITE_DEFAULT, categoria=None, subcategoria=None, talla=None):
+    """
+    Devuelve {'total', 'resultados': [(producto_id, score)], 'facetas': {...}}.
+    Los filtros opcionales recortan tanto los resultados como las facetas.
+    """
+    vacio = {'total': 0, 'resultados': [], 'facetas': {'categoria': [], 'subcategoria': [], 'talla': []}}
+    palabras = terminos(texto)
+    if not palabras:
+        return vacio
+
+    producto = Producto._meta.db_table
+    sub_t, sub_pk = Subcategoria._meta.db_table, Subcategoria._meta.pk.column
+    cat_t, cat_pk = Categoria._meta.db_table, Categoria._meta.pk.column
+    talla_t, inv_t = Talla._meta.db_table, Inventario._meta.db_table
+    sub_grupo = Subcategoria._meta.get_field('grupoTalla').column
+
+    hits_sql, params = _aciertos_sql(palabras)
+    if subcategoria:
+        hits_sql += " AND p.subcategoria_id = %s"
+        params.append(subcategoria)
+    if categoria:
+        hits_sql += f" AND p.subcategoria_id IN (SELECT {sub_pk} FROM {sub_t} WHERE categoria_id = %s)"
+        params.append(categoria)
+    if talla:
+        # como la faceta: solo si la talla es del grupo actual de la subcategoría
+        hits_sql += (f" AND EXISTS (SELECT 1 FROM {inv_t} i"
+                     f" JOIN {talla_t} t ON t.id = i.talla_id"
+                     f" JOIN {sub_t} s ON s.{sub_pk} = p.subcategoria_id AND s.{sub_grupo} = t.grupo_id"
+                     f" WHERE i.producto_id = p.id AND i.talla_id = %s AND i.stock_talla > 0)")
+        params.append(talla)
+
+    sql = f"""
+        WITH hits AS ({hits_sql}),
+        top AS (SELECT id, score FROM hits ORDER BY score DESC, id LIMIT %s)
+        SELECT 'producto' AS tipo, id, '' AS nombre, score AS valor FROM top
+        UNION ALL
+        SELECT 'total', 0, '', COUNT(*) FROM hits
+        UNION ALL
+        SELECT 'categoria', c.{cat_pk}, c.nombre, COUNT(*)
+          FROM hits h
+          JOIN {producto} p ON p.id = h.id
+          JOIN {sub_t} s ON s.{sub_pk} = p.subcategoria_id
+          JOIN {cat_t} c ON c.{cat_pk} = s.categoria_id
+         GROUP BY c.{cat_pk}, c.nombre
+        UNION ALL
+        SELECT 'subcategoria', s.{sub_pk}, s.nombre, COUNT(*)
+          FROM hits h
+          JOIN {producto} p ON p.id = h.id
+          JOIN {sub_t} s ON s.{sub_pk} = p.subcategoria_id
+         GROUP BY s.{sub_pk}, s.nombre
+        UNION ALL
+        SELECT 'talla', t.id, t.nombre, COUNT(DISTINCT i.producto_id)
+          FROM hits h
+          JOIN {producto} p ON p.id = h.id
+          JOIN {sub_t} s ON s.{sub_pk} = p.subcategoria_id
+          JOIN {inv_t} i ON i.producto_id = h.id AND i.stock_talla > 0
+          -- solo tallas del grupo actual de la subcategoría (no inventarios de un grupo anterior)
+          JOIN {talla_t} t ON t.id = i.talla_id AND t.grupo_id = s.{sub_grupo} AND t.estado = %s
+         GROUP BY t.id, t.nombre
+    """
+    params += [min(max(int(limite), 1), LIMITE_MAX), True]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        filas = cursor.fetchall()
+
+    resultado = vacio
+    for tipo, pk, nombre, valor in filas:
+        if tipo == 'producto':
+            resultado['resultados'].append((pk, float(valor)))
+        elif tipo == 'total':
+            resultado['total'] = int(valor)
+        else:
+            resultado['facetas'][tipo].append({'id': pk, 'nombre': nombre, 'total': int(valor)})
+    # UNION ALL no garantiza orden entre ramas
+    resultado['resultados'].sort(key=lambda r: (-r[1], r[0]))
+    for lista in resultado['facetas'].values():
+        lista.sort(key=lambda f: (-f['total'], f['nombre']))
+    return resultado
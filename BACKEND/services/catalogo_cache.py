@@ -0,0 +1,122 @@
+# BACKEND/services/catalogo_cache.py
+"""
+Cache de lectura del catálogo público con invalidación por versión.
+
+Cada modelo del catálogo tiene una fila en CatalogoVersion. Las señales llaman
+a `bump()` cuando algo cambia y las vistas arman la clave de cache con las
+versiones que les afectan: si cambió algo, la clave es otra y el payload viejo
+simplemente deja de leerse (nunca se sirve desactualizado).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from BACKEND.models import CatalogoVersion, Producto, Subcategoria
+from BACKEND.services import al_commit
+
+PRODUCTO = 'producto'
+INVENTARIO = 'inventario'
+CATEGORIA = 'categoria'
+SUBCATEGORIA = 'subcategoria'
+TALLA = 'talla'
+GRUPO_TALLA = 'grupotalla'
+
+CACHE_ALIAS = 'catalogo'
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def versiones(nombres):
+    """Devuelve {nombre: version} en una sola consulta (0 si aún no existe la fila)."""
+    nombres = list(nombres)
+    actuales = dict(
+        CatalogoVersion.objects.filter(nombre__in=nombres).values_list('nombre', 'version')
+    )
+    return {n: actuales.get(n, 0) for n in nombres}
+
+
+def _incrementar(nombres):
+    nombres = set(nombres)
+    actualizados = CatalogoVersion.objects.filter(nombre__in=nombres).update(
+        version=F('version') + 1, actualizado=timezone.now()
+    )
+    if actualizados == len(nombres):
+        return
+    existentes = set(CatalogoVersion.objects.filter(nombre__in=nombres).values_list('nombre', flat=True))
+    for nombre in nombres - existentes:
+        try:
+            with transaction.atomic():
+                CatalogoVersion.objects.create(nombre=nombre, version=1)
+        except IntegrityError:
+            # otro worker la creó primero: basta con incrementarla
+            CatalogoVersion.objects.filter(nombre=nombre).update(version=F('version') + 1)
+
+
+def bump(*nombres):
+    """
+    Marca como cambiados los modelos indicados.
+
+    El incremento se difiere al commit: así no se bloquea la fila del contador
+    mientras dura la transacción (p. ej. un checkout) y, si hay rollback, no se
+    invalida nada.
+    """
+    if nombres:
+        transaction.on_commit(lambda: _incrementar(nombres))
+
+
+# ---- Versión por categoría (shards del snapshot estático, ver exportar_catalogo) ----
+def clave_categoria(pk):
+    return f'{CATEGORIA}:{pk}'
+
+
+def marcar_categorias(categoria_ids):
+    bump(*[clave_categoria(pk) for pk in set(categoria_ids) if pk])
+
+
+def _por_subcategorias(ids):
+    categorias = Subcategoria.objects.filter(pk__in=ids).values_list('categoria_id', flat=True).distinct()
+    claves = [clave_categoria(pk) for pk in categorias]
+    if claves:
+        _incrementar(claves)
+
+
+def _por_productos(ids):
+    categorias = (Producto.objects.filter(pk__in=ids)
+                  .values_list('subcategoria__categoria_id', flat=True).distinct())
+    claves = [clave_categoria(pk) for pk in categorias]
+    if claves:
+        _incrementar(claves)
+
+
+def marcar_subcategorias(subcategoria_ids):
+    """Marca las categorías de esas subcategorías (se resuelven en 1 consulta al commit)."""
+    al_commit.acumular('catalogo-subcategorias', [pk for pk in subcategoria_ids if pk], _por_subcategorias)
+
+
+def marcar_productos(producto_ids):
+    """Marca las categorías de esos productos (se resuelven en 1 consulta al commit)."""
+    al_commit.acumular('catalogo-productos', [pk for pk in producto_ids if pk], _por_productos)
+
+
+def clave(prefijo, vers, *partes):
+    crudo = '|'.join([prefijo] + [f'{k}={vers[k]}' for k in sorted(vers)] + [str(p) for p in partes])
+    return f'catalogo:{prefijo}:' + hashlib.sha1(crudo.encode('utf-8')).hexdigest()
+
+
+def etag(key):
+    """ETag fuerte: cambia si cambia cualquier versión o la URL (misma info que la clave)."""
+    return '"%s"' % key.rsplit(':', 1)[-1]
+
+
+def obtener(key):
+    return _cache().get(key)
+
+
+def guardar(key, valor):
+    _cache().set(key, valor, timeout=getattr(settings, 'CATALOGO_CACHE_TTL', 60 * 60 * 24))
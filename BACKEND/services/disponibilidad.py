@@ -0,0 +1,107 @@
+# BACKEND/services/disponibilidad.py
+"""
+Resumen de disponibilidad por producto (columnas Producto.stock y stock_bajo), para
+que el catálogo filtre sin unir Inventario con Talla. El filtro por talla con stock
+es un EXISTS sobre el índice (talla, stock_talla, producto) de Inventario.
+
+Solo cuentan los inventarios de las tallas del grupo actual de la subcategoría
+(lo mismo que hacen stock_producto / tabla_productos). Cambiar el grupo no borra los
+inventarios del anterior (conservan stock y libro de movimientos): el catálogo, el
+snapshot, las reservas y el checkout los descartan con `del_grupo_vigente()` /
+`tallas_vigentes()`. Las señales de Inventario llaman a `programar()`; el recálculo
+corre una vez por producto al hacer commit.
+"""
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+
+from BACKEND.models import Producto, Inventario, Talla
+from BACKEND.services import al_commit
+
+
+def del_grupo_vigente(inventarios):
+    """Solo los inventarios cuya talla es del grupo actual de la subcategoría del producto."""
+    return inventarios.filter(talla__grupo=F('producto__subcategoria__grupoTalla'))
+
+
+def tallas_vigentes(producto_id):
+    """
+    Subconsulta con las tallas del grupo actual del producto, para un `talla_id__in`.
+    No une Inventario consigo mismo: sirve en un UPDATE o un SELECT ... FOR UPDATE
+    sin bloquear las filas de Producto, Subcategoría ni Talla.
+    """
+    return Talla.objects.filter(grupo__subcategorias__productos=producto_id).values('pk')
+
+
+def es_stock_bajo(total, minimo):
+    """
+    Definición única de stock bajo de un producto: el stock de las tallas del grupo
+    actual no supera la suma de sus mínimos. De aquí sale Producto.stock_bajo, y con
+    esa columna cuentan las tablas de inventario (contar_stock_bajo).
+    """
+    return (total or 0) <= (minimo or 0)
+
+
+def contar_stock_bajo(productos, filtro=None):
+    """Count() para annotate: productos en stock bajo; `productos` es la ruta hasta Producto."""
+    condicion = Q(**{f'{productos}__stock_bajo': True})
+    return Count(productos, filter=condicion if filtro is None else filtro & condicion, distinct=True)
+
+
+def resumir(filas):
+    """filas: (stock_talla, stockMinimo) del grupo actual -> (stock, stock_bajo)."""
+    total = minimo = 0
+    for stock_talla, stock_minimo in filas:
+        total += stock_talla or 0
+        minimo += stock_minimo or 0
+    return total, es_stock_bajo(total, minimo)
+
+
+def recalcular(producto_ids):
+    """
+    Recalcula el resumen de los productos dados (1 lock + 1 lectura + bulk_update).
+
+    Bloquea las filas de Producto antes de leer el inventario: si dos transacciones
+    tocaron el mismo producto, la segunda espera y lee el stock ya confirmado de la
+    primera, así ninguna pisa el total con un valor viejo.
+    """
+    ids = sorted({int(pk) for pk in producto_ids if pk})
+    if not ids:
+        return 0
+    with transaction.atomic():
+        productos = list(
+            Producto.objects.select_for_update()
+            .filter(id__in=ids).order_by('id')
+            .only('id', 'stock', 'stock_bajo')
+        )
+        filas = {}
+        for producto_id, stock_talla, stock_minimo in (
+            del_grupo_vigente(Inventario.objects.filter(producto_id__in=ids))
+            .values_list('producto_id', 'stock_talla', 'stockMinimo')
+        ):
+            filas.setdefault(producto_id, []).append((stock_talla, stock_minimo))
+
+        cambiados = []
+        for producto in productos:
+            nuevo = resumir(filas.get(producto.id, []))
+            if nuevo != (producto.stock, producto.stock_bajo):
+                producto.stock, producto.stock_bajo = nuevo
+                cambiados.append(producto)
+        if cambiados:
+            Producto.objects.bulk_update(cambiados, ['stock', 'stock_bajo'])
+    return len(cambiados)
+
+
+def programar(producto_ids):
+    """Agenda el recálculo para después del commit, una sola vez por transacción."""
+    al_commit.acumular('disponibilidad', producto_ids, recalcular)
+
+
+def con_stock_en_talla(productos, talla_id):
+    """
+    Productos con stock en la talla dada, contando solo si la talla es del grupo actual
+    de su subcategoría: un EXISTS por producto sobre el índice (talla, stock_talla, producto).
+    """
+    return productos.filter(
+        Exists(Inventario.objects.filter(producto=OuterRef('pk'), talla_id=talla_id, stock_talla__gt=0)),
+        subcategoria__grupoTalla_id__in=Talla.objects.filter(pk=talla_id).values('grupo_id'),
+    )
@@ -0,0 +1,102 @@
+# BACKEND/services/http_client.py
+"""
+Cliente HTTP compartido para las APIs externas (Maileroo, Mercado Pago).
+
+- Una requests.Session por proceso: urllib3 guarda un pool de conexiones por host
+  y las reutiliza (keep-alive), así que solo la primera llamada a cada host paga
+  TCP + TLS. Se crea al primer uso, después del fork de gunicorn.
+- Timeouts explícitos (conexión, lectura) en todas las llamadas; sin reintentos
+  automáticos: cada llamador decide (p. ej. bandeja_salida reintenta con espera).
+- Métricas por endpoint (llamadas, errores, latencia total y máxima) en memoria
+  del proceso: `metricas()`.
+"""
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = (3.05, 15)  # (conectar, leer) en segundos
+
+_lock = threading.Lock()
+_sesion = None
+_metricas = {}
+
+
+def sesion():
+    global _sesion
+    if _sesion is None:
+        with _lock:
+            if _sesion is None:
+                s = requests.Session()
+                adaptador = HTTPAdapter(
+                    pool_connections=getattr(settings, 'HTTP_POOL_HOSTS', 10),
+                    pool_maxsize=getattr(settings, 'HTTP_POOL_MAXSIZE', 10),
+                    max_retries=0,
+                )
+                s.mount('https://', adaptador)
+                s.mount('http://', adaptador)
+                _sesion = s
+    return _sesion
+
+
+def cerrar():
+    """Cierra las conexiones abiertas (tests, benchmark)."""
+    global _sesion
+    with _lock:
+        if _sesion is not None:
+            _sesion.close()
+        _sesion = None
+
+
+def _registrar(endpoint, segundos, error):
+    with _lock:
+        m = _metricas.setdefault(endpoint, {'llamadas': 0, 'errores': 0, 'segundos': 0.0, 'max': 0.0})
+        m['llamadas'] += 1
+        m['errores'] += int(error)
+        m['segundos'] += segundos
+        m['max'] = max(m['max'], segundos)
+
+
+def metricas():
+    """{endpoint: {'llamadas', 'errores', 'segundos', 'max', 'promedio'}} de este proceso."""
+    with _lock:
+        return {
+            endpoint: dict(m, promedio=m['segundos'] / m['llamadas'] if m['llamadas'] else 0.0)
+            for endpoint, m in _metricas.items()
+        }
+
+
+def reiniciar_metricas():
+    with _lock:
+        _metricas.clear()
+
+
+def request(method, url, endpoint, timeout=None, **kwargs):
+    """
+    requests.request sobre la sesión compartida. `endpoint` es el nombre con el que
+    se agrupan las métricas ('maileroo.emails', 'mp.payments', ...). Los errores de
+    red se propagan igual que con requests; un 4xx/5xx cuenta como error en las métricas.
+    """
+    inicio = time.perf_counter()
+    error = True
+    try:
+        respuesta = sesion().request(method, url, timeout=timeout or TIMEOUT, **kwargs)
+        error = respuesta.status_code >= 400
+        return respuesta
+    finally:
+        segundos = time.perf_counter() - inicio
+        _registrar(endpoint, segundos, error)
+        logger.debug('%s %s %s %.1f ms', endpoint, method, url, segundos * 1000)
+
+
+def get(url, endpoint, **kwargs):
+    return request('GET', url, endpoint, **kwargs)
+
+
+def post(url, endpoint, **kwargs):
+    return request('POST', url, endpoint, **kwargs)
@@ -0,0 +1,283 @@
+# BACKEND/services/inventario_stock.py
+"""
+Escrituras de stock por lote sobre Inventario (stock_talla / stockMinimo).
+
+- actualizar(): edición del admin (valores absolutos) con un solo lock.
+- descontar(): checkout; UPDATE condicional por (producto, talla), sin leer antes.
+- sincronizar_tallas(): crea de una vez los inventarios que le faltan a una subcategoría.
+- agregar_talla(): lo mismo para una talla nueva en todos los productos de su grupo, por tandas.
+- completar_tallas_pendientes(): agregar_talla() de las tallas que quedaron marcadas al crearse.
+
+bulk_update no dispara post_save, así que aquí se hace en bloque lo mismo que la
+señal de Inventario hace fila por fila: invalidar la cache del catálogo, recalcular
+el resumen de los productos y anotar los cruces del umbral de stock bajo
+(services/alertas_stock.py), estos últimos en un solo INSERT por lote.
+"""
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from BACKEND.models import Inventario, Movimiento, Producto, ReservaStock, Talla
+from BACKEND.services import alertas_stock, catalogo_cache, disponibilidad, movimientos, reservas
+
+LOTE_MAX = 1000
+
+
+def _entero_no_negativo(valor, campo, i):
+    if isinstance(valor, bool):
+        raise ValidationError({'items': f'items[{i}].{campo} debe ser un entero'})
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise ValidationError({'items': f'items[{i}].{campo} debe ser un entero'})
+    if valor < 0:
+        raise ValidationError({'items': f'items[{i}].{campo} no puede ser negativo'})
+    return valor
+
+
+def normalizar_items(items):
+    """[{producto_id, talla_id, stock, stock_minimo}] -> {(producto_id, talla_id): (stock, stock_minimo)}"""
+    if not isinstance(items, list) or not items:
+        raise ValidationError({'items': 'Se requiere una lista de ítems'})
+    if len(items) > LOTE_MAX:
+        raise ValidationError({'items': f'Máximo {LOTE_MAX} ítems por lote'})
+    cambios = {}
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValidationError({'items': f'items[{i}] debe ser un objeto'})
+        clave = (_entero_no_negativo(item.get('producto_id'), 'producto_id', i),
+                 _entero_no_negativo(item.get('talla_id'), 'talla_id', i))
+        if clave in cambios:
+            raise ValidationError({'items': f'items[{i}] repite producto {clave[0]} / talla {clave[1]}'})
+        cambios[clave] = (_entero_no_negativo(item.get('stock', 0), 'stock', i),
+                          _entero_no_negativo(item.get('stock_minimo', 0), 'stock_minimo', i))
+    return cambios
+
+
+def _solo_pares(pares):
+    """Q de exactamente esos (producto_id, talla_id): el índice único, sin el producto cruzado."""
+    return reduce(or_, (Q(producto_id=p, talla_id=t) for p, t in pares))
+
+
+def actualizar(cambios):
+    """
+    Aplica {(producto_id, talla_id): (stock, stock_minimo)} en una transacción:
+    1 SELECT ... FOR UPDATE (en orden de pk, así dos lotes nunca se bloquean en
+    cruz) + bulk_update. Si falta algún par no se escribe nada (Inventario.DoesNotExist).
+    """
+    with transaction.atomic():
+        # solo se bloquean los pares pedidos (no todas las tallas de todos los productos)
+        inventarios = list(
+            Inventario.objects.select_for_update()
+            .filter(_solo_pares(cambios))
+            .order_by('pk')
+        )
+        faltan = set(cambios) - {(inv.producto_id, inv.talla_id) for inv in inventarios}
+        if faltan:
+            producto_id, talla_id = min(faltan)
+            raise Inventario.DoesNotExist(
+                f'No existe inventario para producto {producto_id} / talla {talla_id}'
+            )
+        ajustes = []
+        for inv in inventarios:
+            anterior = inv.stock_talla
+            inv.stock_talla, inv.stockMinimo = cambios[(inv.producto_id, inv.talla_id)]
+            ajustes.append((inv.pk, inv.stock_talla - anterior, inv.stock_talla))
+        Inventario.objects.bulk_update(inventarios, ['stock_talla', 'stockMinimo'], batch_size=500)
+        movimientos.registrar(ajustes, Movimiento.AJUSTE)
+        despues_de_escribir([(inv.pk, inv.producto_id) for inv in inventarios],
+                            [(pk, stock - delta, stock) for pk, delta, stock in ajustes])
+    return inventarios
+
+
+class StockInsuficiente(Exception):
+    """El par (producto, talla) no alcanza; disponible=None si no existe inventario."""
+
+    def __init__(self, producto_id, talla_id, disponible):
+        self.producto_id, self.talla_id, self.disponible = producto_id, talla_id, disponible
+        super().__init__(f'Stock insuficiente: producto {producto_id} / talla {talla_id} (disponible: {disponible})')
+
+
+def _pares(pares):
+    """{(producto_id, talla_id): (idInventario, stock_talla)} de los pares dados en 1 consulta."""
+    pares = set(pares)
+    if not pares:
+        return {}
+    filas = Inventario.objects.filter(_solo_pares(pares)).order_by().values_list(
+        'producto_id', 'talla_id', 'pk', 'stock_talla')
+    return {(p, t): (pk, stock) for p, t, pk, stock in filas}
+
+
+def faltantes(pares):
+    """Pares (producto, talla) sin fila de Inventario."""
+    return set(pares) - set(_pares(pares))
+
+
+def _reservado_por_otros(carrito, ahora):
+    """Subconsulta: unidades del inventario (OuterRef) apartadas por otros carritos y vigentes."""
+    vigentes = ReservaStock.objects.filter(inventario=OuterRef('pk'), expira__gt=ahora)
+    if carrito is not None:
+        vigentes = vigentes.exclude(carrito=carrito)
+    total = vigentes.order_by().values('inventario').annotate(total=Sum('cantidad')).values('total')
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+
+def descontar(cantidades, referencia='', carrito=None):
+    """
+    Descuenta {(producto_id, talla_id): n} con un
+    UPDATE ... SET stock_talla = stock_talla - n
+    WHERE ... AND stock_talla >= n + (reservas vigentes de otros carritos)
+    por par. La base decide (el lock de la fila dura solo lo que dura ese UPDATE
+    hasta el commit) y el número de filas afectadas dice si alcanzó. Lo que otro
+    carrito tiene apartado no se vende; las reservas de `carrito` (el que paga) sí.
+
+    Todo o nada: si un par no alcanza se lanza StockInsuficiente y el savepoint
+    deshace los descuentos anteriores. Cada descuento queda en el libro como 'venta'. Los pares se recorren en orden para que
+    dos pedidos concurrentes bloqueen las filas siempre en el mismo orden.
+    """
+    cantidades = {par: int(n) for par, n in cantidades.items() if int(n) > 0}
+    if not cantidades:
+        return
+    reservado = _reservado_por_otros(carrito, timezone.now())
+    with transaction.atomic():
+        for (producto_id, talla_id), n in sorted(cantidades.items(), key=lambda par: (par[0][0], par[0][1] or 0)):
+            afectadas = Inventario.objects.filter(
+                producto_id=producto_id, talla_id=talla_id, stock_talla__gte=reservado + n,
+                talla_id__in=disponibilidad.tallas_vigentes(producto_id),
+            ).update(stock_talla=F('stock_talla') - n)
+            if afectadas != 1:
+                existe = (producto_id, talla_id) in _pares([(producto_id, talla_id)])
+                raise StockInsuficiente(producto_id, talla_id,
+                                        reservas.disponible(producto_id, talla_id, carrito) if existe else None)
+        # las filas siguen bloqueadas por los UPDATE: el stock leído es el resultante exacto
+        resultantes = _pares(cantidades)
+        movimientos.registrar([(pk, -cantidades[par], stock) for par, (pk, stock) in resultantes.items()],
+                              Movimiento.VENTA, referencia)
+        despues_de_escribir([(pk, producto_id) for (producto_id, _), (pk, _) in resultantes.items()],
+                            [(pk, stock + cantidades[par], stock) for par, (pk, stock) in resultantes.items()])
+
+
+def _sin_libro(inventarios):
+    """
+    Los inventarios que todavía no tienen movimiento 'inicial'. Tras un
+    bulk_create(ignore_conflicts=True) la relectura también trae filas que insertó
+    otra petición al mismo tiempo; esas ya tienen su movimiento y no se repite.
+    """
+    return inventarios.filter(~Exists(Movimiento.objects.filter(inventario=OuterRef('pk'))))
+
+
+def sincronizar_tallas(subcategoria):
+    """
+    Diferencia de conjuntos entre los pares (producto, talla) que pide el grupo de
+    tallas vigente de la subcategoría y los que ya existen: una consulta para los
+    existentes y un bulk_create para el resto, sin importar cuántos productos haya.
+    No borra inventarios de otros grupos: conservan stock y libro, y el catálogo, las
+    reservas y descontar() los descartan (disponibilidad.del_grupo_vigente /
+    tallas_vigentes). Devuelve los inventarios creados.
+    """
+    if not subcategoria.grupoTalla_id:
+        return []
+    tallas = list(Talla.objects.filter(grupo_id=subcategoria.grupoTalla_id, estado=True).values_list('pk', flat=True))
+    productos = list(subcategoria.productos.values_list('pk', flat=True))
+    if not tallas or not productos:
+        return []
+    del_grupo = Inventario.objects.filter(producto__subcategoria=subcategoria, talla_id__in=tallas).order_by('pk')
+    existentes = set(del_grupo.values_list('producto_id', 'talla_id'))
+    nuevos = [
+        Inventario(producto_id=producto_id, talla_id=talla_id, cantidad=0,
+                   stockMinimo=subcategoria.stockMinimo, stock_talla=0)
+        for producto_id in productos for talla_id in tallas if (producto_id, talla_id) not in existentes
+    ]
+    if not nuevos:
+        return []
+    Inventario.objects.bulk_create(nuevos, batch_size=LOTE_MAX, ignore_conflicts=True)
+    # MySQL no devuelve los pk de bulk_create: se releen en una consulta
+    creados = [inv for inv in _sin_libro(del_grupo) if (inv.producto_id, inv.talla_id) not in existentes]
+    movimientos.registrar([(inv.pk, 0, 0) for inv in creados], Movimiento.INICIAL)
+    _despues_de_crear({inv.producto_id for inv in creados})
+    return creados
+
+
+def agregar_talla(talla, solo_subcategorias_activas=False, lote=LOTE_MAX):
+    """
+    Crea el inventario de `talla` en cada producto cuyo grupo de tallas es el de la
+    talla y todavía no lo tiene. Recorre los productos por tandas de `lote` (por pk):
+    por tanda, una consulta de los que ya la tienen y un bulk_create del resto.
+    Devuelve {'productos', 'creados', 'existentes'}.
+    """
+    productos = Producto.objects.filter(subcategoria__grupoTalla_id=talla.grupo_id)
+    if solo_subcategorias_activas:
+        productos = productos.filter(subcategoria__estado=True)
+    productos = productos.order_by('pk').values_list('pk', 'subcategoria__stockMinimo')
+
+    resultado = {'productos': 0, 'creados': 0, 'existentes': 0}
+    tocados, ultimo = set(), 0
+    while True:
+        tanda = list(productos.filter(pk__gt=ultimo)[:lote])
+        if not tanda:
+            break
+        ultimo = tanda[-1][0]
+        con_talla = set(Inventario.objects.filter(talla=talla, producto_id__in=[pk for pk, _ in tanda])
+                        .values_list('producto_id', flat=True))
+        nuevos = [
+            Inventario(producto_id=pk, talla=talla, cantidad=0, stockMinimo=minimo, stock_talla=0)
+            for pk, minimo in tanda if pk not in con_talla
+        ]
+        resultado['productos'] += len(tanda)
+        resultado['existentes'] += len(con_talla)
+        if not nuevos:
+            continue
+        with transaction.atomic():
+            Inventario.objects.bulk_create(nuevos, ignore_conflicts=True)
+            creados = list(_sin_libro(Inventario.objects.filter(talla=talla,
+                                                                producto_id__in=[i.producto_id for i in nuevos]))
+                           .values_list('pk', 'producto_id'))
+            movimientos.registrar([(pk, 0, 0) for pk, _ in creados], Movimiento.INICIAL)
+        resultado['creados'] += len(creados)
+        tocados.update(producto_id for _, producto_id in creados)
+    _despues_de_crear(tocados)
+    return resultado
+
+
+def _despues_de_crear(producto_ids):
+    """
+    Lo que haría post_save por cada inventario nuevo. Sin eventos de stock bajo:
+    crear no es cruzar el umbral (tampoco lo es en la señal).
+    """
+    if not producto_ids:
+        return
+    catalogo_cache.bump(catalogo_cache.INVENTARIO)
+    catalogo_cache.marcar_productos(producto_ids)
+    disponibilidad.programar(producto_ids)
+
+
+def despues_de_escribir(inventarios, cambios=()):
+    """
+    Lo que haría post_save de Inventario, una vez por lote.
+    inventarios: [(idInventario, producto_id)]; cambios: [(idInventario, stock_anterior, stock_nuevo)]
+    """
+    producto_ids = {producto_id for _, producto_id in inventarios}
+    if not producto_ids:
+        return
+    catalogo_cache.bump(catalogo_cache.INVENTARIO)
+    catalogo_cache.marcar_productos(producto_ids)
+    disponibilidad.programar(producto_ids)
+    alertas_stock.registrar(cambios)
+
+
+def completar_tallas_pendientes(lote=LOTE_MAX):
+    """
+    Corre agregar_talla() para cada talla con inventario_pendiente y la desmarca al
+    terminar. Si el proceso se corta, la marca sigue y la próxima corrida retoma
+    (agregar_talla solo crea lo que falta). Devuelve {talla: resultado}.
+    """
+    resultados = {}
+    for talla in Talla.objects.filter(inventario_pendiente=True).order_by('pk'):
+        resultados[talla] = agregar_talla(talla, lote=lote)
+        Talla.objects.filter(pk=talla.pk).update(inventario_pendiente=False)
+    return resultados
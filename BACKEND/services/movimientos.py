@@ -0,0 +1,66 @@
+# BACKEND/services/movimientos.py
+"""
+Libro de movimientos de stock (Movimiento) + snapshots periódicos (InventarioSnapshot).
+
+- `registrar()` agrega movimientos en un solo INSERT; nunca se editan ni se borran.
+- `tomar_snapshot()` guarda stock_talla de todos los inventarios (comando snapshot_inventario).
+- `stock_en()` = último snapshot <= fecha + suma de los movimientos posteriores hasta
+  esa fecha: dos lecturas por índice (inventario, fecha), sin recorrer toda la historia.
+"""
+from django.db.models import Sum
+from django.utils import timezone
+
+from BACKEND.models import Inventario, InventarioSnapshot, Movimiento
+
+LOTE = 1000
+
+
+def registrar(filas, tipo, referencia=''):
+    """
+    filas: [(inventario_id, cantidad_con_signo, stock_resultante)]. Ignora cantidades 0,
+    salvo el movimiento 'inicial', que marca desde cuándo hay historia del inventario.
+    """
+    ahora = timezone.now()
+    movimientos = [
+        Movimiento(inventario_id=inventario_id, cantidad=cantidad, stock_resultante=stock,
+                   tipo=tipo, referencia=(referencia or '')[:64], fecha=ahora)
+        for inventario_id, cantidad, stock in filas if cantidad or tipo == Movimiento.INICIAL
+    ]
+    if movimientos:
+        Movimiento.objects.bulk_create(movimientos, batch_size=LOTE)
+    return len(movimientos)
+
+
+def tomar_snapshot(momento=None):
+    momento = momento or timezone.now()
+    total, lote = 0, []
+    for inventario_id, stock in Inventario.objects.order_by('pk').values_list('pk', 'stock_talla').iterator(
+        chunk_size=LOTE
+    ):
+        lote.append(InventarioSnapshot(inventario_id=inventario_id, tomado=momento, stock_talla=stock))
+        if len(lote) >= LOTE:
+            InventarioSnapshot.objects.bulk_create(lote)
+            total, lote = total + len(lote), []
+    if lote:
+        InventarioSnapshot.objects.bulk_create(lote)
+        total += len(lote)
+    return total
+
+
+def stock_en(inventario_id, momento):
+    """
+    Stock del inventario en `momento`, o None si no hay historia hasta ahí: el libro
+    empieza en el movimiento 'inicial' del inventario o, para los que ya existían,
+    en el snapshot que tomó la migración 0008.
+    """
+    snapshot = (InventarioSnapshot.objects.filter(inventario_id=inventario_id, tomado__lte=momento)
+                .order_by('-tomado').values_list('tomado', 'stock_talla').first())
+    movimientos = Movimiento.objects.filter(inventario_id=inventario_id, fecha__lte=momento)
+    if snapshot:
+        base = snapshot[1]
+        movimientos = movimientos.filter(fecha__gt=snapshot[0])
+    elif movimientos.filter(tipo=Movimiento.INICIAL).exists():
+        base = 0
+    else:
+        return None
+    return base + (movimientos.aggregate(total=Sum('cantidad'))['total'] or 0)
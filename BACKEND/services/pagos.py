@@ -1,7 +1,8 @@
 from django.db import transaction
 from decimal import Decimal
 from BACKEND.models import (Carrito, Pago, WebhookEvent, Pedido, PedidoProducto,
-                            Inventario, Factura, FacturaItem)
+                            Inventario, Factura, FacturaItem, Movimiento)
+from BACKEND.services import reservas
 
 MP_TO_INTERNO = {'approved':'pagado','pending':'pendiente','in_process':'pendiente',
                  'rejected':'rechazado','cancelled':'cancelado','refunded':'reembolsado',
@@ -14,6 +15,8 @@ def _devolver_stock(carrito):
         inv = inv_qs.first()
         if inv:
             inv.stock_talla = (inv.stock_talla or 0) + item.cantidad
+            inv._movimiento_tipo = Movimiento.DEVOLUCION  # libro de movimientos (signals_inventario)
+            inv._movimiento_referencia = f'carrito:{carrito.pk}'
             inv.save(update_fields=['stock_talla'])
 
 def _emitir_factura_desde_pedido(pedido: Pedido, mp_payment_id: str, moneda='COP') -> Factura:
@@ -107,6 +110,7 @@ def procesar_pago_de_mp(payment_json: dict):
         # Cerrar carrito
         carrito.estado = False
         carrito.save(update_fields=['estado'])
+        reservas.liberar(carrito)  # el pedido ya quedó; el carrito no aparta más stock
 
         # Emitir factura (idempotente “natural” por ser OneToOne con Pedido)
         if not hasattr(pedido, 'factura'):
@@ -114,5 +118,6 @@ def procesar_pago_de_mp(payment_json: dict):
 
     elif status in ('rejected','cancelled'):
         _devolver_stock(carrito)
+        reservas.liberar(carrito)
 
     return pago
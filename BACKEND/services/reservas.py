@@ -0,0 +1,122 @@
+# BACKEND/services/reservas.py
+"""
+Reservas de stock por carrito (ReservaStock) con vencimiento.
+
+- Agregar o cambiar un ítem del carrito aparta sus unidades por
+  RESERVA_CARRITO_MINUTOS; el stock de Inventario no se toca hasta facturar.
+- Disponible para vender = stock_talla - reservas vigentes de OTROS carritos,
+  una sola consulta con SUM sobre el índice (inventario, expira).
+- `reservar()` bloquea solo la fila de Inventario mientras calcula y guarda la
+  reserva (una transacción corta): dos carritos no apartan la misma unidad.
+- Solo se reservan tallas del grupo actual de la subcategoría: el inventario de un
+  grupo anterior existe pero no está a la venta (disponible 0, no "sin límite").
+- Las reservas vencidas dejan de contar solas; `expirar()` (comando liberar_reservas)
+  las borra por lotes para que la tabla no crezca.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from BACKEND.models import Inventario, ReservaStock
+from BACKEND.services import disponibilidad
+
+LOTE = 500
+
+
+def vence():
+    return timezone.now() + timedelta(minutes=getattr(settings, 'RESERVA_CARRITO_MINUTOS', 15))
+
+
+def _inventarios(producto_id, talla_id=None, vigentes=True):
+    # sin talla: el primer inventario del producto (mismo criterio que el carrito)
+    qs = Inventario.objects.filter(producto_id=producto_id)
+    if talla_id:
+        qs = qs.filter(talla_id=talla_id)
+    if vigentes:
+        qs = qs.filter(talla_id__in=disponibilidad.tallas_vigentes(producto_id))
+    return qs.order_by('pk')
+
+
+def _sin_inventario(producto_id, talla_id):
+    """None si el par no tiene inventario (no limita); 0 si solo lo tiene en un grupo anterior."""
+    return 0 if _inventarios(producto_id, talla_id, vigentes=False).exists() else None
+
+
+def _vigentes(ahora, carrito=None):
+    condicion = Q(reservas__expira__gt=ahora)
+    if carrito is not None:
+        condicion &= ~Q(reservas__carrito=carrito)
+    return Coalesce(Sum('reservas__cantidad', filter=condicion), 0)
+
+
+def disponible(producto_id, talla_id=None, carrito=None):
+    """
+    Unidades que `carrito` todavía puede tener (sus propias reservas no se restan).
+    None si no hay inventario para el par: el carrito no limita.
+    """
+    fila = (_inventarios(producto_id, talla_id)
+            .annotate(reservado=_vigentes(timezone.now(), carrito))
+            .values_list('stock_talla', 'reservado').first())
+    if fila is None:
+        return _sin_inventario(producto_id, talla_id)
+    stock, reservado = fila
+    return max(0, (stock or 0) - reservado)
+
+
+def reservar(carrito, producto_id, talla_id, cantidad):
+    """
+    Deja reservadas `cantidad` unidades del par para el carrito (valor absoluto, no suma)
+    y renueva el vencimiento. Si no alcanzan, reserva lo que haya.
+    Devuelve lo reservado, o None si no existe inventario para el par.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        inv = _inventarios(producto_id, talla_id).select_for_update().first()
+        if inv is None:
+            return _sin_inventario(producto_id, talla_id)
+        otros = (ReservaStock.objects
+                 .filter(inventario=inv, expira__gt=ahora)
+                 .exclude(carrito=carrito)
+                 .aggregate(total=Sum('cantidad'))['total'] or 0)
+        otorgada = max(0, min(int(cantidad), (inv.stock_talla or 0) - otros))
+        if otorgada:
+            ReservaStock.objects.update_or_create(
+                carrito=carrito, inventario=inv,
+                defaults={'cantidad': otorgada, 'expira': vence()},
+            )
+        else:
+            ReservaStock.objects.filter(carrito=carrito, inventario=inv).delete()
+    return otorgada
+
+
+def liberar(carrito, producto_id=None, talla_id=None):
+    """Suelta las reservas del carrito (todas, o solo las del par dado)."""
+    qs = ReservaStock.objects.filter(carrito=carrito)
+    if producto_id is not None:
+        inv = _inventarios(producto_id, talla_id, vigentes=False).values_list('pk', flat=True).first()
+        qs = qs.filter(inventario_id=inv)
+    return qs.delete()[0]
+
+
+def renovar(carrito):
+    """Extiende las reservas vigentes del carrito (p. ej. mientras paga)."""
+    return ReservaStock.objects.filter(carrito=carrito, expira__gt=timezone.now()).update(expira=vence())
+
+
+def expirar(lote=LOTE, ahora=None):
+    """
+    Borra las reservas vencidas de a `lote` filas por DELETE (por pk): cada
+    sentencia es corta y no deja bloqueada la tabla durante un barrido largo.
+    """
+    ahora = ahora or timezone.now()
+    total = 0
+    while True:
+        ids = list(ReservaStock.objects.filter(expira__lte=ahora)
+                   .order_by('pk').values_list('pk', flat=True)[:lote])
+        if not ids:
+            return total
+        total += ReservaStock.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,145 @@
+# BACKEND/services/snapshot_catalogo.py
+"""
+Snapshot estático del catálogo público en STATIC_ROOT/catalogo/, servido por WhiteNoise
+(BACKEND.middleware.CatalogoWhiteNoiseMiddleware) sin pasar por vistas ni base de datos.
+
+- Un shard por categoría activa: categoria-<id>.<hash>.json (+ .json.gz). El hash es
+  del contenido, así que el archivo nunca cambia y se cachea como inmutable.
+- manifest.json (se escribe al final) dice qué shard está vigente para cada categoría.
+- Las señales solo suben la versión 'categoria:<id>' (catalogo_cache.marcar_*);
+  `exportar()` reescribe únicamente las categorías cuya versión cambió. Si cambian
+  tallas o grupos de tallas se reescriben todas.
+- El proceso web corre `exportar_catalogo --intervalo 60` en segundo plano (Procfile):
+  los shards van a su propio disco y un cambio tarda a lo sumo un intervalo en llegar.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from BACKEND.models import Categoria, Producto, Inventario
+from BACKEND.serializer import ProductoSerializer
+from BACKEND.services import catalogo_cache, disponibilidad
+
+DIRECTORIO = 'catalogo'
+MANIFEST = 'manifest.json'
+GLOBALES = (catalogo_cache.TALLA, catalogo_cache.GRUPO_TALLA)
+
+SHARD = re.compile(r'^categoria-\d+\.[0-9a-f]{12}\.json$')
+
+
+def directorio():
+    return os.path.join(settings.STATIC_ROOT, DIRECTORIO)
+
+
+def _escribir(ruta, datos):
+    """Escritura atómica: nadie lee un archivo a medias."""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+
+
+def leer_manifest():
+    try:
+        with open(os.path.join(directorio(), MANIFEST), 'rb') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return {}
+
+
+def _contenido(categoria):
+    inventarios = (disponibilidad.del_grupo_vigente(Inventario.objects.select_related('talla'))
+                   .order_by('talla__nombre', 'idInventario'))
+    productos = (
+        Producto.objects.filter(subcategoria__categoria=categoria)
+        .select_related('subcategoria__categoria')
+        .prefetch_related(Prefetch('inventarios', queryset=inventarios))
+        .order_by('id')
+    )
+    datos = ProductoSerializer(productos, many=True).data
+    payload = {
+        'categoria': {'id': categoria.idCategoria, 'nombre': categoria.nombre},
+        'productos': datos,
+    }
+    return JSONRenderer().render(payload), len(datos)
+
+
+def _escribir_shard(categoria):
+    contenido, total = _contenido(categoria)
+    hash_ = hashlib.sha256(contenido).hexdigest()[:12]
+    nombre = f'categoria-{categoria.idCategoria}.{hash_}.json'
+    ruta = os.path.join(directorio(), nombre)
+    if not os.path.exists(ruta):
+        # el .gz primero: cuando aparece el .json su variante comprimida ya está
+        _escribir(ruta + '.gz', gzip.compress(contenido, mtime=0))
+        _escribir(ruta, contenido)
+    return nombre, hash_, total
+
+
+def _limpiar(conservar):
+    """Borra shards que no están ni en el manifest nuevo ni en el anterior."""
+    borrados = 0
+    for nombre in os.listdir(directorio()):
+        base = nombre[:-3] if nombre.endswith('.gz') else nombre
+        if SHARD.match(base) and base not in conservar:
+            os.remove(os.path.join(directorio(), nombre))
+            borrados += 1
+    return borrados
+
+
+def exportar(todo=False):
+    """
+    Reescribe los shards de las categorías que cambiaron y el manifest.
+    Devuelve {'escritos', 'sin_cambios', 'borrados'}.
+    """
+    os.makedirs(directorio(), exist_ok=True)
+    categorias = list(Categoria.objects.filter(estado=True).order_by('idCategoria'))
+    # Las versiones se leen ANTES de serializar: si algo cambia mientras tanto, el
+    # manifest queda con la versión vieja y la próxima corrida vuelve a exportar.
+    vers = catalogo_cache.versiones(
+        [catalogo_cache.clave_categoria(c.idCategoria) for c in categorias] + list(GLOBALES)
+    )
+    globales = {g: vers[g] for g in GLOBALES}
+
+    previo = leer_manifest()
+    anteriores = previo.get('categorias', {})
+    todo = todo or previo.get('globales') != globales
+
+    entradas, escritos = {}, 0
+    for categoria in categorias:
+        version = vers[catalogo_cache.clave_categoria(categoria.idCategoria)]
+        anterior = anteriores.get(str(categoria.idCategoria))
+        if (not todo and anterior and anterior.get('version') == version
+                and os.path.exists(os.path.join(directorio(), anterior['archivo']))):
+            entradas[str(categoria.idCategoria)] = anterior
+            continue
+        archivo, hash_, total = _escribir_shard(categoria)
+        entradas[str(categoria.idCategoria)] = {
+            'nombre': categoria.nombre,
+            'version': version,
+            'archivo': archivo,
+            'hash': hash_,
+            'total': total,
+        }
+        escritos += 1
+
+    manifest = {
+        'generado': timezone.now().isoformat(),
+        'globales': globales,
+        'categorias': entradas,
+    }
+    _escribir(os.path.join(directorio(), MANIFEST), JSONRenderer().render(manifest))
+
+    conservar = {e['archivo'] for e in entradas.values()} | {e.get('archivo') for e in anteriores.values()}
+    return {
+        'escritos': escritos,
+        'sin_cambios': len(entradas) - escritos,
+        'borrados': _limpiar(conservar),
+    }
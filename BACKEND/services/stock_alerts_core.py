@@ -1,16 +1,21 @@
 # BACKEND/services/stock_alerts_core.py
 import logging
+from datetime import timedelta
 from django.conf import settings
-from django.core.cache import cache
-from BACKEND.models import Inventario, Usuario, Rol
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from BACKEND.models import Inventario, LowStockAlert, Usuario, Rol
 from BACKEND.utils_email import send_email_raw
 
 logger = logging.getLogger(__name__)
 
 LOW_STOCK_UMBRAL = 5
 DIGEST_TOP_N = 10
-LOW_STOCK_CACHE_TTL = 120 * 60  # 2 horas (por defecto)
-NEW_PRODUCT_DISABLE_ALERT_TTL = 30 * 60  # 30 minutos para productos nuevos
+DIGEST_MAX_ITEMS = 500  # tope de filas del resumen (el correo no crece con el catálogo)
+DIGEST_CHUNK = 200
+LOW_STOCK_COOLDOWN = timedelta(hours=2)  # un ítem que sigue bajo se vuelve a avisar pasado esto
 
 def _admin_emails():
     try:
@@ -60,28 +65,84 @@ def _table_html(rows, title, umbral=None):
     )
     return header + head + body + "</tbody></table>"
 
-def _send_low_stock_email_single(inv: Inventario, umbral: int):
-    html = _table_html([_item_ctx(inv)], title="Alerta de bajo stock por talla", umbral=umbral)
+def digest_items(umbral: int, top_n: int = DIGEST_TOP_N, limite: int = DIGEST_MAX_ITEMS):
+    """
+    Ítems del resumen calculados en la base: los que están bajo el umbral (hasta `limite`,
+    los de menos stock primero) o, si no hay ninguno, los `top_n` de menos stock.
+    Solo cuentan las tallas del grupo actual de la subcategoría. Devuelve
+    (iterador, hay_bajos); el iterador trae las filas por bloques sin cargar la tabla.
+    """
+    qs = (Inventario.objects
+          .filter(talla__grupo_id=F('producto__subcategoria__grupoTalla_id'))
+          .annotate(stock_actual=Coalesce('stock_talla', 'cantidad'))
+          .select_related('producto__subcategoria__categoria', 'talla__grupo')
+          .order_by('stock_actual', 'pk'))
+    bajos = qs.filter(stock_actual__lt=umbral)
+    hay_bajos = bajos.exists()
+    fuente = bajos[:limite] if hay_bajos else qs[:top_n]
+    return fuente.iterator(chunk_size=DIGEST_CHUNK), hay_bajos
+
+def build_digest_html(umbral: int, items):
+    rows = [_item_ctx(i) for i in items]
+    title = "Resumen diario: Ítems bajo stock" if rows else "Resumen diario"
+    return _table_html(rows, title=title, umbral=umbral), rows
+
+def _send_low_stock_email_batch(invs, umbral: int):
+    html = _table_html([_item_ctx(i) for i in invs], title="Alerta de bajo stock por talla", umbral=umbral)
     sent = send_email_raw(
-        subject=f"[ALERTA] Bajo stock: {inv.producto.nombre} / Talla {inv.talla.nombre}",
+        subject=f"[ALERTA] Bajo stock: {len(invs)} ítems",
         to_emails=_admin_emails(),
         html_body=html,
         text_body=None
     )
     if getattr(settings, "STOCK_ALERTS_DEBUG", False):
-        logger.warning("(_send_low_stock_email_single) enviados=%s", sent)
+        logger.warning("(_send_low_stock_email_batch) enviados=%s", sent)
 
-def low_stock_event_check(inv: Inventario, umbral: int = LOW_STOCK_UMBRAL):
-    stock = _stock_of(inv)
-    key = f"lowstock:inv:{inv.pk}:u{umbral}"
-    if stock < umbral:
-        if not cache.get(key):
-            _send_low_stock_email_single(inv, umbral=umbral)
-            cache.set(key, True, timeout=LOW_STOCK_CACHE_TTL)
-    else:
-        cache.delete(key)
+def low_stock_batch_check(invs, umbral: int = LOW_STOCK_UMBRAL):
+    """
+    Revisa un lote y manda UN correo con los ítems bajo el umbral que hay que avisar:
+    los que no estaban en alerta o cuyo último aviso pasó LOW_STOCK_COOLDOWN.
 
-def build_digest_html(umbral: int, items):
-    rows = [_item_ctx(i) for i in items]
-    title = "Resumen diario: Ítems bajo stock" if items else "Resumen diario"
-    return _table_html(rows, title=title, umbral=umbral), rows
+    El estado vive en LowStockAlert (compartido por todos los procesos, no en la cache
+    de cada worker): en una transacción se crean las filas que falten con un solo
+    INSERT, se bloquean las del lote (búsqueda por el índice único de inventario) y se
+    actualizan en bloque. Dos procesos con el mismo ítem se esperan y solo uno avisa.
+    """
+    if not invs:
+        return 0
+    ahora = timezone.now()
+    stock = {inv.pk: _stock_of(inv) for inv in invs}
+    with transaction.atomic():
+        LowStockAlert.objects.bulk_create(
+            [LowStockAlert(inventario_id=pk, umbral=umbral) for pk, s in stock.items() if s < umbral],
+            ignore_conflicts=True,
+        )
+        alertas = {a.inventario_id: a for a in (LowStockAlert.objects.select_for_update()
+                                                  .filter(inventario_id__in=stock).order_by('inventario_id'))}
+        nuevos, cambiadas = [], []
+        for inv in invs:
+            alerta = alertas.get(inv.pk)
+            if alerta is None:
+                continue  # recuperado y sin historial: nada que guardar
+            alerta.umbral = umbral  # el mismo umbral con el que registrar() anota los cruces
+            if stock[inv.pk] >= umbral:
+                if alerta.en_alerta:
+                    alerta.en_alerta = False
+                    alerta.estado_cambiado, alerta.resumido = ahora, None
+                    cambiadas.append(alerta)
+                continue
+            if not alerta.en_alerta:
+                alerta.en_alerta, alerta.first_detected = True, ahora
+                alerta.estado_cambiado, alerta.resumido = ahora, None
+            elif alerta.last_sent_at and alerta.last_sent_at > ahora - LOW_STOCK_COOLDOWN:
+                continue  # ya avisado hace poco
+            alerta.last_sent_at = ahora
+            alerta.times_sent += 1
+            cambiadas.append(alerta)
+            nuevos.append(inv)
+        if cambiadas:
+            LowStockAlert.objects.bulk_update(cambiadas, ['umbral', 'en_alerta', 'first_detected', 'last_sent_at',
+                                                          'times_sent', 'estado_cambiado', 'resumido'])
+        if nuevos:
+            _send_low_stock_email_batch(nuevos, umbral=umbral)
+    return len(nuevos)
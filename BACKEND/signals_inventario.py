@@ -1,16 +1,50 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, post_init
 from django.dispatch import receiver
-from BACKEND.models import Inventario
-from BACKEND.services.stock_alerts_core import low_stock_event_check
+from BACKEND.models import Inventario, Movimiento
+from BACKEND.services import alertas_stock, catalogo_cache, disponibilidad, movimientos
+
+@receiver(post_init, sender=Inventario)
+def inventario_guardar_stock_original(sender, instance, **kwargs):
+    # para saber cuánto cambió stock_talla en save() (libro de movimientos)
+    instance._stock_original = instance.__dict__.get('stock_talla')
+
 
 @receiver(post_save, sender=Inventario)
-def inventario_post_save(sender, instance, created, **kwargs):
-    try:
-        # Si el inventario fue creado hace menos de 31 minutos, no enviar alerta
-        from django.core.cache import cache
-        key = f"lowstock:inv:{instance.pk}:u5"
-        if not cache.get(key):
-            low_stock_event_check(instance, umbral=5)
-    except Exception as e:
-        # IMPORTANTE: nunca propagar a la vista
-        print("[ERROR] Señal low_stock_event_check:", e)
+def inventario_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Un solo receptor para todo lo que sigue a un save() de Inventario (así no depende
+    del orden en que se registren receptores):
+    - cache del catálogo y resumen Producto.stock / stock_bajo (una vez por commit);
+    - libro de movimientos: quien llama puede indicar el tipo y la referencia con
+      inv._movimiento_tipo / inv._movimiento_referencia (por defecto 'inicial' al crear
+      y 'ajuste' después). Las escrituras por lote las registra services/inventario_stock.py;
+    - stock bajo: solo se anota el cruce del umbral (un INSERT, y solo si cruzó); el
+      correo agrupado lo manda el comando alertas_stock_bajo.
+    """
+    # El stock por talla viaja en el payload de productos: invalida esa cache
+    catalogo_cache.bump(catalogo_cache.INVENTARIO)
+    catalogo_cache.marcar_productos([instance.producto_id])
+    disponibilidad.programar([instance.producto_id])
+
+    actual, anterior = instance.stock_talla, instance._stock_original
+    if not isinstance(actual, int) or (update_fields is not None and 'stock_talla' not in update_fields):
+        return
+    if created:
+        tipo, cantidad = Movimiento.INICIAL, actual
+    elif isinstance(anterior, int):
+        tipo, cantidad = Movimiento.AJUSTE, actual - anterior
+    else:
+        return  # se cargó sin stock_talla (.only/.defer): no hay con qué comparar
+    movimientos.registrar([(instance.pk, cantidad, actual)],
+                          getattr(instance, '_movimiento_tipo', tipo),
+                          getattr(instance, '_movimiento_referencia', ''))
+    if not created:
+        alertas_stock.registrar([(instance.pk, anterior, actual)])
+    instance._stock_original = actual
+
+
+@receiver(post_delete, sender=Inventario)
+def inventario_post_delete(sender, instance, **kwargs):
+    catalogo_cache.bump(catalogo_cache.INVENTARIO)
+    catalogo_cache.marcar_productos([instance.producto_id])
+    disponibilidad.programar([instance.producto_id])
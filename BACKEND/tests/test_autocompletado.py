@@ -0,0 +1,67 @@
+# BACKEND/tests/test_autocompletado.py
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from BACKEND.models import Categoria, GrupoTalla, Subcategoria, Producto
+from BACKEND.services import autocompletado, catalogo_cache
+
+
+class AutocompletadoTest(APITestCase):
+    url = '/BACKEND/producto/autocompletar/'
+
+    def setUp(self):
+        autocompletado._indice.versiones = None  # el índice vive en el proceso: empezar limpio
+        autocompletado._indice.revisado = None
+        with self.captureOnCommitCallbacks(execute=True):
+            grupo = GrupoTalla.objects.create(nombre='Ropa')
+            self.categoria = Categoria.objects.create(nombre='Niños')
+            self.sub = Subcategoria.objects.create(nombre='Blusas', categoria=self.categoria, grupoTalla=grupo)
+            self.producto = Producto.objects.create(
+                nombre='Blusa Roja Algodón', descripcion='desc', precio=1000, subcategoria=self.sub
+            )
+
+    def _get(self, q):
+        return self.client.get(self.url, {'q': q}).json()
+
+    def test_prefijo_sin_tildes_y_por_palabra(self):
+        data = self._get('BLU')
+        self.assertEqual([p['nombre'] for p in data['productos']], ['Blusa Roja Algodón'])
+        self.assertEqual([s['nombre'] for s in data['subcategorias']], ['Blusas'])
+        self.assertEqual([p['id'] for p in self._get('algodon')['productos']], [self.producto.id])
+        self.assertEqual([c['nombre'] for c in self._get('nin')['categorias']], ['Niños'])
+        self.assertEqual(self._get('xyz')['productos'], [])
+
+    def test_respuesta_con_indice_caliente_no_consulta(self):
+        self._get('blu')
+        with self.assertNumQueries(0):
+            self._get('blu')
+        # pasada la ventana solo se leen las versiones
+        with override_settings(AUTOCOMPLETADO_REVISION_SEGUNDOS=0), self.assertNumQueries(1):
+            self._get('blu')
+
+    def test_senal_actualiza_sin_reconstruir(self):
+        self._get('blu')
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = Producto.objects.create(nombre='Blusón', descripcion='d', precio=1, subcategoria=self.sub)
+            self.producto.delete()
+        with self.assertNumQueries(0):
+            data = self._get('blu')
+        self.assertEqual([p['id'] for p in data['productos']], [nuevo.id])
+
+    def test_cambio_en_otro_proceso_reconstruye(self):
+        self._get('blu')
+        # update() no dispara señales, como un cambio hecho por otro worker
+        Producto.objects.filter(pk=self.producto.pk).update(nombre='Camisa verde')
+        catalogo_cache._incrementar([catalogo_cache.PRODUCTO])
+        # dentro de la ventana de revisión todavía responde con el índice anterior
+        self.assertEqual(len(self._get('blu')['productos']), 1)
+        with override_settings(AUTOCOMPLETADO_REVISION_SEGUNDOS=0):
+            self.assertEqual(self._get('blu')['productos'], [])
+            self.assertEqual(len(self._get('cam')['productos']), 1)
+
+    def test_subcategoria_inactiva_sale_del_indice(self):
+        self._get('blu')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sub.estado = False
+            self.sub.save()
+        self.assertEqual(self._get('blu')['subcategorias'], [])
@@ -0,0 +1,102 @@
+# BACKEND/tests/test_bandeja_salida.py
+import io
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from BACKEND.models import CorreoSaliente
+from BACKEND.services import bandeja_salida
+from BACKEND.utils_email import send_email_raw
+
+
+class _MailerooLocal(BaseHTTPRequestHandler):
+    """Sustituto de la API de Maileroo: responde con los códigos de `respuestas` en orden."""
+    respuestas, recibidos = [], []
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers['Content-Length']))
+        type(self).recibidos.append(json.loads(cuerpo))
+        codigo = type(self).respuestas.pop(0) if type(self).respuestas else 200
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"success": true}')
+
+    def log_message(self, *args):
+        pass
+
+
+class BandejaSalidaTest(APITestCase):
+
+    def setUp(self):
+        _MailerooLocal.respuestas, _MailerooLocal.recibidos = [], []
+        servidor = HTTPServer(('127.0.0.1', 0), _MailerooLocal)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        ajustes = override_settings(MAILEROO_API_URL=f'http://127.0.0.1:{servidor.server_port}/api/v2/emails',
+                                    EMAIL_TIMEOUT=2)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _encolar(self, asunto='Hola'):
+        self.assertEqual(send_email_raw(asunto, ['a@x.com', 'no-es-correo'], '<p>hola</p>'), 1)
+        return CorreoSaliente.objects.latest('pk')
+
+    def _vencer(self):
+        CorreoSaliente.objects.update(proximo_intento=timezone.now() - timedelta(seconds=1))
+
+    def test_encolar_no_llama_a_maileroo(self):
+        correo = self._encolar()
+        self.assertEqual(_MailerooLocal.recibidos, [])
+        self.assertEqual((correo.estado, correo.asunto), (CorreoSaliente.PENDIENTE, 'Hola'))
+        self.assertEqual(correo.payload['to'], [{'address': 'a@x.com'}])
+
+        salida = io.StringIO()
+        call_command('enviar_correos', stdout=salida)
+        self.assertIn('1 enviados', salida.getvalue())
+        self.assertEqual(_MailerooLocal.recibidos[0]['subject'], 'Hola')
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), (CorreoSaliente.ENVIADO, 1))
+        # ya enviado: la siguiente vuelta no lo repite
+        self.assertEqual(bandeja_salida.despachar()['enviados'], 0)
+
+    def test_reintenta_con_espera_exponencial(self):
+        correo = self._encolar()
+        _MailerooLocal.respuestas = [503, 429]
+        antes = timezone.now()
+        self.assertEqual(bandeja_salida.despachar()['reintentos'], 1)
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), (CorreoSaliente.PENDIENTE, 1))
+        self.assertIn('HTTP 503', correo.ultimo_error)
+        self.assertGreaterEqual(correo.proximo_intento, antes + bandeja_salida.espera(1))
+        # todavía no es su turno
+        self.assertEqual(sum(bandeja_salida.despachar().values()), 0)
+
+        self._vencer()
+        bandeja_salida.despachar()
+        self._vencer()
+        self.assertEqual(bandeja_salida.despachar()['enviados'], 1)
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos, correo.ultimo_error), (CorreoSaliente.ENVIADO, 3, ''))
+        self.assertGreater(bandeja_salida.espera(3), bandeja_salida.espera(2))
+
+    def test_error_del_cliente_no_se_reintenta(self):
+        correo = self._encolar()
+        _MailerooLocal.respuestas = [422]
+        self.assertEqual(bandeja_salida.despachar()['fallidos'], 1)
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoSaliente.FALLIDO)
+
+    def test_lotes(self):
+        for i in range(5):
+            self._encolar(f'Correo {i}')
+        self.assertEqual(bandeja_salida.despachar(lote=2)['enviados'], 2)
+        self.assertEqual(bandeja_salida.despachar(lote=10)['enviados'], 3)
+        self.assertEqual([c['subject'] for c in _MailerooLocal.recibidos], [f'Correo {i}' for i in range(5)])
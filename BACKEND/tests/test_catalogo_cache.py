@@ -0,0 +1,144 @@
+# BACKEND/tests/test_catalogo_cache.py
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from BACKEND.models import Rol, Usuario, Categoria, GrupoTalla, Talla, Subcategoria, Producto, Inventario
+from BACKEND.services import catalogo_cache
+
+
+class CatalogoCacheTest(APITestCase):
+    """
+    Las lecturas del catálogo se sirven desde cache y cualquier cambio
+    (vía señales) las invalida sin servir datos viejos.
+    """
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grupo = GrupoTalla.objects.create(nombre='Ropa')
+            self.talla = Talla.objects.create(nombre='M', grupo=self.grupo)
+            self.categoria = Categoria.objects.create(nombre='Mujer')
+            self.subcategoria = Subcategoria.objects.create(
+                nombre='Blusas', categoria=self.categoria, grupoTalla=self.grupo
+            )
+            self.producto = Producto.objects.create(
+                nombre='Blusa', descripcion='desc', precio=1000, subcategoria=self.subcategoria
+            )
+
+    def test_acierto_solo_consulta_versiones(self):
+        primera = self.client.get('/BACKEND/producto/')
+        with self.assertNumQueries(1):
+            segunda = self.client.get('/BACKEND/producto/')
+        self.assertEqual(primera.json(), segunda.json())
+
+    def test_cambio_de_producto_invalida(self):
+        self.client.get('/BACKEND/producto/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.nombre = 'Blusa nueva'
+            self.producto.save()
+        data = self.client.get('/BACKEND/producto/').json()
+        self.assertEqual(data[0]['nombre'], 'Blusa nueva')
+
+    def test_cambio_de_stock_invalida(self):
+        self.client.get(f'/BACKEND/producto/{self.producto.pk}/')
+        inv = Inventario.objects.get(producto=self.producto, talla=self.talla)
+        with self.captureOnCommitCallbacks(execute=True):
+            inv.stock_talla = 7
+            inv.save()
+        data = self.client.get(f'/BACKEND/producto/{self.producto.pk}/').json()
+        self.assertEqual(data['inventario_tallas'][0]['stock'], 7)
+
+    def test_rollback_no_sube_version(self):
+        antes = catalogo_cache.versiones([catalogo_cache.PRODUCTO])
+        self.producto.save()  # sin ejecutar on_commit: equivale a una transacción abortada
+        self.assertEqual(catalogo_cache.versiones([catalogo_cache.PRODUCTO]), antes)
+
+    def test_categorias_autenticadas(self):
+        rol = Rol.objects.create(nombre='cliente')
+        usuario = Usuario.objects.create_user('c@x.com', 'Ana', 'Diaz', 'x', rol=rol, telefono='1')
+        self.client.force_authenticate(usuario)
+        self.client.get('/BACKEND/api/categoria/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.create(nombre='Hombre')
+        nombres = {c['nombre'] for c in self.client.get('/BACKEND/api/categoria/').json()}
+        self.assertEqual(nombres, {'Mujer', 'Hombre'})
+
+
+class CatalogoETagTest(APITestCase):
+    """If-None-Match vigente => 304 sin serializar; cualquier cambio => ETag nueva."""
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categoria = Categoria.objects.create(nombre='Mujer')
+
+    def test_304_con_etag_vigente(self):
+        resp = self.client.get('/BACKEND/producto/')
+        etag = resp['ETag']
+        self.assertIn('public', resp['Cache-Control'])
+        with self.assertNumQueries(1):
+            resp = self.client.get('/BACKEND/producto/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+
+    def test_cambio_genera_etag_nueva(self):
+        etag = self.client.get('/BACKEND/producto/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.filter(pk=self.categoria.pk).first().save()
+        resp = self.client.get('/BACKEND/producto/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_parametros_distintos_etag_distinta(self):
+        a = self.client.get('/BACKEND/producto/')['ETag']
+        b = self.client.get('/BACKEND/producto/', {'categoria': self.categoria.pk})['ETag']
+        self.assertNotEqual(a, b)
+
+    def test_taxonomia_privada(self):
+        rol = Rol.objects.create(nombre='cliente')
+        usuario = Usuario.objects.create_user('c@x.com', 'Ana', 'Diaz', 'x', rol=rol, telefono='1')
+        self.client.force_authenticate(usuario)
+        resp = self.client.get('/BACKEND/api/categoria/')
+        self.assertIn('private', resp['Cache-Control'])
+        resp = self.client.get('/BACKEND/api/categoria/', HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
+
+class TaxonomiaTest(APITestCase):
+    url = '/BACKEND/api/taxonomia/'
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        rol = Rol.objects.create(nombre='cliente')
+        usuario = Usuario.objects.create_user('c@x.com', 'Ana', 'Diaz', 'x', rol=rol, telefono='1')
+        self.client.force_authenticate(usuario)
+        with self.captureOnCommitCallbacks(execute=True):
+            for g in range(3):
+                grupo = GrupoTalla.objects.create(nombre=f'G{g}')
+                for t in ('S', 'M', 'L'):
+                    Talla.objects.create(nombre=t, grupo=grupo, estado=(t != 'L'))
+                categoria = Categoria.objects.create(nombre=f'C{g}')
+                for n in range(3):
+                    Subcategoria.objects.create(nombre=f'S{g}{n}', categoria=categoria, grupoTalla=grupo)
+
+    def test_arbol_en_consultas_fijas(self):
+        with self.assertNumQueries(5):  # versiones + 4 tablas
+            resp = self.client.get(self.url)
+        data = resp.json()
+        self.assertEqual(len(data['categorias']), 3)
+        sub = data['categorias'][0]['subcategorias'][0]
+        self.assertEqual(sorted(sub['tallas_disponibles']), ['M', 'S'])
+        self.assertEqual(len(data['grupos_talla'][0]['tallas']), 3)
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_listados_sin_consulta_por_fila(self):
+        # versiones + subcategorías (con categoría y grupo) + tallas prefetch
+        with self.assertNumQueries(3):
+            self.client.get('/BACKEND/api/subcategoria/')
+        with self.assertNumQueries(3):
+            self.client.get('/BACKEND/api/grupo-talla/')
+        with self.assertNumQueries(3):
+            self.client.get('/BACKEND/api/talla/')
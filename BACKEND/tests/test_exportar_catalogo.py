@@ -0,0 +1,139 @@
+# BACKEND/tests/test_exportar_catalogo.py
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from BACKEND.models import Categoria, GrupoTalla, Talla, Subcategoria, Producto, Inventario
+from BACKEND.services import snapshot_catalogo
+
+
+class ExportarCatalogoTest(APITestCase):
+    """Snapshot estático por categoría: solo se reescribe lo que cambió."""
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root, ignore_errors=True)
+        ajustes = override_settings(STATIC_ROOT=self.static_root)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grupo = GrupoTalla.objects.create(nombre='Ropa')
+            self.s = Talla.objects.create(nombre='S', grupo=grupo)
+            self.mujer = Categoria.objects.create(nombre='Mujer')
+            self.hombre = Categoria.objects.create(nombre='Hombre')
+            self.blusas = Subcategoria.objects.create(nombre='Blusas', categoria=self.mujer, grupoTalla=grupo)
+            self.camisas = Subcategoria.objects.create(nombre='Camisas', categoria=self.hombre, grupoTalla=grupo)
+            self.blusa = Producto.objects.create(nombre='Blusa', descripcion='d', precio=1000, subcategoria=self.blusas)
+            Producto.objects.create(nombre='Camisa', descripcion='d', precio=2000, subcategoria=self.camisas)
+            # las tallas del grupo ya se crearon con el producto
+            inv = Inventario.objects.get(producto=self.blusa, talla=self.s)
+            inv.stock_talla = 4
+            inv.save()
+
+    def _manifest(self):
+        return snapshot_catalogo.leer_manifest()
+
+    def _archivo(self, categoria):
+        return self._manifest()['categorias'][str(categoria.pk)]['archivo']
+
+    def _shard(self, categoria):
+        ruta = os.path.join(snapshot_catalogo.directorio(), self._archivo(categoria))
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        with open(ruta + '.gz', 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), contenido)
+        return json.loads(contenido)
+
+    def test_exporta_un_shard_por_categoria(self):
+        resultado = snapshot_catalogo.exportar()
+        self.assertEqual(resultado['escritos'], 2)
+        shard = self._shard(self.mujer)
+        self.assertEqual(shard['categoria']['nombre'], 'Mujer')
+        self.assertEqual([p['nombre'] for p in shard['productos']], ['Blusa'])
+        self.assertEqual(shard['productos'][0]['inventario_tallas'][0]['stock'], 4)
+        # segunda corrida sin cambios: no escribe nada
+        self.assertEqual(snapshot_catalogo.exportar()['escritos'], 0)
+
+    def test_solo_reescribe_la_categoria_que_cambio(self):
+        snapshot_catalogo.exportar()
+        hombre_antes, mujer_antes = self._archivo(self.hombre), self._archivo(self.mujer)
+        with self.captureOnCommitCallbacks(execute=True):
+            inv = Inventario.objects.get(producto=self.blusa, talla=self.s)
+            inv.stock_talla = 9
+            inv.save()
+        resultado = snapshot_catalogo.exportar()
+        self.assertEqual((resultado['escritos'], resultado['sin_cambios']), (1, 1))
+        self.assertEqual(self._archivo(self.hombre), hombre_antes)
+        self.assertNotEqual(self._archivo(self.mujer), mujer_antes)
+        self.assertEqual(self._shard(self.mujer)['productos'][0]['inventario_tallas'][0]['stock'], 9)
+
+    def test_mover_producto_marca_ambas_categorias(self):
+        snapshot_catalogo.exportar()
+        with self.captureOnCommitCallbacks(execute=True):
+            blusa = Producto.objects.get(pk=self.blusa.pk)
+            blusa.subcategoria = self.camisas
+            blusa.save()
+        self.assertEqual(snapshot_catalogo.exportar()['escritos'], 2)
+        self.assertEqual(self._shard(self.mujer)['productos'], [])
+        self.assertEqual(len(self._shard(self.hombre)['productos']), 2)
+
+    def test_el_comando_periodico_lleva_precio_y_stock_al_shard(self):
+        def entre_corridas(segundos):
+            if dormir.call_count > 1:
+                raise KeyboardInterrupt
+            with self.captureOnCommitCallbacks(execute=True):
+                blusa = Producto.objects.get(pk=self.blusa.pk)
+                blusa.precio = 1500
+                blusa.save()
+                inv = Inventario.objects.get(producto=self.blusa, talla=self.s)
+                inv.stock_talla = 2
+                inv.save()
+
+        with mock.patch('BACKEND.management.commands.exportar_catalogo.time.sleep',
+                        side_effect=entre_corridas) as dormir, self.assertRaises(KeyboardInterrupt):
+            call_command('exportar_catalogo', intervalo=60, stdout=io.StringIO())
+        blusa = self._shard(self.mujer)['productos'][0]
+        self.assertEqual((float(blusa['precio']), blusa['inventario_tallas'][0]['stock']), (1500, 2))
+
+    def test_cambio_de_talla_reescribe_todo(self):
+        snapshot_catalogo.exportar()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.s.nombre = 'Small'
+            self.s.save()
+        self.assertEqual(snapshot_catalogo.exportar()['escritos'], 2)
+
+    def test_limpia_shards_viejos(self):
+        snapshot_catalogo.exportar()
+        for stock in (5, 6):
+            with self.captureOnCommitCallbacks(execute=True):
+                Inventario.objects.filter(producto=self.blusa).update(stock_talla=stock)
+                Producto.objects.get(pk=self.blusa.pk).save()
+            snapshot_catalogo.exportar()
+        shards = [n for n in os.listdir(snapshot_catalogo.directorio())
+                  if n.startswith(f'categoria-{self.mujer.pk}.') and n.endswith('.json')]
+        # el vigente y el anterior (clientes con el manifest previo en cache)
+        self.assertEqual(len(shards), 2)
+
+    def test_whitenoise_sirve_el_snapshot(self):
+        call_command('exportar_catalogo', stdout=io.StringIO())
+        resp = self.client.get('/static/catalogo/manifest.json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('immutable', resp['Cache-Control'])
+
+        url = '/static/catalogo/' + self._archivo(self.mujer)
+        resp = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', resp['Cache-Control'])
+        self.assertEqual(self.client.get('/static/catalogo/otro.json').status_code, 404)
@@ -0,0 +1,32 @@
+# BACKEND/tests/test_http_client.py
+import io
+import re
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from BACKEND.services import http_client
+
+
+class HttpClientTest(SimpleTestCase):
+    """El cliente compartido reutiliza la conexión: un solo handshake para N llamadas."""
+
+    def setUp(self):
+        http_client.reiniciar_metricas()
+        self.addCleanup(http_client.cerrar)
+
+    def test_benchmark_contra_servidor_local(self):
+        salida = io.StringIO()
+        call_command('benchmark_http', '--n', '20', stdout=salida)
+        conexiones = dict(re.findall(r'(\S+): .*, (\d+) conexiones', salida.getvalue()))
+        self.assertEqual(conexiones, {'requests.post': '20', 'http_client': '1'})
+
+        m = http_client.metricas()['benchmark']
+        self.assertEqual((m['llamadas'], m['errores']), (20, 0))
+        self.assertGreaterEqual(m['max'], m['promedio'])
+
+    def test_errores_cuentan_en_metricas(self):
+        with self.assertRaises(Exception):
+            # puerto cerrado: falla al conectar, dentro del timeout de conexión
+            http_client.get('http://127.0.0.1:9/', 'mp.payments', timeout=(0.5, 0.5))
+        self.assertEqual(http_client.metricas()['mp.payments']['errores'], 1)
@@ -0,0 +1,395 @@
+# BACKEND/tests/test_inventario_stock.py
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from BACKEND.models import (
+    Rol, Usuario, Categoria, GrupoTalla, Talla, Subcategoria, Producto, Inventario, Pedido, Movimiento,
+    EventoStockBajo, LowStockAlert, Carrito,
+)
+from BACKEND.serializer import FacturaCreateSerializer, ProductoSerializer
+from BACKEND.services import alertas_stock, disponibilidad, inventario_stock, reservas, stock_alerts_core
+
+
+class _StockBase(APITestCase):
+    url = '/BACKEND/api/inventario/actualizar_stock_masivo/'
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        envio = mock.patch('BACKEND.services.stock_alerts_core.send_email_raw')
+        self.enviar = envio.start()
+        self.addCleanup(envio.stop)
+        rol = Rol.objects.create(nombre='administrador')
+        self.admin = Usuario.objects.create_user('a@x.com', 'Ana', 'Diaz', 'x', rol=rol, telefono='1')
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            ropa = GrupoTalla.objects.create(nombre='Ropa')
+            self.s = Talla.objects.create(nombre='S', grupo=ropa)
+            self.m = Talla.objects.create(nombre='M', grupo=ropa)
+            sub = Subcategoria.objects.create(nombre='Blusas', categoria=Categoria.objects.create(nombre='Mujer'),
+                                              grupoTalla=ropa)
+            self.p1 = Producto.objects.create(nombre='Blusa', descripcion='d', precio=1000, subcategoria=sub)
+            self.p2 = Producto.objects.create(nombre='Camisa', descripcion='d', precio=1000, subcategoria=sub)
+        self.enviar.reset_mock()
+
+    def _item(self, producto, talla, stock, minimo=1):
+        return {'producto_id': producto.pk, 'talla_id': talla.pk, 'stock': stock, 'stock_minimo': minimo}
+
+    def _stock(self, producto, talla):
+        return Inventario.objects.get(producto=producto, talla=talla).stock_talla
+
+
+class StockMasivoTest(_StockBase):
+
+    def test_lote_de_varios_productos(self):
+        enviar = self.enviar
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'items': [self._item(p, t, 10) for p in (self.p1, self.p2)
+                                                  for t in (self.s, self.m)]}, format='json')
+        # el restock inicial solo deja recuperaciones: nada que avisar
+        self.assertEqual(alertas_stock.despachar(espera=timedelta(0))['avisados'], 0)
+        items = [self._item(self.p1, self.s, 10), self._item(self.p1, self.m, 2),
+                 self._item(self.p2, self.s, 0), self._item(self.p2, self.m, 7)]
+        recalcular = mock.patch.object(disponibilidad, 'recalcular', wraps=disponibilidad.recalcular)
+        with recalcular as recalculos, self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(self.url, {'items': items}, format='json')
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(resp.json()['actualizados'], 4)
+        self.assertEqual(self._stock(self.p1, self.s), 10)
+        self.assertEqual(self._stock(self.p2, self.m), 7)
+        # un solo recálculo del resumen; los dos cruces del umbral quedan como eventos
+        self.assertEqual(recalculos.call_count, 1)
+        self.assertEqual(EventoStockBajo.objects.filter(enviado__isnull=True).count(), 2)
+        self.assertEqual(enviar.call_count, 0)
+        self.assertEqual(alertas_stock.despachar(espera=timedelta(0))['avisados'], 2)
+        self.assertEqual(enviar.call_count, 1)
+        self.assertIn('2 ítems', enviar.call_args.kwargs['subject'])
+        self.assertEqual(Producto.objects.get(pk=self.p2.pk).stock, 7)
+
+        # mismo lote otra vez: no cruza el umbral, no hay nada que avisar
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'items': items}, format='json')
+        self.assertIsNone(alertas_stock.despachar(espera=timedelta(0)))
+        self.assertEqual(enviar.call_count, 1)
+
+    def test_todo_o_nada(self):
+        otra = Talla.objects.create(nombre='XL', grupo=GrupoTalla.objects.create(nombre='Otro'))
+        items = [self._item(self.p1, self.s, 10), self._item(self.p1, otra, 3)]
+        resp = self.client.post(self.url, {'items': items}, format='json')
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(self._stock(self.p1, self.s), 0)
+
+    def test_validacion(self):
+        for items in ([], [self._item(self.p1, self.s, -1)],
+                      [self._item(self.p1, self.s, 1), self._item(self.p1, self.s, 2)],
+                      [{'producto_id': 'x', 'talla_id': self.s.pk}]):
+            resp = self.client.post(self.url, {'items': items}, format='json')
+            self.assertEqual(resp.status_code, 400, items)
+        resp = self.client.post(self.url, [self._item(self.p1, self.s, 1)], format='json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_bloquea_solo_los_pares_pedidos(self):
+        items = [self._item(self.p1, self.s, 4), self._item(self.p2, self.m, 6)]
+        with CaptureQueriesContext(connection) as ctx:
+            inventario_stock.actualizar(inventario_stock.normalizar_items(items))
+        lectura = next(q['sql'] for q in ctx.captured_queries if 'BACKEND_inventario' in q['sql']
+                       and q['sql'].startswith('SELECT'))
+        self.assertNotIn(' IN (', lectura)
+        self.assertEqual((self._stock(self.p1, self.m), self._stock(self.p2, self.m)), (0, 6))
+
+
+class DescontarStockTest(_StockBase):
+    """UPDATE condicional por (producto, talla): todo o nada para el pedido entero."""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'items': [
+                self._item(self.p1, self.s, 5), self._item(self.p1, self.m, 1), self._item(self.p2, self.s, 9),
+            ]}, format='json')
+
+    def test_descuenta_con_un_update_por_par(self):
+        # savepoint + 2 UPDATE + 1 lectura de los pares + 1 INSERT al libro de movimientos
+        # + 1 INSERT de los dos cruces del umbral de stock bajo (5 -> 3 y 9 -> 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(7):
+                inventario_stock.descontar({(self.p1.pk, self.s.pk): 2, (self.p2.pk, self.s.pk): 9})
+        self.assertEqual(self._stock(self.p1, self.s), 3)
+        self.assertEqual(self._stock(self.p2, self.s), 0)
+        self.assertEqual(Producto.objects.get(pk=self.p2.pk).stock, 0)
+
+    def test_todo_o_nada(self):
+        with self.assertRaises(inventario_stock.StockInsuficiente) as ctx:
+            inventario_stock.descontar({(self.p1.pk, self.s.pk): 2, (self.p1.pk, self.m.pk): 2})
+        self.assertEqual((ctx.exception.talla_id, ctx.exception.disponible), (self.m.pk, 1))
+        self.assertEqual(self._stock(self.p1, self.s), 5)
+
+    def test_factura_sin_stock(self):
+        pedido = Pedido.objects.create(usuario=self.admin)
+        serializer = FacturaCreateSerializer(data={
+            'numero': 'F-1', 'pedido_id': pedido.pk, 'usuario_id': self.admin.pk,
+            'items': [{'producto_id': self.p1.pk, 'talla_id': self.s.pk, 'cantidad': 3},
+                      {'producto_id': self.p1.pk, 'talla_id': self.s.pk, 'cantidad': 3}],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.assertRaisesMessage(Exception, 'Stock insuficiente para Blusa - Talla S. Disponible: 5'):
+            serializer.save()
+        self.assertEqual(self._stock(self.p1, self.s), 5)
+
+
+class SincronizarTallasTest(_StockBase):
+    url = '/BACKEND/api/inventario/set_grupo_talla_subcategoria/'
+
+    def setUp(self):
+        super().setUp()
+        self.sub = self.p1.subcategoria
+        self.calzado = GrupoTalla.objects.create(nombre='Calzado')
+        self.tallas = [Talla.objects.create(nombre=n, grupo=self.calzado) for n in ('37', '38', '39')]
+        inv = Inventario.objects.get(producto=self.p1, talla=self.s)
+        with self.captureOnCommitCallbacks(execute=True):
+            inv.stock_talla = 4
+            inv.save()
+
+    def _cambiar(self, grupo):
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(self.url, {'subcategoria_id': self.sub.pk, 'grupo_talla_id': grupo.pk},
+                                    format='json')
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return len(ctx), resp.json()['creados']
+
+    def test_consultas_constantes(self):
+        antes, creados = self._cambiar(self.calzado)
+        self.assertEqual(creados, 2 * 3)
+        self._cambiar(GrupoTalla.objects.get(nombre='Ropa'))
+        self.sub.refresh_from_db()
+        for i in range(4):
+            Producto.objects.create(nombre=f'Extra {i}', descripcion='d', precio=1000, subcategoria=self.sub)
+        despues, creados = self._cambiar(self.calzado)
+        self.assertEqual(antes, despues)
+        # los 2 productos originales ya tenían sus tallas de calzado
+        self.assertEqual(creados, 4 * 3)
+        self.assertEqual(self._cambiar(self.calzado)[1], 0)
+
+    def test_fila_insertada_por_otra_peticion_no_repite_movimiento(self):
+        bulk_create = Inventario.objects.bulk_create
+
+        def con_carrera(filas, **kwargs):
+            # otra petición inserta uno de los pares justo antes (save deja su movimiento inicial)
+            Inventario.objects.create(producto=self.p1, talla=self.tallas[0], stockMinimo=0)
+            return bulk_create(filas, **kwargs)
+
+        self.sub.grupoTalla = self.calzado
+        with mock.patch.object(Inventario.objects, 'bulk_create', side_effect=con_carrera):
+            creados = inventario_stock.sincronizar_tallas(self.sub)
+        self.assertEqual(len(creados), 2 * 3 - 1)
+        self.assertEqual(Movimiento.objects.filter(inventario__talla__grupo=self.calzado,
+                                                   tipo=Movimiento.INICIAL).count(), 2 * 3)
+
+    def test_no_borra_inventarios_del_grupo_anterior(self):
+        self._cambiar(self.calzado)
+        self.assertEqual(self._stock(self.p1, self.s), 4)
+        inv = Inventario.objects.get(producto=self.p2, talla=self.tallas[0])
+        self.assertEqual(inv.stockMinimo, self.sub.stockMinimo)
+        self.assertTrue(Movimiento.objects.filter(inventario=inv, tipo=Movimiento.INICIAL).exists())
+
+    def test_grupo_anterior_no_se_muestra_ni_se_vende(self):
+        self._cambiar(self.calzado)
+        calzado = sorted(t.pk for t in self.tallas)
+        # catálogo (prefetch de la vista y consulta del serializer): solo las tallas nuevas
+        for producto in self.client.get('/BACKEND/producto/').json():
+            self.assertEqual(sorted(t['idTalla'] for t in producto['inventario_tallas']), calzado)
+        self.assertEqual(sorted(t['idTalla'] for t in ProductoSerializer(self.p1).data['inventario_tallas']),
+                         calzado)
+
+        # la talla S conserva su stock pero no se reserva ni se vende
+        carrito = Carrito.objects.create()
+        self.assertEqual(reservas.disponible(self.p1.pk, self.s.pk), 0)
+        self.assertEqual(reservas.reservar(carrito, self.p1.pk, self.s.pk, 1), 0)
+        with self.assertRaises(inventario_stock.StockInsuficiente) as ctx:
+            inventario_stock.descontar({(self.p1.pk, self.s.pk): 1}, carrito=carrito)
+        self.assertEqual(ctx.exception.disponible, 0)
+        self.assertEqual(self._stock(self.p1, self.s), 4)
+
+    def test_talla_nueva_en_todos_los_productos_del_grupo(self):
+        self._cambiar(self.calzado)
+        self.sub.refresh_from_db()
+        for i in range(3):
+            Producto.objects.create(nombre=f'Extra {i}', descripcion='d', precio=1000, subcategoria=self.sub)
+        with self.captureOnCommitCallbacks(execute=True):
+            talla = Talla.objects.create(nombre='40', grupo=self.calzado)
+        self.assertEqual(Inventario.objects.filter(talla=talla).count(), 5)
+
+        # la vista y el comando solo completan lo que falta, en tandas
+        Inventario.objects.filter(talla=talla, producto__nombre__startswith='Extra').delete()
+        with CaptureQueriesContext(connection) as ctx:
+            resultado = inventario_stock.agregar_talla(talla, lote=2)
+        self.assertEqual((resultado['productos'], resultado['creados'], resultado['existentes']), (5, 3, 2))
+        # 3 tandas (+ la vacía que termina el recorrido), no una consulta por producto
+        self.assertLess(len(ctx), 20)
+        resp = self.client.post('/BACKEND/api/talla/agregar_talla_a_productos_existentes/',
+                                {'talla_id': talla.pk}, format='json')
+        self.assertEqual(resp.json()['estadisticas']['inventarios_creados'], 0)
+
+    def test_talla_en_grupo_grande_queda_para_el_worker(self):
+        self._cambiar(self.calzado)
+        with override_settings(TALLA_EN_LINEA_MAX_PRODUCTOS=1), self.captureOnCommitCallbacks(execute=True):
+            talla = Talla.objects.create(nombre='40', grupo=self.calzado)
+        self.assertFalse(Inventario.objects.filter(talla=talla).exists())
+        self.assertTrue(Talla.objects.get(pk=talla.pk).inventario_pendiente)
+
+        out = StringIO()
+        call_command('agregar_talla', pendientes=True, stdout=out)
+        self.assertIn('Inventarios creados: 2', out.getvalue())
+        self.assertEqual(Inventario.objects.filter(talla=talla).count(), 2)
+        self.assertFalse(Talla.objects.get(pk=talla.pk).inventario_pendiente)
+
+
+class AlertasStockBajoTest(_StockBase):
+    """Los cruces del umbral se juntan por ventana: un correo, no uno por talla."""
+
+    def setUp(self):
+        super().setUp()
+        inventario_stock.actualizar({(p.pk, t.pk): (10, 1) for p in (self.p1, self.p2) for t in (self.s, self.m)})
+        alertas_stock.despachar(espera=timedelta(0))
+
+    def _guardar(self, producto, talla, stock):
+        inv = Inventario.objects.get(producto=producto, talla=talla)
+        inv.stock_talla = stock
+        inv.save()
+
+    def test_saves_sueltos_se_agrupan_en_la_ventana(self):
+        self._guardar(self.p1, self.s, 3)
+        self._guardar(self.p1, self.m, 4)
+        self._guardar(self.p2, self.s, 2)
+        self._guardar(self.p2, self.s, 8)   # bajó y se recuperó dentro de la ventana
+        self._guardar(self.p2, self.m, 9)   # no cruza
+        self.assertEqual(EventoStockBajo.objects.filter(enviado__isnull=True).count(), 4)
+        self.assertEqual(self.enviar.call_count, 0)
+
+        # la ventana todavía no se cumple
+        self.assertIsNone(alertas_stock.despachar(espera=timedelta(minutes=5)))
+        resultado = alertas_stock.despachar(espera=timedelta(0))
+        self.assertEqual(resultado, {'eventos': 4, 'avisados': 2})
+        self.assertEqual(self.enviar.call_count, 1)
+        self.assertIn('2 ítems', self.enviar.call_args.kwargs['subject'])
+        self.assertFalse(EventoStockBajo.objects.filter(enviado__isnull=True).exists())
+
+    def test_despachar_borra_eventos_enviados_viejos(self):
+        self._guardar(self.p1, self.s, 3)
+        alertas_stock.despachar(espera=timedelta(0))
+        EventoStockBajo.objects.update(enviado=F('creado') - alertas_stock.RETENCION - timedelta(minutes=1))
+        self._guardar(self.p1, self.s, 9)
+        alertas_stock.despachar(espera=timedelta(0))
+        self.assertEqual(list(EventoStockBajo.objects.values_list('stock_nuevo', flat=True)), [9])
+
+    def test_descontar_anota_los_cruces(self):
+        inventario_stock.descontar({(self.p1.pk, self.s.pk): 6, (self.p1.pk, self.m.pk): 2})
+        evento = EventoStockBajo.objects.get(enviado__isnull=True)
+        self.assertEqual((evento.stock_anterior, evento.stock_nuevo), (10, 4))
+
+    def test_estado_en_tabla_evita_repetir_dentro_del_enfriamiento(self):
+        self._guardar(self.p1, self.s, 3)
+        alertas_stock.despachar(espera=timedelta(0))
+        alerta = LowStockAlert.objects.get(inventario__producto=self.p1, inventario__talla=self.s)
+        self.assertEqual((alerta.en_alerta, alerta.times_sent), (True, 1))
+
+        # otro proceso revisa el mismo ítem: ya avisado, no repite
+        inv = Inventario.objects.get(pk=alerta.inventario_id)
+        self.assertEqual(stock_alerts_core.low_stock_batch_check([inv]), 0)
+        LowStockAlert.objects.filter(pk=alerta.pk).update(
+            last_sent_at=alerta.last_sent_at - stock_alerts_core.LOW_STOCK_COOLDOWN)
+        self.assertEqual(stock_alerts_core.low_stock_batch_check([inv]), 1)
+
+        # se recupera y vuelve a bajar: avisa de nuevo sin esperar el enfriamiento
+        self._guardar(self.p1, self.s, 8)
+        alertas_stock.despachar(espera=timedelta(0))
+        self.assertFalse(LowStockAlert.objects.get(pk=alerta.pk).en_alerta)
+        self._guardar(self.p1, self.s, 2)
+        self.assertEqual(alertas_stock.despachar(espera=timedelta(0)), {'eventos': 1, 'avisados': 1})
+        self.assertEqual(LowStockAlert.objects.get(pk=alerta.pk).times_sent, 3)
+        self.assertEqual(self.enviar.call_count, 3)
+
+    def test_compara_con_el_umbral_del_lote(self):
+        self._guardar(self.p1, self.s, 3)
+        alertas_stock.despachar(espera=timedelta(0))
+        alerta = LowStockAlert.objects.get(inventario__producto=self.p1, inventario__talla=self.s)
+        LowStockAlert.objects.filter(pk=alerta.pk).update(umbral=2)  # fila con un umbral viejo
+
+        # 3 sigue bajo LOW_STOCK_UMBRAL: no se da por recuperado con el umbral guardado
+        inv = Inventario.objects.get(pk=alerta.inventario_id)
+        stock_alerts_core.low_stock_batch_check([inv])
+        alerta.refresh_from_db()
+        self.assertTrue(alerta.en_alerta)
+
+        # con el mismo umbral sí se recupera y la fila lo guarda
+        inv.stock_talla = stock_alerts_core.LOW_STOCK_UMBRAL
+        stock_alerts_core.low_stock_batch_check([inv])
+        alerta.refresh_from_db()
+        self.assertEqual((alerta.en_alerta, alerta.umbral), (False, stock_alerts_core.LOW_STOCK_UMBRAL))
+
+    def test_resumen_solo_con_cambios_desde_el_anterior(self):
+        resumen = mock.patch('BACKEND.services.alertas_stock.send_email_raw', return_value=1)
+        enviar_resumen = resumen.start()
+        self.addCleanup(resumen.stop)
+        self._guardar(self.p1, self.s, 3)
+        self._guardar(self.p2, self.m, 1)
+        alertas_stock.despachar(espera=timedelta(0))
+
+        self.assertEqual(alertas_stock.resumir(lote=1), {'correos': 2, 'bajos': 2, 'recuperados': 0})
+        self.assertEqual(alertas_stock.resumir(), {'correos': 0, 'bajos': 0, 'recuperados': 0})
+
+        self._guardar(self.p1, self.s, 8)
+        alertas_stock.despachar(espera=timedelta(0))
+        out = StringIO()
+        call_command('resumen_stock_bajo', stdout=out)
+        self.assertIn('0 en alerta, 1 recuperados', out.getvalue())
+        self.assertIn('Recuperados', enviar_resumen.call_args.kwargs['html_body'])
+        self.assertEqual(enviar_resumen.call_count, 3)
+
+    def test_resumen_no_marca_si_no_se_encola(self):
+        self._guardar(self.p1, self.s, 3)
+        alertas_stock.despachar(espera=timedelta(0))
+        with mock.patch('BACKEND.services.alertas_stock.send_email_raw', side_effect=RuntimeError('bandeja')):
+            with self.assertRaises(RuntimeError):
+                alertas_stock.resumir()
+        self.assertTrue(LowStockAlert.objects.filter(resumido__isnull=True, en_alerta=True).exists())
+
+
+class ResumenStockBajoTest(_StockBase):
+    """El resumen se filtra, ordena y limita en la base."""
+
+    def setUp(self):
+        super().setUp()
+        inventario_stock.actualizar({(self.p1.pk, self.s.pk): (2, 1), (self.p1.pk, self.m.pk): (7, 1),
+                                     (self.p2.pk, self.s.pk): (9, 1), (self.p2.pk, self.m.pk): (0, 1)})
+        # talla de un grupo que la subcategoría ya no usa: no entra al resumen
+        otro = Talla.objects.create(nombre='38', grupo=GrupoTalla.objects.create(nombre='Calzado'))
+        Inventario.objects.create(producto=self.p1, talla=otro, stock_talla=0)
+        resumen = mock.patch('BACKEND.views.send_email_raw', return_value=1)
+        self.enviar = resumen.start()
+        self.addCleanup(resumen.stop)
+
+    def _resumen(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post('/BACKEND/stock/send-digest/', data, format='json')
+        self.assertEqual(r.status_code, 200)
+        return r.data, self.enviar.call_args.kwargs['html_body']
+
+    def test_solo_bajos_del_grupo_actual(self):
+        data, html = self._resumen(umbral=5)
+        self.assertEqual((data['items'], data['hay_bajos']), (2, True))
+        self.assertLess(html.index('<td>Camisa</td>'), html.index('<td>Blusa</td>'))  # menos stock primero
+        self.assertNotIn('38', html)
+
+    def test_sin_bajos_manda_los_de_menos_stock(self):
+        data, html = self._resumen(umbral=0, top_n=3)
+        self.assertEqual((data['items'], data['hay_bajos']), (3, False))
+        self.assertNotIn('<strong>9</strong>', html)
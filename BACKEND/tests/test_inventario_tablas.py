@@ -0,0 +1,120 @@
+# BACKEND/tests/test_inventario_tablas.py
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from BACKEND.models import Rol, Usuario, Categoria, GrupoTalla, Talla, Subcategoria, Producto, Inventario
+
+
+class TablasInventarioTest(APITestCase):
+    """Las tablas del admin de inventario cuestan lo mismo con 1 o con N filas."""
+
+    def setUp(self):
+        rol = Rol.objects.create(nombre='administrador')
+        self.admin = Usuario.objects.create_user('a@x.com', 'Ana', 'Diaz', 'x', rol=rol, telefono='1')
+        self.client.force_authenticate(self.admin)
+        self.ropa = GrupoTalla.objects.create(nombre='Ropa')
+        self.s = Talla.objects.create(nombre='S', grupo=self.ropa)
+        self.m = Talla.objects.create(nombre='M', grupo=self.ropa)
+
+    def _categoria(self, nombre, productos=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            categoria = Categoria.objects.create(nombre=nombre)
+            sub = Subcategoria.objects.create(nombre=f'Sub {nombre}', categoria=categoria, grupoTalla=self.ropa)
+            for i in range(productos):
+                producto = Producto.objects.create(
+                    nombre=f'{nombre} {i}', descripcion='d', precio=1000, subcategoria=sub
+                )
+                for talla, stock in ((self.s, 3), (self.m, i)):
+                    inv = Inventario.objects.get(producto=producto, talla=talla)
+                    inv.stock_talla, inv.stockMinimo = stock, 2
+                    inv.save()
+        return categoria, sub
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx), resp.json()
+
+    def test_tabla_categorias(self):
+        mujer, _ = self._categoria('Mujer')
+        antes, _ = self._consultas('/BACKEND/api/inventario/tabla_categorias/')
+        for nombre in ('Hombre', 'Niños', 'Bebé'):
+            self._categoria(nombre, productos=3)
+        despues, datos = self._consultas('/BACKEND/api/inventario/tabla_categorias/')
+        self.assertEqual(antes, despues)
+
+        fila = next(d for d in datos['datos'] if d['id'] == mujer.pk)
+        self.assertEqual(fila['subcategorias_count'], 1)
+        self.assertEqual(fila['productos_count'], 2)
+        # stock 3+0 y 3+1; mínimo 2+2: ambos productos quedan en stock bajo
+        self.assertEqual(fila['stock_total'], 7)
+        self.assertEqual(fila['productos_stock_bajo'], 2)
+
+    def test_tabla_subcategorias(self):
+        mujer, blusas = self._categoria('Mujer')
+        url = f'/BACKEND/api/inventario/tabla_subcategorias/?categoria_id={mujer.pk}'
+        antes, _ = self._consultas(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            for nombre in ('Faldas', 'Vestidos'):
+                sub = Subcategoria.objects.create(nombre=nombre, categoria=mujer, grupoTalla=self.ropa)
+                Producto.objects.create(nombre=f'{nombre} 1', descripcion='d', precio=1000, subcategoria=sub)
+            # inventario de otro grupo: no cuenta
+            calzado = GrupoTalla.objects.create(nombre='Calzado')
+            Inventario.objects.create(producto=Producto.objects.get(nombre='Mujer 0'),
+                                      talla=Talla.objects.create(nombre='38', grupo=calzado), stock_talla=50)
+        despues, datos = self._consultas(url)
+        self.assertEqual(antes, despues)
+
+        fila = next(d for d in datos['datos'] if d['id'] == blusas.pk)
+        self.assertEqual(fila['productos_count'], 2)
+        self.assertEqual(fila['stock_total'], 7)
+        # mismo criterio que tabla_categorias: 3+0 y 3+1 contra mínimo 2+2
+        self.assertEqual(fila['productos_stock_bajo'], 2)
+        self.assertEqual(fila['grupoTalla']['nombre'], 'Ropa')
+
+    def test_tabla_productos_consultas_constantes(self):
+        _, blusas = self._categoria('Mujer')
+        url = f'/BACKEND/api/inventario/tabla_productos/?subcategoria_id={blusas.pk}'
+        antes, _ = self._consultas(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                Producto.objects.create(nombre=f'Extra {i}', descripcion='d', precio=1000, subcategoria=blusas)
+        despues, datos = self._consultas(url)
+        self.assertEqual(antes, despues)
+        fila = datos['datos'][1]
+        self.assertEqual((fila['stock_total'], fila['stock_minimo_total'], fila['estado_stock']), (4, 4, 'Bajo'))
+        self.assertEqual(fila['stock_por_talla']['S']['stock'], 3)
+
+    def test_tabla_productos_matriz(self):
+        _, blusas = self._categoria('Mujer')
+        _, datos = self._consultas(
+            f'/BACKEND/api/inventario/tabla_productos/?subcategoria_id={blusas.pk}&formato=matriz'
+        )
+        self.assertEqual([t['nombre'] for t in datos['tallas']], ['M', 'S'])
+        self.assertEqual([p['nombre'] for p in datos['productos']], ['Mujer 0', 'Mujer 1'])
+        self.assertEqual(datos['stock'], [[0, 3], [1, 3]])
+        self.assertEqual(datos['stock_minimo'], [[2, 2], [2, 2]])
+
+    def test_inventario_agrupado(self):
+        url = '/BACKEND/api/inventario/inventario_agrupado/'
+        self._categoria('Mujer')
+        antes, _ = self._consultas(url)
+        for nombre in ('Hombre', 'Niños'):
+            self._categoria(nombre, productos=3)
+        despues, datos = self._consultas(url)
+        self.assertEqual(antes, despues)
+
+        self.assertEqual([c['categoria']['nombre'] for c in datos], ['Hombre', 'Mujer', 'Niños'])
+        hombre = datos[0]['subcategorias']
+        self.assertEqual([s['nombre'] for s in hombre], ['Sub Hombre'])
+        # 3 productos x 2 tallas
+        self.assertEqual(len(hombre[0]['productos']), 6)
+        self.assertEqual(hombre[0]['productos'][0]['producto']['nombre'], 'Hombre 0')
+
+        resp = self.client.get(url + '?stream=1')
+        self.assertTrue(resp.streaming)
+        self.assertEqual(json.loads(b''.join(resp.streaming_content)), datos)
@@ -0,0 +1,104 @@
+# BACKEND/tests/test_movimientos.py
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from BACKEND.models import (
+    Rol, Usuario, Categoria, GrupoTalla, Talla, Subcategoria, Producto, Inventario, Movimiento,
+    InventarioSnapshot, Pedido,
+)
+from BACKEND.serializer import FacturaCreateSerializer
+from BACKEND.services import movimientos
+
+
+class LibroMovimientosTest(APITestCase):
+    """Cada mutación de stock deja su movimiento; el stock a una fecha se reconstruye."""
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        envio = mock.patch('BACKEND.services.stock_alerts_core.send_email_raw')
+        envio.start()
+        self.addCleanup(envio.stop)
+        rol = Rol.objects.create(nombre='administrador')
+        self.admin = Usuario.objects.create_user('a@x.com', 'Ana', 'Diaz', 'x', rol=rol, telefono='1')
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            ropa = GrupoTalla.objects.create(nombre='Ropa')
+            self.s = Talla.objects.create(nombre='S', grupo=ropa)
+            sub = Subcategoria.objects.create(nombre='Blusas', categoria=Categoria.objects.create(nombre='Mujer'),
+                                              grupoTalla=ropa)
+            self.producto = Producto.objects.create(nombre='Blusa', descripcion='d', precio=1000, subcategoria=sub)
+        self.inv = Inventario.objects.get(producto=self.producto, talla=self.s)
+
+    def _libro(self):
+        return list(Movimiento.objects.filter(inventario=self.inv).order_by('idmovimiento')
+                    .values_list('tipo', 'cantidad', 'stock_resultante'))
+
+    def _ajustar(self, stock):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post('/BACKEND/api/inventario/actualizar_stock_masivo/', {'items': [
+                {'producto_id': self.producto.pk, 'talla_id': self.s.pk, 'stock': stock, 'stock_minimo': 1},
+            ]}, format='json')
+        self.assertEqual(resp.status_code, 200)
+
+    def test_cada_mutacion_queda_en_el_libro(self):
+        self._ajustar(10)
+        pedido = Pedido.objects.create(usuario=self.admin)
+        serializer = FacturaCreateSerializer(data={
+            'numero': 'F-1', 'pedido_id': pedido.pk, 'usuario_id': self.admin.pk,
+            'items': [{'producto_id': self.producto.pk, 'talla_id': self.s.pk, 'cantidad': 4}],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+        # edición por save() (admin de Django, actualizar_stock, ...)
+        inv = Inventario.objects.get(pk=self.inv.pk)
+        inv.stock_talla = 8
+        inv.save()
+        # un save que no toca stock_talla no registra nada
+        inv.stockMinimo = 3
+        inv.save(update_fields=['stockMinimo'])
+
+        self.assertEqual(self._libro(), [
+            ('inicial', 0, 0), ('ajuste', 10, 10), ('venta', -4, 6), ('ajuste', 2, 8),
+        ])
+        self.assertEqual(Movimiento.objects.get(tipo='venta').referencia, 'factura:F-1')
+
+    def test_stock_a_una_fecha(self):
+        self._ajustar(10)
+        Movimiento.objects.filter(inventario=self.inv).update(fecha=timezone.now() - timedelta(days=3))
+        movimientos.tomar_snapshot(timezone.now() - timedelta(days=2))
+        self._ajustar(4)
+
+        hace_dias = timezone.now() - timedelta(days=1)
+        self.assertEqual(movimientos.stock_en(self.inv.pk, hace_dias), 10)
+        self.assertEqual(movimientos.stock_en(self.inv.pk, timezone.now()), 4)
+        self.assertEqual(movimientos.stock_en(self.inv.pk, timezone.now() - timedelta(days=5)), None)
+
+        resp = self.client.get(f'/BACKEND/api/movimientos/stock_en/?inventario={self.inv.pk}')
+        self.assertEqual(resp.json()['stock'], 4)
+
+    def test_inventario_previo_al_libro(self):
+        # como los inventarios que ya existían al migrar: solo el snapshot inicial
+        Movimiento.objects.all().delete()
+        InventarioSnapshot.objects.create(inventario=self.inv, tomado=timezone.now(), stock_talla=0)
+        self.assertEqual(movimientos.stock_en(self.inv.pk, timezone.now() - timedelta(hours=1)), None)
+        self.assertEqual(movimientos.stock_en(self.inv.pk, timezone.now()), 0)
+
+    def test_listado_por_sku_y_rango(self):
+        for stock in (3, 5, 9):
+            self._ajustar(stock)
+        Movimiento.objects.filter(cantidad=3).update(fecha=timezone.now() - timedelta(days=40))
+        resp = self.client.get(f'/BACKEND/api/movimientos/?producto={self.producto.pk}&talla={self.s.pk}')
+        self.assertEqual(resp.status_code, 200)
+        # los últimos 30 días por defecto, más nuevo primero
+        self.assertEqual([m['cantidad'] for m in resp.json()], [4, 2, 0])
+        self.assertEqual(resp.json()[0]['talla_nombre'], 'S')
+
+        desde = (timezone.now() - timedelta(days=60)).date().isoformat()
+        resp = self.client.get(f'/BACKEND/api/movimientos/?inventario={self.inv.pk}&desde={desde}&tipo=ajuste')
+        self.assertEqual([m['cantidad'] for m in resp.json()], [4, 2, 3])
+        self.assertEqual(self.client.get('/BACKEND/api/movimientos/?desde=ayer').status_code, 400)
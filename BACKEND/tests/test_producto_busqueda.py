@@ -0,0 +1,79 @@
+# BACKEND/tests/test_producto_busqueda.py
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from BACKEND.models import Categoria, GrupoTalla, Talla, Subcategoria, Producto, Inventario
+
+
+class ProductoBusquedaTest(APITestCase):
+    url = '/BACKEND/producto/buscar/'
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        grupo = GrupoTalla.objects.create(nombre='Ropa')
+        self.talla_s = Talla.objects.create(nombre='S', grupo=grupo)
+        self.talla_m = Talla.objects.create(nombre='M', grupo=grupo)
+        mujer = Categoria.objects.create(nombre='Mujer')
+        hombre = Categoria.objects.create(nombre='Hombre')
+        self.blusas = Subcategoria.objects.create(nombre='Blusas', categoria=mujer, grupoTalla=grupo)
+        self.camisas = Subcategoria.objects.create(nombre='Camisas', categoria=hombre, grupoTalla=grupo)
+        self.mujer = mujer
+
+        def crear(nombre, descripcion, sub):
+            return Producto.objects.create(nombre=nombre, descripcion=descripcion, precio=1000, subcategoria=sub)
+
+        self.en_nombre = crear('Blusa roja', 'Algodón', self.blusas)
+        self.en_desc = crear('Top básico', 'Tono rojo intenso', self.blusas)
+        self.camisa = crear('Camisa roja', 'Lino', self.camisas)
+        crear('Pantalón azul', 'Denim', self.camisas)
+        Inventario.objects.filter(producto=self.en_nombre, talla=self.talla_m).update(stock_talla=3)
+        Inventario.objects.filter(producto=self.camisa, talla=self.talla_m).update(stock_talla=1)
+
+    def test_ranking_y_facetas_en_consultas_constantes(self):
+        # búsqueda + facetas (1) + productos (1) + tallas prefetch (1) + versiones (1)
+        with self.assertNumQueries(4):
+            data = self.client.get(self.url, {'q': 'roja'}).json()
+        self.assertEqual(data['total'], 2)
+        self.assertEqual({p['id'] for p in data['results']}, {self.en_nombre.id, self.camisa.id})
+        self.assertIn('relevancia', data['results'][0])
+        self.assertEqual({f['nombre']: f['total'] for f in data['facetas']['categoria']},
+                         {'Mujer': 1, 'Hombre': 1})
+        self.assertEqual(data['facetas']['talla'], [{'id': self.talla_m.id, 'nombre': 'M', 'total': 2}])
+
+    def test_nombre_pesa_mas_que_descripcion(self):
+        Producto.objects.filter(pk=self.en_desc.pk).update(descripcion='Tono roja intenso')
+        data = self.client.get(self.url, {'q': 'roja'}).json()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(data['results'][-1]['id'], self.en_desc.id)
+
+    def test_prefijo_y_acentos(self):
+        data = self.client.get(self.url, {'q': 'algod'}).json()
+        self.assertEqual([p['id'] for p in data['results']], [self.en_nombre.id])
+        data = self.client.get(self.url, {'q': 'basico'}).json()
+        self.assertEqual([p['id'] for p in data['results']], [self.en_desc.id])
+
+    def test_filtros_recortan_resultados_y_facetas(self):
+        data = self.client.get(self.url, {'q': 'roja', 'categoria': self.mujer.pk}).json()
+        self.assertEqual([p['id'] for p in data['results']], [self.en_nombre.id])
+        self.assertEqual([f['nombre'] for f in data['facetas']['subcategoria']], ['Blusas'])
+
+    def test_consulta_vacia_o_invalida(self):
+        data = self.client.get(self.url, {'q': '  "*" '}).json()
+        self.assertEqual(data['total'], 0)
+        resp = self.client.get(self.url, {'q': 'roja', 'talla': 'x'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_faceta_talla_ignora_grupo_anterior(self):
+        calzado = GrupoTalla.objects.create(nombre='Calzado')
+        Inventario.objects.create(producto=self.camisa, talla=Talla.objects.create(nombre='40', grupo=calzado),
+                                  stock_talla=5)
+        data = self.client.get(self.url, {'q': 'roja'}).json()
+        self.assertEqual([f['nombre'] for f in data['facetas']['talla']], ['M'])
+        # el filtro por esa talla tampoco la encuentra
+        talla_40 = Talla.objects.get(nombre='40')
+        self.assertEqual(self.client.get(self.url, {'q': 'roja', 'talla': talla_40.pk}).json()['total'], 0)
+
+    def test_buscar_con_fields(self):
+        resp = self.client.get(self.url, {'q': 'roja', 'fields': 'nombre'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual({tuple(sorted(p)) for p in resp.json()['results']}, {('nombre', 'relevancia')})
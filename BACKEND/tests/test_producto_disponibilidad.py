@@ -0,0 +1,127 @@
+# BACKEND/tests/test_producto_disponibilidad.py
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.test import APITestCase
+
+from BACKEND.models import (
+    Rol, Usuario, Categoria, GrupoTalla, Talla, Subcategoria, Producto, Inventario, Pedido, PedidoItem,
+    Carrito, ReservaStock,
+)
+from BACKEND.orders import confirmar_pedido_y_descontar_stock
+from BACKEND.serializer import FacturaCreateSerializer
+from BACKEND.services import disponibilidad, reservas
+
+
+class DisponibilidadProductoTest(APITestCase):
+    """Producto.stock / stock_bajo y el filtro por talla con stock siguen al inventario en cada mutación."""
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ropa = GrupoTalla.objects.create(nombre='Ropa')
+            self.calzado = GrupoTalla.objects.create(nombre='Calzado')
+            self.s = Talla.objects.create(nombre='S', grupo=self.ropa)
+            self.m = Talla.objects.create(nombre='M', grupo=self.ropa)
+            self.t38 = Talla.objects.create(nombre='38', grupo=self.calzado)
+            categoria = Categoria.objects.create(nombre='Mujer')
+            self.sub = Subcategoria.objects.create(nombre='Blusas', categoria=categoria, grupoTalla=self.ropa)
+            self.producto = Producto.objects.create(
+                nombre='Blusa', descripcion='desc', precio=1000, subcategoria=self.sub
+            )
+            # inventario huérfano de otro grupo: no debe contar
+            Inventario.objects.create(producto=self.producto, talla=self.t38, stock_talla=50)
+        rol = Rol.objects.create(nombre='cliente')
+        self.usuario = Usuario.objects.create_user('c@x.com', 'Ana', 'Diaz', 'x', rol=rol, telefono='1')
+
+    def _resumen(self):
+        p = Producto.objects.get(pk=self.producto.pk)
+        productos = Producto.objects.filter(pk=p.pk)
+        tallas = [t.pk for t in (self.s, self.m, self.t38)
+                  if disponibilidad.con_stock_en_talla(productos, t.pk).exists()]
+        return p.stock, p.stock_bajo, tallas
+
+    def _poner_stock(self, **por_talla):
+        with self.captureOnCommitCallbacks(execute=True):
+            for talla, stock in por_talla.items():
+                inv = Inventario.objects.get(producto=self.producto, talla=getattr(self, talla))
+                inv.stock_talla = stock
+                inv.save()
+
+    def test_producto_nuevo(self):
+        self.assertEqual(self._resumen(), (0, True, []))
+
+    def test_actualizar_stock_tallas_recalcula_una_vez(self):
+        self.client.force_authenticate(self.usuario)
+        recalcular = mock.patch.object(disponibilidad, 'recalcular', wraps=disponibilidad.recalcular)
+        with recalcular as recalculos, self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post('/BACKEND/api/inventario/actualizar_stock_tallas/', {
+                'producto_id': self.producto.pk,
+                'tallas': [{'talla_id': self.s.pk, 'stock': 6, 'stock_minimo': 1},
+                           {'talla_id': self.m.pk, 'stock': 0, 'stock_minimo': 1}],
+            }, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(recalculos.call_count, 1)
+        self.assertEqual(self._resumen(), (6, False, [self.s.pk]))
+
+    def test_factura_descuenta(self):
+        self._poner_stock(s=7, m=8)
+        pedido = Pedido.objects.create(usuario=self.usuario)
+        serializer = FacturaCreateSerializer(data={
+            'numero': 'F-1', 'pedido_id': pedido.pk, 'usuario_id': self.usuario.pk,
+            'items': [{'producto_id': self.producto.pk, 'talla_id': self.m.pk, 'cantidad': 8}],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+        self.assertEqual(self._resumen(), (7, False, [self.s.pk]))
+
+    def test_confirmar_pedido_descuenta(self):
+        self._poner_stock(s=3)
+        # el comprador tiene reservadas las 3 unidades: no cuentan en su contra
+        carrito = Carrito.objects.create(usuario=self.usuario)
+        self.assertEqual(reservas.reservar(carrito, self.producto.pk, self.s.pk, 3), 3)
+        pedido = Pedido.objects.create(usuario=self.usuario)
+        PedidoItem.objects.create(pedido=pedido, producto=self.producto, talla=self.s,
+                                  cantidad=3, precio=1000, subtotal=3000)
+        with self.captureOnCommitCallbacks(execute=True):
+            confirmar_pedido_y_descontar_stock(pedido.pk, carrito=carrito)
+        self.assertEqual(self._resumen(), (0, True, []))
+        self.assertFalse(ReservaStock.objects.filter(carrito=carrito).exists())
+
+    def test_rollback_no_toca_el_resumen(self):
+        self._poner_stock(s=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    inv = Inventario.objects.get(producto=self.producto, talla=self.s)
+                    inv.stock_talla = 0
+                    inv.save()
+                    raise RuntimeError('checkout fallido')
+            except RuntimeError:
+                pass
+        self.assertEqual(self._resumen(), (4, False, [self.s.pk]))
+
+    def test_cambio_de_grupo(self):
+        self._poner_stock(s=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sub.grupoTalla = self.calzado
+            self.sub.save()
+        self.assertEqual(self._resumen(), (50, False, [self.t38.pk]))
+
+    def test_savepoint_descartado_no_pierde_el_recalculo(self):
+        self._poner_stock(s=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    inv = Inventario.objects.get(producto=self.producto, talla=self.s)
+                    inv.stock_talla = 0
+                    inv.save()
+                    raise RuntimeError('savepoint descartado')
+            except RuntimeError:
+                pass
+            inv = Inventario.objects.get(producto=self.producto, talla=self.m)
+            inv.stock_talla = 3
+            inv.save()
+        self.assertEqual(self._resumen(), (7, False, [self.s.pk, self.m.pk]))
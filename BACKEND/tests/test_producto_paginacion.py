@@ -0,0 +1,87 @@
+# BACKEND/tests/test_producto_paginacion.py
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from BACKEND.models import Categoria, GrupoTalla, Talla, Subcategoria, Producto, Inventario
+
+
+class ProductoCursorPaginationTest(APITestCase):
+    url = '/BACKEND/producto/'
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        self.grupo = GrupoTalla.objects.create(nombre='Ropa')
+        self.talla_s = Talla.objects.create(nombre='S', grupo=self.grupo)
+        self.talla_m = Talla.objects.create(nombre='M', grupo=self.grupo)
+        cat_a = Categoria.objects.create(nombre='Mujer')
+        cat_b = Categoria.objects.create(nombre='Hombre')
+        self.sub_a = Subcategoria.objects.create(nombre='Blusas', categoria=cat_a, grupoTalla=self.grupo)
+        self.sub_b = Subcategoria.objects.create(nombre='Camisas', categoria=cat_b, grupoTalla=self.grupo)
+        self.cat_a = cat_a
+        # precios repetidos a propósito para probar el desempate por id
+        precios = [3000, 1000, 2000, 1000, 3000, 2000, 1000]
+        self.productos = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, precio in enumerate(precios):
+                sub = self.sub_a if i % 2 == 0 else self.sub_b
+                self.productos.append(Producto.objects.create(
+                    nombre=f'P{i}', descripcion='desc', precio=precio, subcategoria=sub
+                ))
+
+    def _recorrer(self, params):
+        vistos = []
+        resp = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(resp.status_code, 200)
+            body = resp.json()
+            vistos.extend(body['results'])
+            if not body['next']:
+                return vistos
+            resp = self.client.get(body['next'])
+
+    def test_sin_parametros_devuelve_lista_completa(self):
+        resp = self.client.get(self.url)
+        self.assertIsInstance(resp.json(), list)
+        self.assertEqual(len(resp.json()), len(self.productos))
+
+    def test_recorrido_por_id(self):
+        vistos = self._recorrer({'page_size': 3})
+        self.assertEqual([p['id'] for p in vistos], sorted(p.id for p in self.productos))
+
+    def test_recorrido_por_precio_desempata_por_id(self):
+        vistos = self._recorrer({'page_size': 2, 'ordering': 'precio'})
+        esperado = sorted(self.productos, key=lambda p: (p.precio, p.id))
+        self.assertEqual([p['id'] for p in vistos], [p.id for p in esperado])
+
+    def test_pagina_profunda_cuesta_lo_mismo(self):
+        primera = self.client.get(self.url, {'page_size': 2}).json()
+        with self.assertNumQueries(3):  # versiones + página + tallas
+            self.client.get(primera['next'])
+
+    def test_cursor_invalido(self):
+        resp = self.client.get(self.url, {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(resp.status_code, 404)
+
+    def test_filtros(self):
+        por_sub = self.client.get(self.url, {'subcategoria': self.sub_b.pk}).json()
+        self.assertEqual({p['subcategoria'] for p in por_sub}, {self.sub_b.pk})
+
+        por_cat = self.client.get(self.url, {'categoria': self.cat_a.pk}).json()
+        self.assertEqual({p['categoria_nombre'] for p in por_cat}, {'Mujer'})
+
+        con_stock = self.productos[2]
+        inv = Inventario.objects.get(producto=con_stock, talla=self.talla_m)
+        with self.captureOnCommitCallbacks(execute=True):
+            inv.stock_talla = 4
+            inv.save()
+        resp = self.client.get(self.url, {'talla_stock': self.talla_m.pk}).json()
+        self.assertEqual([p['id'] for p in resp], [con_stock.id])
+
+        resp = self.client.get(self.url, {'en_stock': 1}).json()
+        self.assertEqual([p['id'] for p in resp], [con_stock.id])
+
+    def test_filtros_no_numericos_no_rompen(self):
+        for params in ({'subcategoria': 'abc'}, {'categoria': 'x'}, {'talla_stock': 'm'}):
+            resp = self.client.get(self.url, params)
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json(), [])
@@ -0,0 +1,89 @@
+# BACKEND/tests/test_producto_queries.py
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from BACKEND.models import Categoria, GrupoTalla, Talla, Subcategoria, Producto
+
+
+class ProductoListQueriesTest(APITestCase):
+    """
+    El listado público de productos debe costar un número fijo de consultas,
+    sin importar cuántos productos (ni tallas) tenga el catálogo.
+    """
+    url = '/BACKEND/producto/'
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        self.grupo = GrupoTalla.objects.create(nombre='Ropa')
+        for nombre in ('S', 'M', 'L'):
+            Talla.objects.create(nombre=nombre, grupo=self.grupo)
+        self.categoria = Categoria.objects.create(nombre='Mujer')
+        self.subcategoria = Subcategoria.objects.create(
+            nombre='Blusas', categoria=self.categoria, grupoTalla=self.grupo
+        )
+
+    def _crear_productos(self, n, desde=0):
+        # ejecuta los on_commit: sube la versión del catálogo como en producción
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(desde, desde + n):
+                Producto.objects.create(
+                    nombre=f'Producto {i}', descripcion='desc', precio=1000 + i,
+                    subcategoria=self.subcategoria
+                )
+
+    def test_listado_con_consultas_constantes(self):
+        # versiones del catálogo + productos + tallas prefetch
+        self._crear_productos(2)
+        with self.assertNumQueries(3):
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), 2)
+
+        self._crear_productos(15, desde=2)
+        with self.assertNumQueries(3):
+            resp = self.client.get(self.url)
+        self.assertEqual(len(resp.json()), 17)
+
+    def test_inventario_tallas_desde_prefetch(self):
+        self._crear_productos(1)
+        data = self.client.get(self.url).json()[0]
+        self.assertEqual([t['talla'] for t in data['inventario_tallas']], ['L', 'M', 'S'])
+        self.assertEqual(data['categoria_nombre'], 'Mujer')
+        self.assertEqual(data['subcategoria_nombre'], 'Blusas')
+
+
+class CamposDinamicosTest(APITestCase):
+    """?fields= / ?omit= recortan el payload y evitan las consultas de lo que no se pide."""
+    url = '/BACKEND/producto/'
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        grupo = GrupoTalla.objects.create(nombre='Ropa')
+        Talla.objects.create(nombre='S', grupo=grupo)
+        categoria = Categoria.objects.create(nombre='Mujer')
+        subcategoria = Subcategoria.objects.create(nombre='Blusas', categoria=categoria, grupoTalla=grupo)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Producto.objects.create(nombre=f'P{i}', descripcion='d', precio=10, subcategoria=subcategoria)
+
+    def test_fields_sin_prefetch_de_tallas(self):
+        with self.assertNumQueries(2):  # versiones + productos
+            data = self.client.get(self.url, {'fields': 'id,nombre'}).json()
+        self.assertEqual(set(data[0]), {'id', 'nombre'})
+
+    def test_omit(self):
+        with self.assertNumQueries(2):
+            data = self.client.get(self.url, {'omit': 'inventario_tallas,descripcion'}).json()
+        self.assertNotIn('inventario_tallas', data[0])
+        self.assertNotIn('descripcion', data[0])
+        self.assertIn('categoria_nombre', data[0])
+
+    def test_inventario_anidado_no_se_recorta(self):
+        from BACKEND.models import Rol, Usuario
+        rol = Rol.objects.create(nombre='cliente')
+        self.client.force_authenticate(
+            Usuario.objects.create_user('c@x.com', 'Ana', 'Diaz', 'x', rol=rol, telefono='1'))
+        data = self.client.get('/BACKEND/api/inventario/', {'fields': 'idInventario,producto'}).json()
+        fila = data[0] if isinstance(data, list) else data['results'][0]
+        self.assertEqual(set(fila), {'idInventario', 'producto'})
+        self.assertIn('inventario_tallas', fila['producto'])
@@ -0,0 +1,118 @@
+# BACKEND/tests/test_reservas.py
+import io
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from BACKEND.models import (
+    Carrito, CarritoItem, Categoria, GrupoTalla, Talla, Subcategoria, Producto, Inventario, ReservaStock, Rol,
+    Usuario,
+)
+from BACKEND.services import inventario_stock, reservas
+
+
+class ReservasCarritoTest(APITestCase):
+    """Lo que un carrito agrega queda apartado: otro carrito no puede venderlo hasta que venza."""
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            ropa = GrupoTalla.objects.create(nombre='Ropa')
+            self.s = Talla.objects.create(nombre='S', grupo=ropa)
+            sub = Subcategoria.objects.create(nombre='Blusas', categoria=Categoria.objects.create(nombre='Mujer'),
+                                              grupoTalla=ropa)
+            self.blusa = Producto.objects.create(nombre='Blusa', descripcion='d', precio=1000, subcategoria=sub)
+            self.inv = Inventario.objects.get(producto=self.blusa, talla=self.s)
+            self.inv.stock_talla = 3
+            self.inv.save()
+        self.a = Carrito.objects.create()
+        self.b = Carrito.objects.create()
+
+    def _agregar(self, carrito, cantidad):
+        return self.client.post(f'/BACKEND/carrito/{carrito.pk}/agregar_producto/',
+                                {'producto': self.blusa.pk, 'talla': self.s.pk, 'cantidad': cantidad}, format='json')
+
+    def _vencer(self, carrito):
+        ReservaStock.objects.filter(carrito=carrito).update(expira=timezone.now() - timedelta(minutes=1))
+
+    def test_otro_carrito_solo_ve_lo_no_reservado(self):
+        self.assertEqual(self._agregar(self.a, 2).status_code, 200)
+        resp = self._agregar(self.b, 5)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('nota', resp.json())
+        self.assertEqual(CarritoItem.objects.get(carrito=self.b).cantidad, 1)
+        self.assertEqual(self._agregar(self.b, 1).status_code, 400)
+        # el inventario no se toca hasta facturar
+        self.assertEqual(Inventario.objects.get(pk=self.inv.pk).stock_talla, 3)
+        self.assertEqual(reservas.disponible(self.blusa.pk, self.s.pk), 0)
+        self.assertEqual(reservas.disponible(self.blusa.pk, self.s.pk, carrito=self.a), 2)
+
+    def test_reserva_vencida_deja_de_contar(self):
+        self._agregar(self.a, 3)
+        self.assertEqual(self._agregar(self.b, 1).status_code, 400)
+        self._vencer(self.a)
+        self.assertEqual(self._agregar(self.b, 2).status_code, 200)
+        self.assertEqual(reservas.disponible(self.blusa.pk, self.s.pk), 1)
+
+    def test_eliminar_libera_salvo_reserve(self):
+        self._agregar(self.a, 3)
+        item = CarritoItem.objects.get(carrito=self.a)
+        self.client.post(f'/BACKEND/carrito/{self.a.pk}/eliminar_producto/',
+                         {'item_id': item.pk, 'skip_stock': True, 'reserve': True}, format='json')
+        self.assertEqual(reservas.disponible(self.blusa.pk, self.s.pk), 0)
+
+        self._agregar(self.a, 3)
+        self.client.post(f'/BACKEND/carrito/{self.a.pk}/limpiar_carrito/', {'skip_stock': True}, format='json')
+        self.assertEqual(reservas.disponible(self.blusa.pk, self.s.pk), 3)
+        self.assertFalse(ReservaStock.objects.exists())
+
+    def test_actualizar_cantidad_ajusta_la_reserva(self):
+        self._agregar(self.b, 1)
+        self._agregar(self.a, 1)
+        item = CarritoItem.objects.get(carrito=self.a)
+        resp = self.client.post(f'/BACKEND/carrito/{self.a.pk}/actualizar_cantidad/',
+                                {'item_id': item.pk, 'cantidad': 9}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(CarritoItem.objects.get(pk=item.pk).cantidad, 2)
+        self.assertEqual(ReservaStock.objects.get(carrito=self.a).cantidad, 2)
+
+    def test_liberar_reservas_borra_vencidas_por_lotes(self):
+        otro = Talla.objects.create(nombre='M', grupo=self.s.grupo)
+        for talla in (self.s, otro):
+            Inventario.objects.update_or_create(producto=self.blusa, talla=talla, defaults={'stock_talla': 5})
+            for carrito in (self.a, self.b):
+                reservas.reservar(carrito, self.blusa.pk, talla.pk, 1)
+        self._vencer(self.a)
+        salida = io.StringIO()
+        call_command('liberar_reservas', '--lote', '1', stdout=salida)
+        self.assertIn('liberadas: 2', salida.getvalue())
+        self.assertEqual(set(ReservaStock.objects.values_list('carrito_id', flat=True)), {self.b.pk})
+
+    def test_checkout_no_vende_lo_reservado_por_otro(self):
+        self._agregar(self.a, 2)
+        par = {(self.blusa.pk, self.s.pk): 2}
+        with self.assertRaises(inventario_stock.StockInsuficiente) as e:
+            inventario_stock.descontar(par)
+        self.assertEqual(e.exception.disponible, 1)
+        # el carrito que reservó sí puede pagar lo suyo
+        inventario_stock.descontar(par, carrito=self.a)
+        self.inv.refresh_from_db()
+        self.assertEqual(self.inv.stock_talla, 1)
+
+    def test_factura_libera_las_reservas_del_carrito(self):
+        self._agregar(self.a, 2)
+        rol = Rol.objects.create(nombre='cliente')
+        self.a.usuario = Usuario.objects.create_user('a@x.com', 'Ana', 'Diaz', 'x', rol=rol, telefono='1')
+        self.a.save()
+        self.assertEqual(reservas.disponible(self.blusa.pk, self.s.pk, self.b), 1)
+        self.client.force_authenticate(self.a.usuario)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post('/BACKEND/api/facturas/crear_desde_pago/', {'carrito_id': self.a.pk},
+                                    format='json')
+        self.assertEqual(resp.status_code, 201, resp.content)
+        # se vendieron 2 de 3: al otro carrito le queda 1, no 1 - 2 reservadas
+        self.assertFalse(ReservaStock.objects.filter(carrito=self.a).exists())
+        self.assertEqual(reservas.disponible(self.blusa.pk, self.s.pk, self.b), 1)
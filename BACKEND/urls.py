@@ -25,6 +25,7 @@ protected_router.register(r'pedido_detalle', views.PedidoProductoView, basename=
 protected_router.register(r'categoria', views.CategoriaViewSet, basename='categoria')
 protected_router.register(r'proveedores', views.ProveedorView, basename='proveedores')
 protected_router.register(r'inventario', views.InventarioView, basename='inventario')
+protected_router.register(r'movimientos', views.MovimientoView, basename='movimiento')
 protected_router.register(r'carrito', views.CarritoView, basename='carrito')
 protected_router.register(r'carrito-item', views.CarritoItemView, basename='carrito-item')
 protected_router.register(r'estado-carrito', views.EstadoCarritoView, basename='estado-carrito')
@@ -44,6 +45,10 @@ urlpatterns = [
     # Protegido bajo /BACKEND/api/ (coincide con tu VITE_API_URL_PROTECTED)
     path('api/', include(protected_router.urls)),
 
+    # Árbol de categorías/subcategorías/tallas para el arranque del SPA
+    path('taxonomia/', views.TaxonomiaView.as_view(), name='taxonomia'),
+    path('api/taxonomia/', views.TaxonomiaView.as_view(), name='taxonomia-api'),
+
     # JWT
     path('BACKEND/api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('BACKEND/api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
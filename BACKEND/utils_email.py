@@ -1,23 +1,26 @@
 # BACKEND/utils_email.py
 
 # Enviar correos usando Maileroo API (HTTP)
+# Las peticiones solo encolan (CorreoSaliente); el POST a Maileroo lo hace el
+# comando enviar_correos con services/bandeja_salida.py.
 import os
-import json
-import requests
 from django.conf import settings
 
+from BACKEND.services import http_client
+
 MAILEROO_API_KEY = os.getenv("MAILEROO_API_KEY", getattr(settings, "MAILEROO_API_KEY", ""))
 MAILEROO_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", getattr(settings, "DEFAULT_FROM_EMAIL", "Variedadesyestiloszoe@bb72b3c7eb447366.maileroo.org"))
 MAILEROO_FROM_NAME = os.getenv("DEFAULT_FROM_NAME", getattr(settings, "DEFAULT_FROM_NAME", "Variedades Zoe"))
 
 def send_email_raw(subject, to_emails, html_body, text_body=None, from_email=None):
     """
-    Envía un correo usando la API HTTP de Maileroo.
+    Encola un correo para la API HTTP de Maileroo.
     subject: asunto
     to_emails: lista o string de destinatarios
     html_body: cuerpo HTML
     text_body: cuerpo texto plano (opcional)
     from_email: remitente (opcional)
+    Devuelve 1 si quedó en la bandeja de salida, 0 si no había destinatarios.
     """
     if isinstance(to_emails, str):
         to_emails = [to_emails]
@@ -28,11 +31,6 @@ def send_email_raw(subject, to_emails, html_body, text_body=None, from_email=Non
         print(f"[WARN] Email NO enviado: sin destinatarios válidos. subject={subject!r}")
         return 0
 
-    url = "https://smtp.maileroo.com/api/v2/emails"
-    api_headers = {
-        "X-API-Key": MAILEROO_API_KEY,
-        "Content-Type": "application/json"
-    }
     data = {
         "from": {
             "address": from_email or MAILEROO_FROM_EMAIL,
@@ -45,19 +43,22 @@ def send_email_raw(subject, to_emails, html_body, text_body=None, from_email=Non
     if text_body:
         data["plain"] = text_body
 
-    print("[Maileroo][REQUEST] URL:", url)
-    print("[Maileroo][REQUEST] Headers:", api_headers)
-    print("[Maileroo][REQUEST] Data:", json.dumps(data, ensure_ascii=False))
-    try:
-        response = requests.post(url, headers=api_headers, json=data)
-        print(f"[Maileroo][RESPONSE] Status: {response.status_code}")
-        print(f"[Maileroo][RESPONSE] Body: {response.text}")
-        if response.status_code >= 400:
-            import sys
-            print(f"[Maileroo][ERROR] {response.status_code}: {response.text}", file=sys.stderr)
-            return 0
-    except Exception as e:
-        import sys
-        print(f"[Maileroo][EXCEPTION] {str(e)}", file=sys.stderr)
-        return 0
+    from BACKEND.services import bandeja_salida
+    bandeja_salida.encolar(data)
     return 1
+
+
+def enviar_a_maileroo(data):
+    """
+    POST de un payload ya armado a Maileroo por el cliente compartido (conexión
+    reutilizada), con timeout de lectura EMAIL_TIMEOUT.
+    Devuelve (status_code, texto); los errores de red se propagan (requests.RequestException).
+    """
+    response = http_client.post(
+        getattr(settings, "MAILEROO_API_URL", "https://smtp.maileroo.com/api/v2/emails"),
+        "maileroo.emails",
+        headers={"X-API-Key": MAILEROO_API_KEY, "Content-Type": "application/json"},
+        json=data,
+        timeout=(http_client.TIMEOUT[0], getattr(settings, "EMAIL_TIMEOUT", 15)),
+    )
+    return response.status_code, response.text
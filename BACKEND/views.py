@@ -1,4 +1,5 @@
 # --- Python stdlib
+import base64
 import json
 import random
 import string
@@ -8,9 +9,8 @@ from decimal import Decimal
 import io
 from django.db.models import Prefetch
 import requests
-# --- Email API Maileroo
+# --- Email API Maileroo (se encola; lo envía el comando enviar_correos)
 import os
-MAILEROO_API_KEY = os.getenv("MAILEROO_API_KEY", "b52075e7833bbd52abc5d87e90ca3c1ebe740d062cfba0f3e3be941497548909")
 def send_email_via_maileroo(
     to,
     subject,
@@ -28,11 +28,6 @@ def send_email_via_maileroo(
     scheduled_at=None,
     reference_id=None
 ):
-    url = "https://smtp.maileroo.com/api/v2/emails"
-    api_headers = {
-        "X-API-Key": MAILEROO_API_KEY,
-        "Content-Type": "application/json"
-    }
     data = {
         "from": {
             "address": from_email,
@@ -67,25 +62,22 @@ def send_email_via_maileroo(
     if reference_id:
         data["reference_id"] = reference_id
 
-    print("[Maileroo][REQUEST] URL:", url)
-    print("[Maileroo][REQUEST] Headers:", api_headers)
-    print("[Maileroo][REQUEST] Data:", json.dumps(data, ensure_ascii=False))
-    try:
-        response = requests.post(url, headers=api_headers, json=data)
-        print(f"[Maileroo][RESPONSE] Status: {response.status_code}")
-        print(f"[Maileroo][RESPONSE] Body: {response.text}")
-        if response.status_code >= 400:
-            import sys
-            print(f"[Maileroo][ERROR] {response.status_code}: {response.text}", file=sys.stderr)
-    except Exception as e:
-        import sys
-        print(f"[Maileroo][EXCEPTION] {str(e)}", file=sys.stderr)
-        return 500, str(e)
-    return response.status_code, response.text
+    # Solo un INSERT en la bandeja de salida: la latencia de Maileroo no llega a la petición
+    from BACKEND.services import bandeja_salida
+    correo = bandeja_salida.encolar(data)
+    return 202, f"encolado:{correo.pk}"
 from django.db import transaction, IntegrityError
-from BACKEND.services.stock_alerts_core import low_stock_event_check
-
-from django.http import FileResponse, HttpResponse
+from BACKEND.services import catalogo_cache
+from BACKEND.services import busqueda
+from BACKEND.services import disponibilidad
+from BACKEND.services import autocompletado
+from BACKEND.services import inventario_stock
+from BACKEND.services import movimientos
+from BACKEND.services import reservas
+from BACKEND.services import http_client
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.decorators import action
 from rest_framework import status
 from django.shortcuts import get_object_or_404
@@ -100,7 +92,9 @@ from django.db import models, transaction
 from django.db.models import Q
 from django.http import HttpResponse
 from django.utils import timezone
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, BasePagination
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
 from django.core.exceptions import ValidationError
 
 # --- DRF
@@ -187,7 +181,7 @@ from .utils_email import send_email_raw
 from django.core.cache import cache
 from django.db.models import F
 from BACKEND.services.stock_alerts_core import (
-    LOW_STOCK_UMBRAL, DIGEST_TOP_N, _stock_of, _admin_emails, build_digest_html
+    LOW_STOCK_UMBRAL, DIGEST_TOP_N, _admin_emails, build_digest_html, digest_items
 )
 
 
@@ -233,6 +227,9 @@ from .serializer import (
     SalesRangeReportSerializer,
     SalesRangeReportItemSerializer,
     GenerarSalesRangeReportSerializer,
+
+    # ?fields= / ?omit=
+    campo_incluido,
 )
 from .reportes_rango import build_range_report
 from rest_framework import mixins
@@ -260,6 +257,140 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class CatalogoCacheMixin:
+    """
+    Cache de lectura (list/retrieve) para las vistas del catálogo.
+    - La clave lleva la versión de cada modelo de `catalogo_modelos` (tabla CatalogoVersion,
+      la suben las señales) y la URL completa con sus parámetros: un cambio en cualquiera de
+      esos modelos cambia la clave, así que nunca se sirve un payload viejo.
+    - Se guarda el JSON ya renderizado; en un acierto solo se hace la consulta de versiones.
+    - ETag = hash de esa misma clave: con If-None-Match vigente se responde 304 sin tocar
+      la cache ni serializar. `catalogo_publico` define el Cache-Control (public/private).
+    """
+    catalogo_modelos = ()
+    catalogo_publico = False
+
+    def list(self, request, *args, **kwargs):
+        return self._catalogo_cacheado(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._catalogo_cacheado(request, super().retrieve, *args, **kwargs)
+
+    def _catalogo_cacheado(self, request, vista, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if renderer is not None and renderer.format != 'json':
+            return vista(request, *args, **kwargs)  # API navegable: sin cache
+
+        from django.http import HttpResponseNotModified
+        from django.utils.http import parse_etags
+
+        vers = catalogo_cache.versiones(self.catalogo_modelos)
+        key = catalogo_cache.clave(type(self).__name__, vers, request.build_absolute_uri())
+        etag = catalogo_cache.etag(key)
+
+        recibidas = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in recibidas or etag in recibidas or f'W/{etag}' in recibidas:
+            return self._catalogo_cabeceras(HttpResponseNotModified(), etag)
+
+        contenido = catalogo_cache.obtener(key)
+        if contenido is None:
+            response = vista(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            from rest_framework.renderers import JSONRenderer
+            contenido = JSONRenderer().render(response.data)
+            catalogo_cache.guardar(key, contenido)
+        return self._catalogo_cabeceras(HttpResponse(contenido, content_type='application/json'), etag)
+
+    def _catalogo_cabeceras(self, response, etag):
+        from django.utils.cache import patch_cache_control, patch_vary_headers
+        response['ETag'] = etag
+        if self.catalogo_publico:
+            patch_cache_control(response, public=True, max_age=settings.CATALOGO_MAX_AGE)
+        else:
+            # Requiere token: el navegador puede guardarla pero revalida siempre (304 barato)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+
+class ProductoCursorPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) para el catálogo público.
+    - Solo se activa si llega ?cursor= o ?page_size=; sin ellos el listado devuelve la lista
+      completa como siempre (compatibilidad con el front actual).
+    - ?ordering=id (default) ordena por (id); ?ordering=precio ordena por (precio, id).
+    - El cursor guarda la última clave vista, así que la página 500 cuesta lo mismo que la 1
+      (WHERE (precio, id) > (...) LIMIT n, sin OFFSET).
+    """
+    page_size = 24
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering_query_param = "ordering"
+    orderings = {"id": ("id",), "precio": ("precio", "id")}
+    invalid_cursor_message = "Cursor inválido"
+
+    def _encode_cursor(self, orden, obj):
+        pos = [getattr(obj, campo) for campo in self.orderings[orden]]
+        raw = json.dumps({"o": orden, "p": pos}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def _decode_cursor(self, value, orden):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(value.encode()).decode())
+            pos = [int(v) for v in data["p"]]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        if data.get("o") != orden or len(pos) != len(self.orderings[orden]):
+            raise NotFound(self.invalid_cursor_message)
+        return pos
+
+    def _get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        orden = params.get(self.ordering_query_param, "id")
+        if orden not in self.orderings:
+            orden = "id"
+        page_size = self._get_page_size(request)
+
+        queryset = queryset.order_by(*self.orderings[orden])
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            pos = self._decode_cursor(cursor, orden)
+            if orden == "precio":
+                precio, pk = pos
+                queryset = queryset.filter(Q(precio__gt=precio) | Q(precio=precio, id__gt=pk))
+            else:
+                queryset = queryset.filter(id__gt=pos[0])
+
+        # Pedimos uno de más para saber si hay página siguiente sin hacer COUNT(*)
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = self._encode_cursor(orden, rows[-1]) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+
 class ComentarioViewSet(viewsets.ModelViewSet):
     queryset = Comentario.objects.select_related('usuario').all().order_by('-fecha')
     serializer_class = ComentarioSerializer
@@ -597,17 +728,121 @@ class ProveedorView(viewsets.ModelViewSet):
     queryset = Proveedor.objects.all()
     permission_classes = [IsAuthenticated, IsAdminWriteClienteRead]
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(CatalogoCacheMixin, viewsets.ModelViewSet):
     queryset = Categoria.objects.all()
     serializer_class = CategoriaSerializer
     permission_classes = [IsAuthenticated, IsAdminWriteClienteRead]
+    catalogo_modelos = (catalogo_cache.CATEGORIA,)
 
-class ProductoView(viewsets.ModelViewSet):
+class ProductoView(CatalogoCacheMixin, viewsets.ModelViewSet):
     serializer_class = ProductoSerializer
     permission_classes = [CarritoAnonimoMenosPago]
+    catalogo_modelos = (catalogo_cache.PRODUCTO, catalogo_cache.INVENTARIO, catalogo_cache.TALLA,
+                        catalogo_cache.SUBCATEGORIA, catalogo_cache.CATEGORIA)
+    catalogo_publico = True
     queryset = Producto.objects.all()
     from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
     parser_classes = (MultiPartParser, FormParser, JSONParser)  # Soportar archivos y JSON en request
+
+    pagination_class = ProductoCursorPagination
+
+    def get_queryset(self):
+        # Subcategoría/categoría en el mismo JOIN y todas las tallas de la página en UNA consulta
+        # (ProductoSerializer.get_inventario_tallas lee de este prefetch).
+        qs = super().get_queryset()
+        # Con ?fields= / ?omit= no se precarga lo que la respuesta no va a llevar
+        if self.request.method not in ('GET', 'HEAD') or any(
+            campo_incluido(self.request, c) for c in ('subcategoria_nombre', 'categoria_nombre')
+        ):
+            qs = qs.select_related('subcategoria__categoria')
+        if self.request.method not in ('GET', 'HEAD') or campo_incluido(self.request, 'inventario_tallas'):
+            # solo las tallas del grupo vigente: las de un grupo anterior no están a la venta
+            inventarios = (disponibilidad.del_grupo_vigente(Inventario.objects.select_related('talla'))
+                           .order_by('talla__nombre', 'idInventario'))
+            qs = qs.prefetch_related(Prefetch('inventarios', queryset=inventarios))
+
+        # Filtros del catálogo: ?subcategoria= ?categoria= ?talla_stock=<id talla con stock> ?en_stock=1 ?stock_bajo=1
+        params = self.request.query_params
+        subcategoria_id = params.get('subcategoria')
+        categoria_id = params.get('categoria')
+        talla_stock = params.get('talla_stock')
+        # ids no numéricos no coinciden con nada (igual que talla_stock), en vez de un 500
+        if subcategoria_id:
+            qs = qs.filter(subcategoria_id=int(subcategoria_id)) if subcategoria_id.isdigit() else qs.none()
+        if categoria_id:
+            qs = qs.filter(subcategoria__categoria_id=int(categoria_id)) if categoria_id.isdigit() else qs.none()
+        # Disponibilidad: stock desde el resumen en Producto; talla con un EXISTS indexado
+        if talla_stock:
+            qs = disponibilidad.con_stock_en_talla(qs, int(talla_stock)) if talla_stock.isdigit() else qs.none()
+        if params.get('en_stock') in ('1', 'true'):
+            qs = qs.filter(stock__gt=0)
+        if params.get('stock_bajo') in ('1', 'true'):
+            qs = qs.filter(stock_bajo=True)
+        return qs
+
+    @action(detail=False, methods=['get'], url_path='buscar')
+    def buscar(self, request):
+        """
+        GET /producto/buscar/?q=blusa roja&limit=24[&categoria=&subcategoria=&talla=]
+        Resultados ordenados por relevancia + facetas por categoría, subcategoría y talla con stock.
+        """
+        return self._catalogo_cacheado(request, self._buscar)
+
+    @action(detail=False, methods=['get'], url_path='autocompletar')
+    def autocompletar(self, request):
+        """
+        GET /producto/autocompletar/?q=blu&limit=8
+        Sugerencias por prefijo (sin tildes) de productos, subcategorías y categorías,
+        servidas desde el índice en memoria de services/autocompletado.py.
+        """
+        try:
+            limite = int(request.query_params.get('limit', autocompletado.LIMITE_DEFAULT))
+        except ValueError:
+            return Response({"error": "'limit' debe ser un entero"}, status=status.HTTP_400_BAD_REQUEST)
+        texto = request.query_params.get('q', '')
+        sugerencias = autocompletado.autocompletar(texto, limite)
+        return Response({
+            "q": texto,
+            "productos": sugerencias[autocompletado.PRODUCTO],
+            "subcategorias": sugerencias[autocompletado.SUBCATEGORIA],
+            "categorias": sugerencias[autocompletado.CATEGORIA],
+        })
+
+    def _buscar(self, request):
+        filtros = {}
+        for campo in ('categoria', 'subcategoria', 'talla', 'limit'):
+            valor = request.query_params.get(campo)
+            if valor in (None, ''):
+                continue
+            try:
+                filtros[campo] = int(valor)
+            except ValueError:
+                return Response({"error": f"'{campo}' debe ser un entero"}, status=status.HTTP_400_BAD_REQUEST)
+
+        texto = request.query_params.get('q', '')
+        encontrado = busqueda.buscar(
+            texto,
+            limite=filtros.pop('limit', busqueda.LIMITE_DEFAULT),
+            categoria=filtros.get('categoria'),
+            subcategoria=filtros.get('subcategoria'),
+            talla=filtros.get('talla'),
+        )
+
+        relevancia = dict(encontrado['resultados'])
+        productos = {p.id: p for p in self.get_queryset().filter(id__in=relevancia.keys())}
+        ordenados = [productos[pk] for pk, _ in encontrado['resultados'] if pk in productos]
+        resultados = self.get_serializer(ordenados, many=True).data
+        # la clave sale del producto, no del JSON: con ?fields= puede no venir 'id'
+        for producto, item in zip(ordenados, resultados):
+            item['relevancia'] = round(relevancia[producto.pk], 4)
+
+        return Response({
+            "q": texto,
+            "total": encontrado['total'],
+            "results": resultados,
+            "facetas": encontrado['facetas'],
+        })
+
     def get_permissions(self):
         # Permitir acceso público a métodos de solo lectura (GET, HEAD, OPTIONS)
         if self.request.method in ['GET', 'HEAD', 'OPTIONS']:
@@ -655,14 +890,7 @@ class ProductoView(viewsets.ModelViewSet):
                     raise ValueError
             except Exception:
                 errores_tipo['precio'] = 'Debe ser un entero positivo.'
-            # stock
-            if 'stock' in data:
-                try:
-                    data['stock'] = int(data['stock'])
-                    if data['stock'] < 0:
-                        raise ValueError
-                except Exception:
-                    errores_tipo['stock'] = 'Debe ser un entero positivo.'
+            # stock: se calcula desde el inventario (services/disponibilidad.py), se ignora si llega
             # subcategoria
             try:
                 data['subcategoria'] = int(data.get('subcategoria', ''))
@@ -692,13 +920,14 @@ class ProductoView(viewsets.ModelViewSet):
     
     
     
-class GrupoTallaViewSet(viewsets.ModelViewSet):
+class GrupoTallaViewSet(CatalogoCacheMixin, viewsets.ModelViewSet):
     serializer_class = GrupoTallaSerializer
     queryset = GrupoTalla.objects.all()
     permission_classes = [IsAuthenticated, IsAdminWriteClienteRead]
+    catalogo_modelos = (catalogo_cache.GRUPO_TALLA, catalogo_cache.TALLA)
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().prefetch_related('tallas')
         estado = self.request.query_params.get('estado', None)
         
         if estado is not None:
@@ -728,13 +957,14 @@ class GrupoTallaViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class TallaViewSet(viewsets.ModelViewSet):
+class TallaViewSet(CatalogoCacheMixin, viewsets.ModelViewSet):
     serializer_class = TallaSerializer
     queryset = Talla.objects.all()
     permission_classes = [IsAuthenticated, IsAdminWriteClienteRead]
+    catalogo_modelos = (catalogo_cache.TALLA, catalogo_cache.GRUPO_TALLA)
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('grupo').prefetch_related('grupo__tallas')
         grupo_id = self.request.query_params.get('grupo', None)
         estado = self.request.query_params.get('estado', None)
         
@@ -797,42 +1027,9 @@ class TallaViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # Obtener todos los productos de estas subcategorías
-            productos = Producto.objects.filter(
-                subcategoria__in=subcategorias
-            )
-            
-            inventarios_creados = []
-            inventarios_existentes = []
-            
-            for producto in productos:
-                # Verificar si ya existe inventario para este producto y talla
-                inventario_existente = Inventario.objects.filter(
-                    producto=producto,
-                    talla=talla
-                ).first()
-                
-                if inventario_existente:
-                    inventarios_existentes.append({
-                        'producto': producto.nombre,
-                        'talla': talla.nombre,
-                        'inventario_id': inventario_existente.idInventario
-                    })
-                else:
-                    # Crear nuevo inventario
-                    nuevo_inventario = Inventario.objects.create(
-                        producto=producto,
-                        talla=talla,
-                        cantidad=0,
-                        stockMinimo=producto.subcategoria.stockMinimo,
-                        stock_talla=0
-                    )
-                    inventarios_creados.append({
-                        'producto': producto.nombre,
-                        'talla': talla.nombre,
-                        'inventario_id': nuevo_inventario.idInventario
-                    })
-            
+            # Pares (producto, talla) faltantes en bloque; cada tanda es su propia transacción
+            resultado = inventario_stock.agregar_talla(talla, solo_subcategorias_activas=True)
+
             return Response({
                 "mensaje": f"Proceso completado para la talla '{talla.nombre}'",
                 "talla": {
@@ -841,12 +1038,10 @@ class TallaViewSet(viewsets.ModelViewSet):
                     "grupo": talla.grupo.nombre
                 },
                 "estadisticas": {
-                    "productos_procesados": productos.count(),
-                    "inventarios_creados": len(inventarios_creados),
-                    "inventarios_existentes": len(inventarios_existentes)
-                },
-                "inventarios_creados": inventarios_creados,
-                "inventarios_existentes": inventarios_existentes
+                    "productos_procesados": resultado['productos'],
+                    "inventarios_creados": resultado['creados'],
+                    "inventarios_existentes": resultado['existentes']
+                }
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -1053,15 +1248,36 @@ class InventarioView(viewsets.ModelViewSet):
     # ==============================
     @action(detail=False, methods=['get'])
     def inventario_agrupado(self, request):
-        categorias = Inventario.objects.values(
-            'producto__subcategoria__categoria__idCategoria',
+        """
+        Inventario agrupado por categoría y subcategoría, desde UNA consulta ordenada
+        (+ prefetch de las tallas de cada producto y de cada grupo).
+        ?stream=1 transmite el JSON categoría por categoría en vez de armarlo completo.
+        """
+        tallas_producto = Inventario.objects.select_related('talla').order_by('talla__nombre', 'idInventario')
+        inventarios = self.get_queryset().select_related('talla__grupo').prefetch_related(
+            Prefetch('producto__inventarios', queryset=tallas_producto),
+            'talla__grupo__tallas',
+        ).order_by(
             'producto__subcategoria__categoria__nombre',
-            'producto__subcategoria__categoria__estado'
-        ).distinct().order_by('producto__subcategoria__categoria__nombre')
-
-        serializer = self.get_serializer(categorias, many=True)
+            'producto__subcategoria__categoria__idCategoria',
+            'producto__subcategoria__nombre',
+            'producto__subcategoria__idSubcategoria',
+            'producto__nombre',
+            'talla__nombre',
+        )
+        serializer = self.get_serializer(inventarios)
+        if request.query_params.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(self._json_stream(serializer.iterar()),
+                                         content_type='application/json')
         return Response(serializer.data)
 
+    @staticmethod
+    def _json_stream(elementos):
+        yield '['
+        for i, elemento in enumerate(elementos):
+            yield (',' if i else '') + json.dumps(elemento, cls=JSONEncoder, ensure_ascii=False)
+        yield ']'
+
     @action(detail=False, methods=['get'])
     def categorias(self, request):
         categorias = Categoria.objects.filter(estado=True).prefetch_related('subcategorias')
@@ -1186,20 +1402,25 @@ class InventarioView(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def tabla_categorias(self, request):
-        categorias = Categoria.objects.filter(estado=True).prefetch_related('subcategorias')
+        # Un solo GROUP BY: conteos y stock salen del resumen de Producto (stock / stock_bajo),
+        # sin unir Inventario ni consultar por categoría.
+        activa = models.Q(subcategorias__estado=True)
+        categorias = Categoria.objects.filter(estado=True).annotate(
+            subcategorias_count=models.Count('subcategorias', filter=activa, distinct=True),
+            productos_count=models.Count('subcategorias__productos', filter=activa, distinct=True),
+            stock_total=models.Sum('subcategorias__productos__stock', filter=activa),
+            productos_stock_bajo=disponibilidad.contar_stock_bajo('subcategorias__productos', activa),
+        ).order_by('idCategoria')
         categorias_data = []
         for categoria in categorias:
-            subcategorias_count = categoria.subcategorias.filter(estado=True).count()
-            productos_count = Producto.objects.filter(
-                subcategoria__categoria=categoria,
-                subcategoria__estado=True
-            ).count()
             categorias_data.append({
                 'id': categoria.idCategoria,
                 'nombre': categoria.nombre,
                 'estado': categoria.estado,
-                'subcategorias_count': subcategorias_count,
-                'productos_count': productos_count,
+                'subcategorias_count': categoria.subcategorias_count,
+                'productos_count': categoria.productos_count,
+                'stock_total': categoria.stock_total or 0,
+                'productos_stock_bajo': categoria.productos_stock_bajo,
                 'acciones': {
                     'ver_subcategorias': f'/inventario/tabla_subcategorias/?categoria_id={categoria.idCategoria}'
                 }
@@ -1211,6 +1432,8 @@ class InventarioView(viewsets.ModelViewSet):
                 {'campo': 'nombre', 'titulo': 'Nombre de la Categoría'},
                 {'campo': 'subcategorias_count', 'titulo': 'Subcategorías'},
                 {'campo': 'productos_count', 'titulo': 'Productos'},
+                {'campo': 'stock_total', 'titulo': 'Stock Total'},
+                {'campo': 'productos_stock_bajo', 'titulo': 'Productos con Stock Bajo'},
                 {'campo': 'estado', 'titulo': 'Estado'},
                 {'campo': 'acciones', 'titulo': 'Acciones'}
             ],
@@ -1226,26 +1449,27 @@ class InventarioView(viewsets.ModelViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
         try:
             categoria = Categoria.objects.get(idCategoria=categoria_id, estado=True)
+            # Un solo GROUP BY por subcategoría; clave: contar solo stock de tallas del grupo actual
+            grupo_actual = models.Q(productos__inventarios__talla__grupo=models.F('grupoTalla'))
             subcategorias = Subcategoria.objects.filter(
                 categoria=categoria, estado=True
-            ).select_related('categoria', 'grupoTalla')
+            ).select_related('grupoTalla').annotate(
+                productos_count=models.Count('productos', distinct=True),
+                stock_total=models.Sum('productos__inventarios__stock_talla', filter=grupo_actual),
+                # mismo criterio que tabla_categorias (services/disponibilidad.py)
+                productos_stock_bajo=disponibilidad.contar_stock_bajo('productos'),
+            )
 
             subcategorias_data = []
             for subcategoria in subcategorias:
-                productos_count = Producto.objects.filter(subcategoria=subcategoria).count()
-                # clave: contar solo stock de tallas del grupo actual
-                stock_total = Inventario.objects.filter(
-                    producto__subcategoria=subcategoria,
-                    talla__grupo=subcategoria.grupoTalla
-                ).aggregate(total_stock=models.Sum('stock_talla'))['total_stock'] or 0
-
                 subcategorias_data.append({
                     'id': subcategoria.idSubcategoria,
                     'nombre': subcategoria.nombre,
                     'estado': subcategoria.estado,
                     'stockMinimo': subcategoria.stockMinimo,
-                    'productos_count': productos_count,
-                    'stock_total': stock_total,
+                    'productos_count': subcategoria.productos_count,
+                    'stock_total': subcategoria.stock_total or 0,
+                    'productos_stock_bajo': subcategoria.productos_stock_bajo,
                     'grupoTalla': {
                         'idGrupoTalla': subcategoria.grupoTalla.idGrupoTalla if subcategoria.grupoTalla else None,
                         'nombre': subcategoria.grupoTalla.nombre if subcategoria.grupoTalla else None
@@ -1293,12 +1517,21 @@ class InventarioView(viewsets.ModelViewSet):
             logger.error(f"[tabla_productos] Error inesperado buscando subcategoría: {str(e)}")
             return Response({"error": f"Error inesperado buscando subcategoría: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
+        if request.query_params.get('formato') == 'matriz':
+            return Response(self._matriz_productos(subcategoria))
+
         try:
-            productos = Producto.objects.filter(subcategoria=subcategoria).prefetch_related('inventarios__talla')
+            # Solo las tallas del grupo actual, en UNA consulta para todos los productos
+            inventarios_grupo = Inventario.objects.filter(
+                talla__grupo_id=subcategoria.grupoTalla_id
+            ).select_related('talla').order_by('talla__nombre', 'idInventario')
+            productos = Producto.objects.filter(subcategoria=subcategoria).order_by('id').prefetch_related(
+                Prefetch('inventarios', queryset=inventarios_grupo, to_attr='inventarios_grupo')
+            )
             productos_data = []
             for producto in productos:
                 try:
-                    inventarios = producto.inventarios.filter(talla__grupo=subcategoria.grupoTalla)
+                    inventarios = producto.inventarios_grupo
                     stock_por_talla = {}
                     for inv in inventarios:
                         try:
@@ -1315,9 +1548,11 @@ class InventarioView(viewsets.ModelViewSet):
                             logger.warning(f"[tabla_productos] Error en inventario/talla: {str(e)}")
                             stock_por_talla['error'] = f"Error en talla: {str(e)}"
 
-                    stock_total = sum(getattr(inv, 'stock_talla', 0) for inv in inventarios)
-                    stock_minimo_total = sum(getattr(inv, 'stockMinimo', 0) for inv in inventarios)
-                    stock_inicial_total = sum(getattr(inv, 'cantidad', 0) for inv in inventarios)
+                    stock_total = stock_minimo_total = stock_inicial_total = 0
+                    for inv in inventarios:
+                        stock_total += inv.stock_talla or 0
+                        stock_minimo_total += inv.stockMinimo or 0
+                        stock_inicial_total += inv.cantidad or 0
 
                     productos_data.append({
                         'id': getattr(producto, 'id', None),
@@ -1330,7 +1565,7 @@ class InventarioView(viewsets.ModelViewSet):
                         'stock_minimo_total': stock_minimo_total,
                         'imagen': getattr(producto, 'imagen', None),
                         'stock_por_talla': stock_por_talla,
-                        'estado_stock': 'Bajo' if stock_total <= stock_minimo_total else 'Normal',
+                        'estado_stock': 'Bajo' if disponibilidad.es_stock_bajo(stock_total, stock_minimo_total) else 'Normal',
                         'acciones': {
                             'editar': f"/productos/{getattr(producto, 'id', '0')}/",
                             'ver_detalle': f"/productos/{getattr(producto, 'id', '0')}/detalle/"
@@ -1366,6 +1601,36 @@ class InventarioView(viewsets.ModelViewSet):
         except Exception as e:
             logger.error(f"[tabla_productos] Error inesperado en procesamiento de productos: {str(e)}")
             return Response({"error": f"Error inesperado en procesamiento de productos: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+    def _matriz_productos(self, subcategoria):
+        """
+        ?formato=matriz: productos × tallas del grupo actual, sin instanciar modelos.
+        'tallas' es la cabecera; 'stock' y 'stock_minimo' traen una fila de enteros por
+        producto, en el mismo orden que 'productos' (0 si no hay inventario para esa talla).
+        """
+        tallas = list(Talla.objects.filter(grupo_id=subcategoria.grupoTalla_id)
+                      .order_by('nombre', 'id').values_list('id', 'nombre'))
+        columna = {talla_id: i for i, (talla_id, _) in enumerate(tallas)}
+        productos = list(Producto.objects.filter(subcategoria=subcategoria)
+                         .order_by('id').values_list('id', 'nombre'))
+        fila = {producto_id: i for i, (producto_id, _) in enumerate(productos)}
+
+        stock = [[0] * len(tallas) for _ in productos]
+        minimos = [[0] * len(tallas) for _ in productos]
+        for producto_id, talla_id, stock_talla, stock_minimo in Inventario.objects.filter(
+            producto__subcategoria=subcategoria, talla__grupo_id=subcategoria.grupoTalla_id
+        ).order_by().values_list('producto_id', 'talla_id', 'stock_talla', 'stockMinimo'):
+            i, j = fila[producto_id], columna[talla_id]
+            stock[i][j], minimos[i][j] = stock_talla or 0, stock_minimo or 0
+
+        return {
+            'titulo': f'Productos de {subcategoria.nombre}',
+            'formato': 'matriz',
+            'tallas': [{'id': talla_id, 'nombre': nombre} for talla_id, nombre in tallas],
+            'productos': [{'id': producto_id, 'nombre': nombre} for producto_id, nombre in productos],
+            'stock': stock,
+            'stock_minimo': minimos,
+        }
+
     # ==============================
     # Actualización de stock por tallas (modal)
     # ==============================
@@ -1379,47 +1644,59 @@ class InventarioView(viewsets.ModelViewSet):
 
         try:
             producto = Producto.objects.get(id=producto_id)
-            inventarios_actualizados = []
-            stock_total = 0
-
+            items = []
             for talla_info in tallas_data:
-                talla_id = talla_info.get('talla_id')
-                stock = talla_info.get('stock', 0)
-                stock_minimo = talla_info.get('stock_minimo', 0)
-
-                if stock < 0 or stock_minimo < 0:
+                if talla_info.get('stock', 0) < 0 or talla_info.get('stock_minimo', 0) < 0:
                     return Response({"error": "El stock y stock mínimo no pueden ser negativos"},
                                     status=status.HTTP_400_BAD_REQUEST)
-
-                inv = self.queryset.get(producto_id=producto_id, talla_id=talla_id)
-                inv.stock_talla = stock
-                inv.stockMinimo = stock_minimo
-                inv.save(update_fields=['stock_talla', 'stockMinimo'])   # <-- aquí salta la señal
-
-                inventarios_actualizados.append(inv)
-                stock_total += stock
+                items.append({'producto_id': producto.id, **talla_info})
+            # 1 lock + bulk_update; la revisión de stock bajo corre una vez, después del commit
+            inventarios_actualizados = inventario_stock.actualizar(inventario_stock.normalizar_items(items))
 
         except Inventario.DoesNotExist:
             return Response({"error": "No se encontró el inventario para una talla especificada"},
                             status=status.HTTP_404_NOT_FOUND)
         except Producto.DoesNotExist:
             return Response({"error": "Producto no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({"error": e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 🔔 Correo: NO romper respuesta si falla
-        email_ok = True
+        inventarios = Inventario.objects.filter(
+            pk__in=[inv.pk for inv in inventarios_actualizados]
+        ).select_related('producto__subcategoria__categoria', 'talla__grupo')
+        return Response({
+            "mensaje": "Stock por tallas actualizado exitosamente",
+            "inventarios": self.get_serializer(inventarios, many=True).data,
+            "stock_total": sum(inv.stock_talla for inv in inventarios_actualizados),
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def actualizar_stock_masivo(self, request):
+        """
+        POST {"items": [{"producto_id", "talla_id", "stock", "stock_minimo"}, ...]}
+        Varios productos en un solo lote: todo o nada, 1 lock en orden de pk + bulk_update,
+        y la revisión de stock bajo una sola vez por lote después del commit.
+        """
+        if not isinstance(request.data, dict):
+            return Response({"error": {"items": ["Se espera un objeto con 'items'"]}},
+                            status=status.HTTP_400_BAD_REQUEST)
         try:
-            # opcional: si quieres forzar el chequeo además de la señal
-            for inv in inventarios_actualizados:
-                low_stock_event_check(inv, umbral=5)
-        except Exception as e:
-            print("[WARN] Error enviando correo de bajo stock:", e)
-            email_ok = False
+            inventarios = inventario_stock.actualizar(inventario_stock.normalizar_items(request.data.get('items')))
+        except ValidationError as e:
+            return Response({"error": e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
+        except Inventario.DoesNotExist as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
 
         return Response({
-            "mensaje": "Stock por tallas actualizado exitosamente",
-            "inventarios": self.get_serializer(inventarios_actualizados, many=True).data,
-            "stock_total": stock_total,
-            "email_ok": email_ok,  # el front puede mostrar warning si False
+            "mensaje": "Stock actualizado exitosamente",
+            "actualizados": len(inventarios),
+            "inventarios": [{
+                'idInventario': inv.pk,
+                'producto_id': inv.producto_id,
+                'talla_id': inv.talla_id,
+                'stock_talla': inv.stock_talla,
+                'stockMinimo': inv.stockMinimo,
+            } for inv in inventarios],
         }, status=status.HTTP_200_OK)
 
     # ==============================
@@ -1430,7 +1707,7 @@ class InventarioView(viewsets.ModelViewSet):
         """
         Cambia el grupo de tallas de la subcategoría y sincroniza inventarios de todos sus productos:
         - Crea inventarios faltantes para tallas del nuevo grupo.
-        - No borra inventarios viejos; las vistas ya filtran por el grupo vigente.
+        - No borra inventarios viejos; catálogo, reservas y checkout solo usan el grupo vigente.
         """
         subcategoria_id = request.data.get('subcategoria_id')
         grupo_talla_id = request.data.get('grupo_talla_id')
@@ -1443,43 +1720,86 @@ class InventarioView(viewsets.ModelViewSet):
         nuevo = get_object_or_404(GrupoTalla, idGrupoTalla=grupo_talla_id, estado=True)
 
         with transaction.atomic():
-            # Actualizar el grupo en la subcategoría
+            # Crea en bloque los inventarios que falten para el grupo nuevo y guarda el grupo
+            # (la señal de Subcategoria vuelve a comparar y ya no encuentra faltantes)
             sub.grupoTalla = nuevo
+            creados = inventario_stock.sincronizar_tallas(sub)
             sub.save(update_fields=['grupoTalla'])
 
-            # Tallas válidas del nuevo grupo
-            tallas_validas_ids = list(nuevo.tallas.filter(estado=True).values_list('id', flat=True))
-
-            # Crear inventarios que falten para cada producto de la subcategoría
-            productos = Producto.objects.filter(subcategoria=sub)
-            to_create = []
-            for p in productos:
-                existentes = set(
-                    Inventario.objects.filter(producto=p).values_list('talla_id', flat=True)
-                )
-                for tid in tallas_validas_ids:
-                    if tid not in existentes:
-                        to_create.append(Inventario(
-                            producto=p,
-                            talla_id=tid,
-                            cantidad=0,
-                            stockMinimo=sub.stockMinimo,
-                            stock_talla=0
-                        ))
-            if to_create:
-                Inventario.objects.bulk_create(to_create, ignore_conflicts=True)
-
         return Response({
             "mensaje": "Grupo de talla actualizado y inventario sincronizado.",
             "subcategoria": {"id": sub.idSubcategoria, "nombre": sub.nombre},
             "grupo_talla": {"id": nuevo.idGrupoTalla, "nombre": nuevo.nombre},
-            "creados": len(to_create)
+            "creados": len(creados)
         }, status=status.HTTP_200_OK)
 
-class MovimientoView(viewsets.ModelViewSet):
+class MovimientoView(viewsets.ReadOnlyModelViewSet):
+    """
+    Libro de movimientos de stock (solo lectura: lo escriben las mutaciones de inventario).
+    ?inventario= | ?producto=&talla=  ?tipo=  ?desde=&hasta= (fecha o fecha-hora ISO;
+    sin ?desde se muestran los últimos DIAS_DEFAULT días)  ?limit= (máx. LIMITE_MAX)
+    """
     serializer_class = MovimientoSerializer
     queryset = Movimiento.objects.all()
-    permission_classes = [IsAuthenticated, AdminandCliente] #Por definir
+    permission_classes = [IsAuthenticated, IsAdmin]
+    DIAS_DEFAULT = 30
+    LIMITE_MAX = 5000
+
+    @staticmethod
+    def _momento(valor, fin_del_dia=False):
+        from django.utils.dateparse import parse_date, parse_datetime
+        if not valor:
+            return None
+        momento = parse_datetime(valor)
+        if momento is None:
+            dia = parse_date(valor)
+            if dia is None:
+                raise ValueError(valor)
+            momento = datetime.combine(dia, datetime.max.time() if fin_del_dia else datetime.min.time())
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+        return momento
+
+    def get_queryset(self):
+        qs = super().get_queryset().select_related('inventario__producto', 'inventario__talla')
+        params = self.request.query_params
+        for parametro, campo in (('inventario', 'inventario_id'), ('producto', 'inventario__producto_id'),
+                                 ('talla', 'inventario__talla_id'), ('tipo', 'tipo')):
+            if params.get(parametro):
+                qs = qs.filter(**{campo: params[parametro]})
+        if self.action == 'list':
+            desde = self._momento(params.get('desde')) or timezone.now() - timedelta(days=self.DIAS_DEFAULT)
+            qs = qs.filter(fecha__gte=desde)
+            hasta = self._momento(params.get('hasta'), fin_del_dia=True)
+            if hasta:
+                qs = qs.filter(fecha__lte=hasta)
+        return qs.order_by('-fecha', '-idmovimiento')
+
+    def list(self, request, *args, **kwargs):
+        try:
+            limite = min(int(request.query_params.get('limit', 500)), self.LIMITE_MAX)
+            movimientos_qs = self.get_queryset()[:max(limite, 1)]
+        except ValueError:
+            return Response({"error": "Parámetros inválidos: desde/hasta deben ser fechas ISO y limit un entero"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(movimientos_qs, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def stock_en(self, request):
+        """GET /movimiento/stock_en/?inventario=<id>&fecha=<ISO>: stock a esa fecha (snapshot + movimientos)."""
+        inventario_id = request.query_params.get('inventario')
+        try:
+            momento = self._momento(request.query_params.get('fecha'), fin_del_dia=True) or timezone.now()
+        except ValueError:
+            return Response({"error": "fecha debe ser ISO (AAAA-MM-DD o fecha-hora)"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (inventario_id or '').isdigit() or not Inventario.objects.filter(pk=inventario_id).exists():
+            return Response({"error": "Inventario no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            "inventario": int(inventario_id),
+            "fecha": momento,
+            "stock": movimientos.stock_en(inventario_id, momento),
+        })
 
 # views.py (solo si NO agregas campos al modelo)
 class PagoView(viewsets.ModelViewSet):
@@ -1593,28 +1913,15 @@ class CarritoView(viewsets.ModelViewSet):
             return CarritoUpdateSerializer
         return CarritoSerializer
     
-    def _get_stock_disponible(self, producto_id, talla_id=None):
-            from .models import Inventario
-            inv = (
-                Inventario.objects.filter(producto_id=producto_id, talla_id=talla_id).first()
-                if talla_id
-                else Inventario.objects.filter(producto_id=producto_id).first()
-            )
-            if not inv:
-                return None  # sin registro de inventario -> no limitamos
-            stock = getattr(inv, "stock_talla", None)
-            if stock is None:
-                stock = getattr(inv, "cantidad", 0)
-            try:
-                return int(stock or 0)
-            except Exception:
-                return 0
+    def _get_stock_disponible(self, producto_id, talla_id=None, carrito=None):
+        # stock menos lo que otros carritos tienen reservado; None = sin inventario, no limitamos
+        return reservas.disponible(producto_id, talla_id, carrito=carrito)
 
     @action(detail=True, methods=['post'])
     def agregar_producto(self, request, pk=None):
         """
-        Agrega un producto al carrito. Valida stock y, si se pide más de lo disponible,
-        ajusta a lo máximo posible en lugar de devolver 400.
+        Agrega un producto al carrito y reserva sus unidades (services/reservas.py).
+        Si se pide más de lo disponible, ajusta a lo máximo posible en lugar de devolver 400.
         """
         try:
             carrito = self.get_object()
@@ -1638,12 +1945,12 @@ class CarritoView(viewsets.ModelViewSet):
 
             en_carrito = item_existente.cantidad if item_existente else 0
 
-            # Stock disponible para esa combinación
-            stock_disponible = self._get_stock_disponible(producto_id, talla_id)
+            # Reserva el total del ítem: lo que queda tras las reservas de otros carritos
             ajustada = False
+            reservada = reservas.reservar(carrito, producto_id, talla_id, en_carrito + cantidad_req)
 
-            if stock_disponible is not None:
-                restantes = max(0, stock_disponible - en_carrito)
+            if reservada is not None:
+                restantes = max(0, reservada - en_carrito)
                 if restantes <= 0:
                     return Response(
                         {"error": "No hay stock disponible para agregar más."},
@@ -1678,8 +1985,8 @@ class CarritoView(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def actualizar_cantidad(self, request, pk=None):
         """
-        Actualiza la cantidad de un item respetando stock.
-        Si se intenta poner más que el stock, ajusta al máximo posible.
+        Actualiza la cantidad de un item respetando stock y reservas de otros carritos.
+        Si se intenta poner más que lo disponible, ajusta al máximo posible.
         """
         try:
             carrito = Carrito.objects.prefetch_related('items__producto', 'items__talla').get(pk=pk)
@@ -1690,11 +1997,12 @@ class CarritoView(viewsets.ModelViewSet):
 
             if nueva_cantidad <= 0:
                 item.delete()
+                reservas.liberar(carrito, item.producto_id, item.talla_id)
                 return Response(CarritoSerializer(carrito).data, status=200)
 
-            stock_disponible = self._get_stock_disponible(item.producto_id, item.talla_id)
-            if stock_disponible is not None and nueva_cantidad > stock_disponible:
-                nueva_cantidad = stock_disponible  # clamp
+            reservada = reservas.reservar(carrito, item.producto_id, item.talla_id, nueva_cantidad)
+            if reservada is not None and nueva_cantidad > reservada:
+                nueva_cantidad = reservada  # clamp
 
             item.cantidad = nueva_cantidad
             item.save()
@@ -1734,6 +2042,8 @@ class CarritoView(viewsets.ModelViewSet):
 
         try:
             with transaction.atomic():
+                # las unidades del anónimo pasan a reservarse a nombre del carrito del usuario
+                reservas.liberar(anon)
                 # bloqueamos items del user_cart para evitar condiciones de carrera
                 for it in list(anon.items.select_related('producto', 'talla').all()):
                     # ¿ya existe ese (producto,talla) en el carrito del usuario?
@@ -1745,8 +2055,8 @@ class CarritoView(viewsets.ModelViewSet):
                     if existente:
                         nueva_cant = int(existente.cantidad) + int(it.cantidad)
 
-                        # valida stock (si lo manejas)
-                        stock = self._get_stock_disponible(it.producto_id, it.talla_id)
+                        # valida stock reservándolo para el carrito del usuario
+                        stock = reservas.reservar(user_cart, it.producto_id, it.talla_id, nueva_cant)
                         if stock is not None and nueva_cant > stock:
                             # puedes elegir: 1) cap al stock o 2) devolver 400
                             nueva_cant = stock  # opción: cap
@@ -1759,6 +2069,7 @@ class CarritoView(viewsets.ModelViewSet):
                         it.delete()
                     else:
                         # mover el item al carrito del usuario
+                        reservas.reservar(user_cart, it.producto_id, it.talla_id, it.cantidad)
                         it.carrito = user_cart
                         it.save()
 
@@ -1786,6 +2097,8 @@ class CarritoView(viewsets.ModelViewSet):
         """
         Elimina un item del carrito. NO devuelve stock aquí.
         Acepta flags del front: skip_stock / reserve
+        - skip_stock: el inventario nunca se toca aquí (se descuenta al facturar).
+        - reserve: conserva la reserva del ítem hasta que venza; por defecto se libera.
         """
         skip_stock = bool(request.data.get('skip_stock', False))
         reserve    = bool(request.data.get('reserve', False))
@@ -1795,6 +2108,8 @@ class CarritoView(viewsets.ModelViewSet):
         try:
             item = CarritoItem.objects.get(idCarritoItem=item_id, carrito=carrito)
             item.delete()
+            if not reserve:
+                reservas.liberar(carrito, item.producto_id, item.talla_id)
             return Response(CarritoSerializer(carrito).data, status=200)
         except CarritoItem.DoesNotExist:
             return Response({"error": "Item no encontrado en el carrito"}, status=404)
@@ -1803,13 +2118,15 @@ class CarritoView(viewsets.ModelViewSet):
     def limpiar_carrito(self, request, pk=None):
         """
         Limpia el carrito. NO modifica inventario aquí.
-        Acepta flags del front: skip_stock / reserve
+        Acepta flags del front: skip_stock / reserve (mismo significado que en eliminar_producto)
         """
         skip_stock = bool(request.data.get('skip_stock', False))
         reserve    = bool(request.data.get('reserve', False))
 
         carrito = self.get_object()
         carrito.items.all().delete()
+        if not reserve:
+            reservas.liberar(carrito)
         return Response(CarritoSerializer(carrito).data, status=200)
 
 
@@ -1850,9 +2167,10 @@ class CarritoView(viewsets.ModelViewSet):
             if not self._pedido_items_qs(pedido).exists():
                 self._move_items_carrito_a_pedido(carrito, pedido)
 
-            # Cierra carrito
+            # Cierra carrito; sus reservas se mantienen mientras se paga
             carrito.estado = False
             carrito.save(update_fields=['estado'])
+            reservas.renovar(carrito)
 
             EstadoCarrito.objects.create(
                 carrito=carrito,
@@ -1960,14 +2278,15 @@ class CarritoView(viewsets.ModelViewSet):
 
         # ---- 4) Llamada a MP ----
         try:
-            resp = requests.post(
+            resp = http_client.post(
                 "https://api.mercadopago.com/checkout/preferences",
+                "mp.preferences",
                 headers={
                     "Authorization": f"Bearer {getattr(settings, 'MP_ACCESS_TOKEN', '')}",
                     "Content-Type": "application/json",
                 },
                 json=preference_data,
-                timeout=20
+                timeout=(http_client.TIMEOUT[0], 20)
             )
         except Exception as e:
             return Response({"error": f"No se pudo contactar a Mercado Pago: {str(e)}"},
@@ -2029,10 +2348,10 @@ class EstadoCarritoView(viewsets.ModelViewSet):
 
             # Consulta a MP
             url = f"https://api.mercadopago.com/v1/payments/{payment_id}"
-            resp = requests.get(
+            resp = http_client.get(
                 url,
+                "mp.payments",
                 headers={"Authorization": f"Bearer {settings.MP_ACCESS_TOKEN}"},
-                timeout=15
             )
             if resp.status_code != 200:
                 return Response({"error": "No se pudo consultar el pago"}, status=502)
@@ -2519,10 +2838,10 @@ class FacturaView(viewsets.ModelViewSet):
         if payment_id:
             try:
                 url = f"https://api.mercadopago.com/v1/payments/{payment_id}"
-                resp = requests.get(
+                resp = http_client.get(
                     url,
+                    "mp.payments",
                     headers={"Authorization": f"Bearer {settings.MP_ACCESS_TOKEN}"},
-                    timeout=15
                 )
                 if resp.status_code == 200:
                     data_mp = resp.json()
@@ -2615,9 +2934,11 @@ class FacturaView(viewsets.ModelViewSet):
                 "items": items_payload
             }
 
-            ser = FacturaCreateSerializer(data=payload)
+            ser = FacturaCreateSerializer(data=payload, context={"carrito": carrito})
             ser.is_valid(raise_exception=True)
             factura = ser.save()
+            # lo vendido ya salió de stock_talla: sus reservas no deben seguir restando a otros carritos
+            reservas.liberar(carrito)
 
             # Denormalizar email/nombre
             update_fields = []
@@ -3050,10 +3371,12 @@ class FacturaView(viewsets.ModelViewSet):
     
 #Hasta 
 
-class SubcategoriaViewSet(viewsets.ModelViewSet):
+class SubcategoriaViewSet(CatalogoCacheMixin, viewsets.ModelViewSet):
     queryset = Subcategoria.objects.all()
     serializer_class = SubcategoriaSerializer
     permission_classes = [IsAuthenticated, IsAdminWriteClienteRead]  # Por definir
+    catalogo_modelos = (catalogo_cache.SUBCATEGORIA, catalogo_cache.CATEGORIA,
+                        catalogo_cache.GRUPO_TALLA, catalogo_cache.TALLA)
 
     def perform_create(self, serializer):
         try:
@@ -3239,7 +3562,8 @@ class SubcategoriaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     def get_queryset(self):
-        qs = super().get_queryset().select_related('categoria')
+        # tallas_disponibles sale del prefetch (sin una consulta por subcategoría)
+        qs = super().get_queryset().select_related('categoria', 'grupoTalla').prefetch_related('grupoTalla__tallas')
         # acepta ?categoria= o ?categoria_id= (compat)
         cat = self.request.query_params.get('categoria') or self.request.query_params.get('categoria_id')
         if cat:
@@ -3249,7 +3573,51 @@ class SubcategoriaViewSet(viewsets.ModelViewSet):
         qs = qs.filter(estado=True)
 
         return qs    
-    
+
+
+class TaxonomiaView(CatalogoCacheMixin, APIView):
+    """
+    GET /taxonomia/ : árbol completo Categoría → Subcategoría → Grupo de tallas → Tallas
+    para el arranque del SPA, en 4 consultas fijas (una por tabla). Pasa por la cache
+    versionada del catálogo y responde 304 con If-None-Match.
+    """
+    permission_classes = [IsAuthenticated, IsAdminWriteClienteRead]
+    catalogo_modelos = (catalogo_cache.CATEGORIA, catalogo_cache.SUBCATEGORIA,
+                        catalogo_cache.GRUPO_TALLA, catalogo_cache.TALLA)
+
+    def get(self, request):
+        return self._catalogo_cacheado(request, self._construir)
+
+    def _construir(self, request):
+        tallas_por_grupo = {}
+        for t in Talla.objects.order_by('grupo_id', 'id').values('id', 'nombre', 'estado', 'grupo_id'):
+            tallas_por_grupo.setdefault(t.pop('grupo_id'), []).append(t)
+
+        grupos = {}
+        for g in GrupoTalla.objects.order_by('nombre').values('idGrupoTalla', 'nombre', 'descripcion', 'estado'):
+            g['tallas'] = tallas_por_grupo.get(g['idGrupoTalla'], [])
+            grupos[g['idGrupoTalla']] = g
+
+        # igual que SubcategoriaViewSet: solo subcategorías activas
+        subs_por_categoria = {}
+        for sub in (Subcategoria.objects.filter(estado=True).order_by('nombre')
+                    .values('idSubcategoria', 'nombre', 'estado', 'stockMinimo', 'categoria_id', 'grupoTalla_id')):
+            grupo = grupos.get(sub.pop('grupoTalla_id'))
+            sub['grupoTalla'] = grupo['idGrupoTalla'] if grupo else None
+            sub['grupo_talla_nombre'] = grupo['nombre'] if grupo else None
+            sub['tallas_disponibles'] = [t['nombre'] for t in grupo['tallas'] if t['estado']] if grupo else []
+            subs_por_categoria.setdefault(sub.pop('categoria_id'), []).append(sub)
+
+        categorias = []
+        for c in Categoria.objects.order_by('nombre').values('idCategoria', 'nombre', 'estado'):
+            c['subcategorias'] = subs_por_categoria.get(c['idCategoria'], [])
+            categorias.append(c)
+
+        return Response({
+            'categorias': categorias,
+            'grupos_talla': list(grupos.values()),
+        })
+
 
 def _parse_date(s: str):
     try:
@@ -3401,16 +3769,11 @@ def send_low_stock_digest(request):
     umbral = int(request.data.get("umbral", LOW_STOCK_UMBRAL))
     top_n = int(request.data.get("top_n", DIGEST_TOP_N))
 
-    invs = (Inventario.objects
-            .select_related('producto__subcategoria__categoria', 'talla__grupo')
-            .all())
-    bajos = [i for i in invs if _stock_of(i) < umbral]
-    items = bajos if bajos else sorted(invs, key=_stock_of)[:top_n]
-
+    items, hay_bajos = digest_items(umbral, top_n)
     html, rows = build_digest_html(umbral, items)
     send_email_raw(
         subject="[Resumen diario] Stock por talla",
         to_emails=_admin_emails(),
         html_body=html
     )
-    return Response({"ok": True, "items": len(rows), "hay_bajos": bool(bajos)})
\ No newline at end of file
+    return Response({"ok": True, "items": len(rows), "hay_bajos": hay_bajos})
\ No newline at end of file
@@ -92,7 +92,7 @@ INSTALLED_APPS = [
 # ========= Middleware =========
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "BACKEND.middleware.CatalogoWhiteNoiseMiddleware",  # WhiteNoise + snapshot del catálogo
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",   # CORS antes de CommonMiddleware
     "django.middleware.common.CommonMiddleware",
@@ -206,7 +206,8 @@ CORS_ALLOWED_ORIGINS = [
     f"{front.scheme}://{front.hostname}" + (f":{front.port}" if front.port else ""),
     "https://variedad-y-estilos-zoe.onrender.com"
 ]
-CORS_ALLOW_HEADERS = list(default_headers) + ["x-rol"]
+CORS_ALLOW_HEADERS = list(default_headers) + ["x-rol", "if-none-match"]
+CORS_EXPOSE_HEADERS = ["ETag"]  # el front puede leerla y reenviarla en If-None-Match
 # CORS_ALLOW_CREDENTIALS = True  # solo si usas cookies entre dominios
 
 # ========= Email (Maileroo) =========
@@ -229,12 +230,48 @@ CACHES = {
     }
 }
 
+# ======== Cache del catálogo público ========
+# Las claves llevan la versión de cada modelo (tabla CatalogoVersion), así que
+# nunca se sirve un payload viejo aunque cada worker tenga su propia LocMem.
+# Con REDIS_URL el payload se comparte entre todos los workers de gunicorn.
+REDIS_URL = os.getenv("REDIS_URL", "").strip()
+if REDIS_URL:
+    CACHES["catalogo"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "catalogo",
+    }
+else:
+    CACHES["catalogo"] = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "catalogo-cache",
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    }
+CATALOGO_CACHE_TTL = int(os.getenv("CATALOGO_CACHE_TTL", str(60 * 60 * 24)))
+# max-age del catálogo público para navegador/proxies; pasado ese tiempo revalidan con ETag (304)
+CATALOGO_MAX_AGE = int(os.getenv("CATALOGO_MAX_AGE", "60"))
+# Cada cuántos segundos el autocompletado compara su índice en memoria con CatalogoVersion
+# (entre revisiones responde sin tocar la base; services/autocompletado.py)
+AUTOCOMPLETADO_REVISION_SEGUNDOS = int(os.getenv("AUTOCOMPLETADO_REVISION_SEGUNDOS", "5"))
+# Minutos que un carrito aparta el stock de sus ítems (services/reservas.py)
+RESERVA_CARRITO_MINUTOS = int(os.getenv("RESERVA_CARRITO_MINUTOS", "15"))
+# Una talla nueva crea su inventario en la misma petición hasta esta cantidad de
+# productos del grupo; más allá se marca pendiente y la completa el proceso `tallas`
+# del Procfile (agregar_talla --pendientes)
+TALLA_EN_LINEA_MAX_PRODUCTOS = int(os.getenv("TALLA_EN_LINEA_MAX_PRODUCTOS", "5000"))
+# Segundos que se juntan los cruces de stock bajo antes de mandar un solo correo
+# (comando alertas_stock_bajo)
+LOW_STOCK_VENTANA_SEGUNDOS = int(os.getenv("LOW_STOCK_VENTANA_SEGUNDOS", "300"))
+
 # ======== Email: extras seguros ========
 # Si no hay admins con correo válido, usa este fallback (opcional)
 ALERT_FALLBACK_EMAIL = os.getenv("ALERT_FALLBACK_EMAIL", "juandavidmi100@gmail.com")  # e.g. soporte@tu-dominio.com
 
 # Evita cuelgues si el SMTP tarda
 EMAIL_TIMEOUT = 15
+# API HTTP de Maileroo (la usa el comando enviar_correos; las vistas solo encolan)
+MAILEROO_API_URL = os.getenv("MAILEROO_API_URL", "https://smtp.maileroo.com/api/v2/emails")
+MAILEROO_API_KEY = os.getenv("MAILEROO_API_KEY", "")
 EMAIL_SUBJECT_PREFIX = "[E-Commerce] "
 SERVER_EMAIL = DEFAULT_FROM_EMAIL  # para errores del sistema, coincide con from
 